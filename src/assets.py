@@ -0,0 +1,329 @@
+import os
+import posixpath
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+from manifest import hash_bytes, hash_file, remove_empty_dirs
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows
+    fcntl = None
+
+PUBLISH_STRATEGIES = ("copy", "hardlink", "reflink", "copy_file_range")
+
+# ioctl request number for FICLONE from <linux/fs.h>
+FICLONE = 0x40049409
+
+# Files that pages and stylesheets link to; anything else (CNAME, _headers,
+# robots.txt, ...) has to keep its name
+FINGERPRINT_EXTENSIONS = {
+    ".css",
+    ".js",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".gif",
+    ".webp",
+    ".svg",
+    ".ico",
+    ".woff",
+    ".woff2",
+}
+# Hex digits of the content hash put in a fingerprinted name
+FINGERPRINT_LENGTH = 8
+HEADERS_FILE = "_headers"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")\s]+)\1\s*\)""")
+# Anything with a scheme (data:, https:, ...) or protocol-relative
+EXTERNAL_URL_RE = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")
+
+
+def walk_files(root_dir):
+    """
+    Yield the path of every file under root_dir, relative to root_dir.
+    """
+    for dir_path, _, file_names in os.walk(root_dir):
+        for file_name in file_names:
+            yield os.path.relpath(os.path.join(dir_path, file_name), root_dir)
+
+
+def file_record(file_path, checksum=False):
+    stat = os.stat(file_path)
+    record = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if checksum:
+        record["hash"] = hash_file(file_path)
+    return record
+
+
+def is_unchanged(previous, record, checksum=False):
+    if checksum:
+        return previous.get("hash") == record["hash"]
+    return previous["size"] == record["size"] and previous["mtime"] == record["mtime"]
+
+
+def reflink_file(src_path, dst_path):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+
+def copy_file_range(src_path, dst_path):
+    if not hasattr(os, "copy_file_range"):
+        raise OSError("copy_file_range is not supported on this platform")
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        remaining = os.fstat(src.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+
+
+def publish_file(src_path, dst_path, strategy="copy"):
+    """
+    Place a copy of src_path at dst_path using the given strategy.
+
+    Strategies the filesystem can't handle (e.g. hardlinks across devices,
+    reflinks outside btrfs/XFS) fall back to a plain copy. Every strategy
+    keeps the source's permission bits. Returns the strategy that was
+    actually used.
+    """
+    # Never write through an existing file: it may be a hardlink to the source
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+
+    try:
+        if strategy == "hardlink":
+            os.link(src_path, dst_path)
+            return strategy
+        if strategy == "reflink":
+            reflink_file(src_path, dst_path)
+            shutil.copymode(src_path, dst_path)
+            return strategy
+        if strategy == "copy_file_range":
+            copy_file_range(src_path, dst_path)
+            shutil.copymode(src_path, dst_path)
+            return strategy
+    except OSError:
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+
+    # Copies the permission bits too
+    shutil.copy(src_path, dst_path)
+    return "copy"
+
+
+def write_file(dst_path, data):
+    # Same as publish_file: replace rather than write through a hardlink
+    if os.path.lexists(dst_path):
+        os.remove(dst_path)
+    with open(dst_path, "wb") as file:
+        file.write(data)
+
+
+def to_url_path(rel_path):
+    return "/" + rel_path.replace(os.sep, "/")
+
+
+def fingerprinted_name(rel_path, digest):
+    """
+    Put the start of a content hash before the extension: a/b.css -> a/b.<hash>.css
+    """
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def rewrite_css_urls(css, css_url, urls):
+    """
+    Point the url() references of a stylesheet at fingerprinted files.
+
+    css_url is the stylesheet's own URL path, which relative references are
+    resolved against; urls maps URL paths to fingerprinted URL paths.
+    """
+    css_dir = posixpath.dirname(css_url)
+
+    def replace(match):
+        quote, url = match.groups()
+        if EXTERNAL_URL_RE.match(url):
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", url).groups()
+        if path.startswith("/"):
+            target = path
+        else:
+            target = posixpath.normpath(posixpath.join(css_dir, path))
+        fingerprinted = urls.get(target)
+        if not path or fingerprinted is None:
+            return match.group(0)
+        # Same directory, so only the file name of the reference changes
+        path = posixpath.join(
+            posixpath.dirname(path), posixpath.basename(fingerprinted)
+        )
+        return f"url({quote}{path}{suffix}{quote})"
+
+    return CSS_URL_RE.sub(replace, css)
+
+
+def asset_urls(fingerprints):
+    """
+    Map the URL path of every fingerprinted file to its fingerprinted URL path.
+    """
+    return {
+        to_url_path(rel_path): to_url_path(dest_rel_path)
+        for rel_path, (dest_rel_path, _) in fingerprints.items()
+    }
+
+
+def plan_fingerprints(static_dir):
+    """
+    Work out the fingerprinted name of every static file that gets one.
+
+    Returns a dict mapping paths relative to static_dir to (fingerprinted
+    path, data), where data holds the rewritten contents of a stylesheet
+    whose url() references changed, and is None for files published as is.
+    Stylesheets are hashed after their references are rewritten, so a new
+    image also gives the stylesheets using it new names. References from
+    one stylesheet to another are left alone.
+    """
+    fingerprints = {}
+    stylesheets = []
+    for rel_path in sorted(walk_files(static_dir)):
+        ext = os.path.splitext(rel_path)[1].lower()
+        if ext not in FINGERPRINT_EXTENSIONS:
+            continue
+        if ext == ".css":
+            stylesheets.append(rel_path)
+            continue
+        digest = hash_file(os.path.join(static_dir, rel_path))
+        fingerprints[rel_path] = (fingerprinted_name(rel_path, digest), None)
+
+    urls = asset_urls(fingerprints)
+    for rel_path in stylesheets:
+        with open(os.path.join(static_dir, rel_path), "rb") as file:
+            data = file.read()
+        css = data.decode("utf-8", "surrogateescape")
+        rewritten = rewrite_css_urls(css, to_url_path(rel_path), urls)
+        rewritten = rewritten.encode("utf-8", "surrogateescape")
+        fingerprints[rel_path] = (
+            fingerprinted_name(rel_path, hash_bytes(rewritten)),
+            rewritten if rewritten != data else None,
+        )
+    return fingerprints
+
+
+def write_headers(dest_path, urls, basepath="/"):
+    """
+    Write a _headers file marking every fingerprinted URL as immutable.
+
+    A fingerprinted file never changes under its name, so browsers and CDNs
+    that read _headers (Netlify, Cloudflare Pages) may cache it for good.
+    Rules from a _headers file in the static directory are kept above ours.
+    """
+    headers_path = os.path.join(dest_path, HEADERS_FILE)
+    lines = []
+    if os.path.isfile(headers_path):
+        with open(headers_path, "r") as file:
+            lines.append(file.read().rstrip("\n"))
+    for url in sorted(urls.values()):
+        lines.append(basepath + url[1:])
+        lines.append(f"  Cache-Control: {IMMUTABLE_CACHE_CONTROL}")
+    write_file(headers_path, ("\n".join(lines) + "\n").encode("utf-8"))
+
+
+def remove_headers(dest_path, manifest):
+    """
+    Delete a _headers file left by an earlier --fingerprint build, unless
+    it was copied from the static directory.
+    """
+    if HEADERS_FILE not in manifest.assets:
+        remove_published(dest_path, HEADERS_FILE)
+
+
+def remove_published(dest_path, rel_path):
+    dst_path = os.path.join(dest_path, rel_path)
+    if os.path.exists(dst_path):
+        print(f"Removing stale file: {dst_path}")
+        os.remove(dst_path)
+        remove_empty_dirs(os.path.dirname(dst_path), dest_path)
+
+
+def sync_static(
+    from_path,
+    dest_path,
+    manifest,
+    checksum=False,
+    strategy="copy",
+    threads=None,
+    fingerprints=None,
+):
+    """
+    Copy new and changed static files into dest_path and delete orphans.
+
+    A file is unchanged when its size and mtime match the manifest, or with
+    checksum=True when its content hash does. Only files the manifest knows
+    were copied from from_path are ever deleted, so generated pages living
+    in the same directory are left alone.
+
+    Files in fingerprints (see plan_fingerprints) are published under their
+    fingerprinted names instead, and the manifest records the name used.
+
+    Changed files are published with publish_file on a pool of threads.
+    """
+    if strategy not in PUBLISH_STRATEGIES:
+        raise ValueError(f"Unknown publish strategy: {strategy}")
+
+    current = {}
+    to_publish = []
+    for rel_path in walk_files(from_path):
+        src_path = os.path.join(from_path, rel_path)
+        dest_rel_path, data = (fingerprints or {}).get(rel_path, (rel_path, None))
+        dst_path = os.path.join(dest_path, dest_rel_path)
+        record = file_record(src_path, checksum)
+        if dest_rel_path != rel_path:
+            record["dest"] = dest_rel_path
+        current[rel_path] = record
+
+        previous = manifest.assets.get(rel_path)
+        if previous is not None and previous.get("dest", rel_path) != dest_rel_path:
+            # The content, or that of a file it references, has a new hash
+            remove_published(dest_path, previous.get("dest", rel_path))
+        elif (
+            previous is not None
+            and is_unchanged(previous, record, checksum)
+            and os.path.isfile(dst_path)
+            and os.path.getsize(dst_path)
+            == (record["size"] if data is None else len(data))
+        ):
+            # Keep a hash from an earlier checksum run for the next one
+            if "hash" in previous:
+                record["hash"] = previous["hash"]
+            manifest.asset_hits += 1
+            continue
+
+        print(f"Copying file: {src_path} -> {dst_path}")
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        to_publish.append((src_path, dst_path, data))
+
+    if to_publish:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = [
+                (
+                    executor.submit(publish_file, src_path, dst_path, strategy)
+                    if data is None
+                    else executor.submit(write_file, dst_path, data)
+                )
+                for src_path, dst_path, data in to_publish
+            ]
+            for future in futures:
+                future.result()
+        manifest.asset_misses += len(to_publish)
+
+    # Remove files that were copied by an earlier build but no longer exist
+    for rel_path in manifest.assets.keys() - current.keys():
+        remove_published(dest_path, manifest.assets[rel_path].get("dest", rel_path))
+        manifest.asset_removed += 1
+
+    manifest.assets = current
@@ -0,0 +1,364 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from main import main as build_main
+from manifest import CACHE_DIR
+from template import Template
+from textnode import markdown_to_html_node
+from utilities import find_pages, generate_page
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+STAGES = ("parse", "to_html", "generate_page", "build", "rebuild")
+
+# Block kinds are relative weights; inline kinds are the chance that a
+# sentence contains one.
+DEFAULT_MIX = {
+    "heading": 2,
+    "paragraph": 6,
+    "list": 2,
+    "ordered_list": 1,
+    "code": 1,
+    "quote": 1,
+    "link": 0.3,
+    "image": 0.1,
+    "bold": 0.2,
+    "italic": 0.2,
+    "code_span": 0.1,
+}
+BLOCK_KINDS = ("heading", "paragraph", "list", "ordered_list", "code", "quote")
+
+PAGES_PER_DIR = 100
+
+WORDS = (
+    "elf ring shire river valley mountain road forest tower star song lamp "
+    "stone gate hall wind shadow light bridge ford hobbit wizard king sword "
+    "map ember willow barrow moss harbor crown door garden"
+).split()
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+def parse_mix(text):
+    """
+    Parse "kind=value,..." into a copy of DEFAULT_MIX with those values changed.
+    """
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, text.split(",")):
+        kind, _, value = item.partition("=")
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown mix kind: {kind}")
+        mix[kind] = float(value)
+    if not any(mix[kind] > 0 for kind in BLOCK_KINDS):
+        raise ValueError("At least one block kind needs a positive weight")
+    return mix
+
+
+def page_path(index):
+    return f"s{index // PAGES_PER_DIR:04d}/page-{index:06d}"
+
+
+class CorpusWriter:
+    """
+    Generates reproducible markdown pages: the same seed, size and mix
+    always produce byte-identical content.
+    """
+
+    def __init__(self, pages, seed=0, mix=None, blocks=12):
+        self.pages = pages
+        self.rng = random.Random(seed)
+        self.mix = DEFAULT_MIX if mix is None else mix
+        self.blocks = blocks
+        self.block_kinds = [kind for kind in BLOCK_KINDS if self.mix[kind] > 0]
+        self.block_weights = [self.mix[kind] for kind in self.block_kinds]
+
+    def words(self, low, high):
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def sentence(self):
+        parts = [self.words(3, 10).capitalize()]
+        if self.rng.random() < self.mix["bold"]:
+            parts.append(f"**{self.words(1, 3)}**")
+        if self.rng.random() < self.mix["italic"]:
+            parts.append(f"_{self.words(1, 3)}_")
+        if self.rng.random() < self.mix["code_span"]:
+            parts.append(f"`{self.words(1, 2)}`")
+        if self.rng.random() < self.mix["link"]:
+            target = page_path(self.rng.randrange(self.pages))
+            parts.append(f"[{self.words(1, 3)}](/{target}.html)")
+        if self.rng.random() < self.mix["image"]:
+            parts.append(f"![{self.words(1, 3)}](/images/bench.png)")
+        return " ".join(parts) + "."
+
+    def block(self, kind):
+        if kind == "heading":
+            return "#" * self.rng.randint(2, 4) + " " + self.words(2, 6).capitalize()
+        if kind == "paragraph":
+            return " ".join(self.sentence() for _ in range(self.rng.randint(1, 5)))
+        if kind == "list":
+            count = self.rng.randint(2, 6)
+            return "\n".join(f"- {self.sentence()}" for _ in range(count))
+        if kind == "ordered_list":
+            count = self.rng.randint(2, 6)
+            return "\n".join(f"{i}. {self.sentence()}" for i in range(1, count + 1))
+        if kind == "code":
+            lines = [self.words(2, 8) for _ in range(self.rng.randint(1, 8))]
+            return "```\n" + "\n".join(lines) + "\n```"
+        return "\n".join(f"> {self.sentence()}" for _ in range(self.rng.randint(1, 3)))
+
+    def page(self, index):
+        kinds = self.rng.choices(self.block_kinds, self.block_weights, k=self.blocks)
+        blocks = [f"# Page {index} {self.words(1, 4)}"]
+        blocks.extend(self.block(kind) for kind in kinds)
+        return "\n\n".join(blocks) + "\n"
+
+
+def generate_corpus(root_dir, pages, seed=0, mix=None, blocks=12):
+    """
+    Write a site with the given number of pages to root_dir.
+
+    The layout matches the real site: content/, static/ and template.html.
+    Returns the total size of the markdown in bytes.
+    """
+    content_dir = os.path.join(root_dir, "content")
+    images_dir = os.path.join(root_dir, "static", "images")
+    os.makedirs(content_dir)
+    os.makedirs(images_dir)
+    with open(os.path.join(root_dir, "template.html"), "w") as file:
+        file.write(TEMPLATE)
+    with open(os.path.join(root_dir, "static", "index.css"), "w") as file:
+        file.write("body { margin: 0 auto; max-width: 40em; }\n")
+    with open(os.path.join(images_dir, "bench.png"), "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n" + bytes(64))
+
+    writer = CorpusWriter(pages, seed, mix, blocks)
+    total = 0
+    for index in range(pages):
+        text = writer.page(index).encode("utf-8")
+        # The first page doubles as the home page
+        rel_path = "index.md" if index == 0 else page_path(index) + ".md"
+        file_path = os.path.join(content_dir, rel_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as file:
+            file.write(text)
+        total += len(text)
+    return total
+
+
+def peak_rss_mb(who="self"):
+    """
+    Peak resident set size of this process (or its children) so far, in MB.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(
+        resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN
+    )
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss * scale / 1e6, 1)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silence stdout at the file descriptor level, including pool workers.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(os.devnull, "w") as devnull:
+        os.dup2(devnull.fileno(), 1)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def stage_result(seconds, pages, size, children=False):
+    result = {
+        "seconds": round(seconds, 4),
+        "pages_per_s": round(pages / seconds, 1) if seconds else None,
+        "mb_per_s": round(size / 1e6 / seconds, 2) if seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if children:
+        result["children_peak_rss_mb"] = peak_rss_mb("children")
+    return result
+
+
+def run_benchmarks(root_dir, stages=STAGES, jobs=1, basepath="/"):
+    """
+    Time each stage over the corpus in root_dir and return the results.
+
+    Peak RSS is the high-water mark of the process after each stage, so it
+    also covers every stage that ran before it.
+    """
+    content_dir = os.path.join(root_dir, "content")
+    pages = find_pages(content_dir, os.path.join(root_dir, "out"))
+    size = sum(os.path.getsize(from_path) for from_path, _ in pages)
+    results = {}
+
+    if "parse" in stages or "to_html" in stages:
+        parse_time = 0.0
+        to_html_time = 0.0
+        for from_path, _ in pages:
+            with open(from_path, "r") as file:
+                md = file.read()
+            started = time.perf_counter()
+            node = markdown_to_html_node(md)
+            parsed = time.perf_counter()
+            node.to_html()
+            to_html_time += time.perf_counter() - parsed
+            parse_time += parsed - started
+        if "parse" in stages:
+            results["parse"] = stage_result(parse_time, len(pages), size)
+        if "to_html" in stages:
+            results["to_html"] = stage_result(to_html_time, len(pages), size)
+
+    if "generate_page" in stages:
+        template_path = os.path.join(root_dir, "template.html")
+        template = Template.load(template_path, basepath)
+        started = time.perf_counter()
+        with quiet():
+            for from_path, dest_path in pages:
+                generate_page(from_path, template_path, dest_path, basepath, template)
+        elapsed = time.perf_counter() - started
+        results["generate_page"] = stage_result(elapsed, len(pages), size)
+        shutil.rmtree(os.path.join(root_dir, "out"))
+
+    if "build" in stages or "rebuild" in stages:
+        argv = [basepath, "--jobs", str(jobs)]
+        cwd = os.getcwd()
+        os.chdir(root_dir)
+        try:
+            # A full build from scratch, then one that finds nothing to do
+            shutil.rmtree(CACHE_DIR, ignore_errors=True)
+            for stage in ("build", "rebuild"):
+                started = time.perf_counter()
+                with quiet():
+                    build_main(argv)
+                elapsed = time.perf_counter() - started
+                if stage in stages:
+                    results[stage] = stage_result(
+                        elapsed, len(pages), size, children=jobs > 1
+                    )
+        finally:
+            os.chdir(cwd)
+
+    return {"pages": len(pages), "bytes": size, "stages": results}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the generator on synthetic corpora."
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        nargs="+",
+        default=[1000],
+        help="corpus sizes to benchmark, e.g. 1000 10000 100000 (default: 1000)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="corpus random seed (default: 0)"
+    )
+    parser.add_argument(
+        "--mix",
+        default="",
+        help="override content weights, e.g. heading=4,code=0,link=0.5",
+    )
+    parser.add_argument(
+        "--blocks", type=int, default=12, help="blocks per page (default: 12)"
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(STAGES),
+        help=f"comma separated stages to run (default: {','.join(STAGES)})",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="worker processes for the build stages (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        help="generate corpora here and keep them (default: a temporary directory)",
+    )
+    parser.add_argument(
+        "-o", "--output", help="write the JSON report here instead of stdout"
+    )
+    args = parser.parse_args(argv)
+    try:
+        args.mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    args.stages = [stage for stage in args.stages.split(",") if stage]
+    for stage in args.stages:
+        if stage not in STAGES:
+            parser.error(f"Unknown stage: {stage}")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    return args
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "blocks": args.blocks,
+        "mix": args.mix,
+        "jobs": args.jobs,
+        "results": [],
+    }
+
+    with contextlib.ExitStack() as stack:
+        base_dir = args.corpus_dir
+        if base_dir is None:
+            base_dir = stack.enter_context(tempfile.TemporaryDirectory())
+        for pages in args.pages:
+            root_dir = os.path.join(base_dir, f"corpus-{pages}")
+            if os.path.exists(root_dir):
+                shutil.rmtree(root_dir)
+            print(f"Generating {pages} pages in {root_dir}", file=sys.stderr)
+            generate_corpus(root_dir, pages, args.seed, args.mix, args.blocks)
+            print(f"Benchmarking {pages} pages", file=sys.stderr)
+            report["results"].append(run_benchmarks(root_dir, args.stages, args.jobs))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
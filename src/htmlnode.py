@@ -1,16 +1,41 @@
+import re
+
+# Elements whose text is shown as written, so minifying never touches it
+PRESERVE_WHITESPACE_TAGS = {"pre", "code", "textarea", "script", "style"}
+WHITESPACE_RE = re.compile(r"\s+")
+# Characters that force an attribute value to be quoted
+UNQUOTED_VALUE_RE = re.compile(r"[^\s\"'=<>`]+")
+
+
+def format_attribute(key, value, minify=False):
+    """
+    Format one attribute, leaving off the quotes where minify allows it.
+    """
+    if minify and UNQUOTED_VALUE_RE.fullmatch(value):
+        return f"{key}={value}"
+    return f'{key}="{value}"'
+
+
 class HTMLNode:
+    # Pages produce a node per inline span, so skip the per-instance __dict__
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children
         self.props = props
 
-    def to_html(self):
+    def to_html(self, minify=False):
         raise NotImplementedError
 
-    def props_to_html(self):
+    def props_to_html(self, minify=False):
         if self.props is None or len(self.props) == 0:
             return ""
+        if minify:
+            return " " + " ".join(
+                format_attribute(key, value, True) for key, value in self.props.items()
+            )
         return " " + " ".join(f'{key}="{value}"' for key, value in self.props.items())
 
     def __repr__(self) -> str:
@@ -18,33 +43,80 @@ class HTMLNode:
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, value, props=None):
         super().__init__(tag=tag, value=value, children=None, props=props)
 
-    def to_html(self):
+    def to_html(self, minify=False):
         if self.value is None:
             raise ValueError
 
+        value = str(self.value)
+        if minify and self.tag not in PRESERVE_WHITESPACE_TAGS:
+            value = WHITESPACE_RE.sub(" ", value)
+
         if not self.tag:
-            return str(self.value)
+            return value
 
         # Self-closing tags (void elements) like img, br, hr, etc.
         if self.tag == "img":
+            if minify:
+                return f"<{self.tag}{self.props_to_html(True)}>"
             return f"<{self.tag}{self.props_to_html()} />"
 
-        return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
+        return f"<{self.tag}{self.props_to_html(minify)}>{value}</{self.tag}>"
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
         super().__init__(tag=tag, value=None, children=children, props=props)
 
-    def to_html(self):
-        if not self.tag:
+    def to_html(self, minify=False):
+        return "".join(iter_html(self, minify))
+
+
+def iter_html(node, minify=False):
+    """
+    Yield the HTML for a node tree in chunks, walking it with an explicit stack.
+
+    Joining the chunks gives the same string as a recursive to_html(), but
+    no subtree is ever copied into its parent and deep trees can't hit the
+    recursion limit. With minify=True, runs of whitespace in text collapse
+    to one space (except in code), attribute quotes are left off where they
+    aren't needed and void elements lose their closing slash.
+    """
+    # Holds nodes still to be visited and closing tags still to be written
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+
+        if not isinstance(item, ParentNode):
+            yield item.to_html(minify)
+            continue
+
+        if not item.tag:
             raise ValueError("Error: Node must have a tag")
 
-        if not self.children:
+        if not item.children:
             raise ValueError("Error: Node must have children")
 
-        children_html = "".join(node.to_html() for node in self.children)
-        return f"<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>"
+        yield f"<{item.tag}{item.props_to_html(minify)}>"
+        stack.append(f"</{item.tag}>")
+        stack.extend(reversed(item.children))
+
+
+def write_html(node, out, minify=False):
+    """
+    Stream the HTML for a node tree to any object with a write() method.
+
+    Works with open files and io.StringIO; wrap sockets with makefile("w").
+    """
+    write = out.write
+    for chunk in iter_html(node, minify):
+        write(chunk)
@@ -0,0 +1,186 @@
+import json
+import os
+import struct
+
+from assets import file_record, is_unchanged, to_url_path, walk_files
+from manifest import CACHE_DIR
+
+IMAGE_SIZES_FILE = os.path.join(CACHE_DIR, "images.json")
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# JPEG start-of-frame markers, which carry the image size; C4, C8 and CC
+# share the range but mean something else
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7}
+JPEG_SOF_MARKERS |= {0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Markers without a length field: TEM, RST0-7, SOI and EOI
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xDA)}
+
+
+def read_png_size(header):
+    # The IHDR chunk always comes first
+    if header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def read_gif_size(header):
+    return struct.unpack("<HH", header[6:10])
+
+
+def read_webp_size(header):
+    chunk = header[12:16]
+    if chunk == b"VP8 " and header[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", header[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and header[20:21] == b"\x2f":
+        (bits,) = struct.unpack("<I", header[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def read_jpeg_size(file):
+    """
+    Walk the JPEG segments after SOI up to the first start-of-frame,
+    skipping over the contents of every other segment.
+    """
+    file.seek(2)
+    while True:
+        byte = file.read(1)
+        if byte != b"\xff":
+            return None
+        marker = file.read(1)
+        # Any number of 0xFF fill bytes may precede a marker
+        while marker == b"\xff":
+            marker = file.read(1)
+        if not marker:
+            return None
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        length_bytes = file.read(2)
+        if len(length_bytes) < 2:
+            return None
+        (length,) = struct.unpack(">H", length_bytes)
+        if marker in JPEG_SOF_MARKERS:
+            frame = file.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def read_image_size(file_path):
+    """
+    Return the (width, height) of a PNG, JPEG, GIF or WebP image, reading
+    only as much of the file as its header needs, or None if it isn't one.
+    """
+    with open(file_path, "rb") as file:
+        header = file.read(30)
+        try:
+            if header.startswith(PNG_SIGNATURE):
+                size = read_png_size(header)
+            elif header[:6] in (b"GIF87a", b"GIF89a"):
+                size = read_gif_size(header)
+            elif header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+                size = read_webp_size(header)
+            elif header[:2] == b"\xff\xd8":
+                size = read_jpeg_size(file)
+            else:
+                size = None
+        except struct.error:
+            # Truncated header
+            return None
+    if size is None or 0 in size:
+        return None
+    return size
+
+
+class ShownImages:
+    """
+    Image sizes for the renderer to look up in place of a plain dict,
+    noting in shown the size found for every image URL it asks for, as a
+    [width, height] list or None, so what was rendered can be checked
+    against later sizes with sizes_match.
+    """
+
+    def __init__(self, sizes, shown):
+        self.sizes = sizes or {}
+        self.shown = shown
+
+    def get(self, url):
+        size = self.sizes.get(url)
+        self.shown[url] = None if size is None else list(size)
+        return size
+
+
+class ImageSizeCache:
+    """
+    Intrinsic sizes of the images in a static directory, kept with each
+    image's file size and mtime. As in sync_static, an image whose size and
+    mtime are unchanged is taken as unchanged, so a build only stats it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Path relative to the static directory -> size, mtime and
+        # [width, height] (None for unreadable images)
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def load(cls, path):
+        cache = cls(path)
+        try:
+            with open(path, "r") as file:
+                cache.sizes = json.load(file)
+        except (OSError, ValueError):
+            # A missing or corrupt cache just means reading every header
+            pass
+        return cache
+
+    def scan(self, static_dir):
+        """
+        Return a dict mapping the URL path of every image under static_dir
+        to its (width, height).
+
+        Entries for images that are gone are dropped from the cache.
+        """
+        found = {}
+        sizes = {}
+        for rel_path in sorted(walk_files(static_dir)):
+            if os.path.splitext(rel_path)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            file_path = os.path.join(static_dir, rel_path)
+            record = file_record(file_path)
+            previous = self.sizes.get(rel_path)
+            if isinstance(previous, dict) and is_unchanged(previous, record):
+                size = previous["image"]
+                self.hits += 1
+            else:
+                size = read_image_size(file_path)
+                self.misses += 1
+            record["image"] = None if size is None else list(size)
+            sizes[rel_path] = record
+            if size is not None:
+                found[to_url_path(rel_path)] = tuple(size)
+        self.sizes = sizes
+        return found
+
+    def save(self):
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.sizes, file)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return f"Image sizes: {self.hits} cached, {self.misses} read"
@@ -0,0 +1,121 @@
+import os
+import posixpath
+from urllib.parse import unquote, urlsplit
+
+from assets import EXTERNAL_URL_RE, HEADERS_FILE, walk_files
+from search import SEARCH_DIR
+from sitemap import SITEMAP_FILE, SITEMAP_PART_RE
+
+
+def output_paths(manifest, dest_dir_path=None):
+    """
+    Return the set of every file a build publishes, as paths relative to
+    the output directory: the generated pages and the static files, and
+    with dest_dir_path, the other files generated there.
+
+    Static files are indexed under their source names, since that is what
+    content links to before any fingerprinting.
+    """
+    paths = {entry["dest"].replace(os.sep, "/") for entry in manifest.pages.values()}
+    paths.update(rel_path.replace(os.sep, "/") for rel_path in manifest.assets)
+    if dest_dir_path is not None:
+        paths.update(generated_paths(dest_dir_path))
+    return paths
+
+
+def generated_paths(dest_dir_path):
+    """
+    Yield the sitemaps, search index files and _headers in the output
+    directory, as paths relative to it. Only where those are written is
+    looked at, not the whole directory.
+    """
+    for name in os.listdir(dest_dir_path):
+        if (
+            name in (SITEMAP_FILE, HEADERS_FILE) or SITEMAP_PART_RE.fullmatch(name)
+        ) and os.path.isfile(os.path.join(dest_dir_path, name)):
+            yield name
+    for rel_path in walk_files(os.path.join(dest_dir_path, SEARCH_DIR)):
+        yield posixpath.join(SEARCH_DIR, rel_path.replace(os.sep, "/"))
+
+
+def link_target(url, page_rel_path):
+    """
+    Return the path an internal URL points at relative to the output
+    directory, with a trailing slash for directories, or None for external
+    URLs and links within the page.
+    """
+    if EXTERNAL_URL_RE.match(url):
+        return None
+    path = unquote(urlsplit(url).path)
+    if not path:
+        return None
+    if path.startswith("/"):
+        target = path.lstrip("/")
+    else:
+        page_dir = posixpath.dirname(page_rel_path.replace(os.sep, "/"))
+        target = posixpath.join(page_dir, path)
+    is_dir = not target or target.endswith("/")
+    target = posixpath.normpath(target) if target else "."
+    if target == ".":
+        return ""
+    return target + "/" if is_dir else target
+
+
+def resolves(target, paths):
+    """
+    Check a link target against the set of output paths, the way a static
+    file server maps a URL to a file.
+    """
+    if target.startswith("../") or target == "..":
+        return False
+    if not target or target.endswith("/"):
+        return target + "index.html" in paths
+    return (
+        target in paths or target + ".html" in paths or target + "/index.html" in paths
+    )
+
+
+class LinkChecker:
+    """
+    Finds internal links and images on the site that point at nothing.
+
+    The URL of every LINK and IMAGE TextNode is collected while its page is
+    converted, in whichever worker process converts it, and kept in the
+    manifest so unchanged pages don't need converting again. Each URL is
+    then looked up in a set of every page and static file the build
+    publishes, taken from the manifest, and of the few other files it
+    generates, such as sitemap.xml, without crawling the output directory.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        # (source path, URL) of every link that doesn't resolve
+        self.broken = []
+
+    def check(self, manifest, dest_dir_path=None):
+        """
+        Check the links of every page in the manifest, returning the broken ones.
+
+        Pass the output directory as dest_dir_path once everything is
+        written to it, so links to its sitemaps, search index and _headers
+        resolve too.
+        """
+        paths = output_paths(manifest, dest_dir_path)
+        self.checked = 0
+        self.broken = []
+        for source_path, entry in sorted(manifest.pages.items()):
+            for url in entry.get("links", ()):
+                target = link_target(url, entry["dest"])
+                if target is None:
+                    continue
+                self.checked += 1
+                if not resolves(target, paths):
+                    self.broken.append((source_path, url))
+        return self.broken
+
+    def summary(self):
+        lines = [f"Broken link in {path}: {url}" for path, url in self.broken]
+        lines.append(
+            f"Links: {self.checked} internal links checked, {len(self.broken)} broken"
+        )
+        return "\n".join(lines)
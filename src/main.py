@@ -1,10 +1,34 @@
+import argparse
+import cProfile
+import os
 import sys
+import time
 
+from assets import (
+    PUBLISH_STRATEGIES,
+    asset_urls,
+    plan_fingerprints,
+    remove_headers,
+    sync_static,
+    write_headers,
+)
+from images import IMAGE_SIZES_FILE, ImageSizeCache
+from links import LinkChecker
+from manifest import GENERATOR_VERSION, MANIFEST_FILE, BuildManifest, hash_file
+from output import discard_output, stage_output, swap_output
+from precompress import DEFAULT_MIN_SIZE, precompress_output
+from profiling import PROFILE_FILE, BuildProfile, timed
+from render_cache import DEFAULT_MAX_MB, RENDER_CACHE_FILE, RenderCache
+from search import SEARCH_INDEX_FILE, SearchIndex, remove_search_index
+from server import serve
+from sitemap import remove_sitemap
+from template import Template, digest, normalize_basepath
 from utilities import (
-    copy_files,
-    delete_from_folder,
+    BuildError,
     generate_pages_recursive,
+    update_pages,
 )
+from watch import create_watcher, iter_changes
 
 PUBLIC_DIR = "docs"
 CONTENT_DIR = "content"
@@ -12,16 +36,380 @@ STATIC_DIR = "static"
 TEMPLATE_FILE = "template.html"
 
 
-def main():
-    # Get basepath from CLI argument, default to "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
-    else:
-        basepath = "/"
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument(
+        "basepath",
+        nargs="?",
+        default="/",
+        help="URL prefix the site is served from (default: /)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes for page generation (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--checksum",
+        action="store_true",
+        help="compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--publish",
+        choices=PUBLISH_STRATEGIES,
+        default="copy",
+        help="how static files are placed in the output directory (default: copy)",
+    )
+    parser.add_argument(
+        "--fingerprint",
+        action="store_true",
+        help="publish stylesheets, scripts, images and fonts under content-hashed "
+        "names and mark them immutable in a _headers file",
+    )
+    parser.add_argument(
+        "--site-url",
+        metavar="URL",
+        help="write a sitemap.xml of every page, with URLs under this origin "
+        "(e.g. https://example.com)",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="write a sharded search index of every page and its client script "
+        "to search-index/",
+    )
+    parser.add_argument(
+        "--check-links",
+        action="store_true",
+        help="report links and images pointing at pages or static files that "
+        "don't exist",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="leave insignificant whitespace, comments and attribute quotes out "
+        "of pages",
+    )
+    parser.add_argument(
+        "--precompress",
+        action="store_true",
+        help="write .gz (and on Python 3.14+ .zst) siblings of HTML, CSS and SVG "
+        "files for servers to send as is",
+    )
+    parser.add_argument(
+        "--precompress-min-size",
+        type=int,
+        default=DEFAULT_MIN_SIZE,
+        metavar="BYTES",
+        help=f"with --precompress, skip smaller files (default: {DEFAULT_MIN_SIZE})",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="rebuild affected pages and assets whenever sources change",
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="with --watch, poll for changes instead of using inotify",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"time each build stage and page, writing a report to {PROFILE_FILE}",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="with --profile, list the N slowest pages (default: 10)",
+    )
+    parser.add_argument(
+        "--cprofile",
+        metavar="FILE",
+        help="also dump cProfile stats of the build process to FILE",
+    )
+    parser.add_argument(
+        "--render-cache-mb",
+        type=int,
+        default=DEFAULT_MAX_MB,
+        metavar="MB",
+        help="size cap of the converted-markdown cache "
+        f"(default: {DEFAULT_MAX_MB}, 0: disabled)",
+    )
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error("--jobs must not be negative")
+    if args.jobs == 0:
+        args.jobs = os.cpu_count() or 1
+    if args.site_url is not None and not args.site_url.startswith(
+        ("http://", "https://")
+    ):
+        parser.error("--site-url must start with http:// or https://")
+    return args
+
+
+def parse_serve_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="main.py serve",
+        description="Serve the site from memory, reloading browsers on changes.",
+    )
+    parser.add_argument(
+        "basepath",
+        nargs="?",
+        default="/",
+        help="URL prefix the site is served from (default: /)",
+    )
+    parser.add_argument(
+        "--host", default="127.0.0.1", help="address to bind (default: 127.0.0.1)"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8888, help="port to listen on (default: 8888)"
+    )
+    parser.add_argument(
+        "--poll",
+        action="store_true",
+        help="poll for changes instead of using inotify",
+    )
+    return parser.parse_args(argv)
+
+
+def build(args, cache=None):
+    """
+    Run one incremental build of the whole site.
+
+    Returns the manifest, the compiled template, the search index (if
+    any) and whether every page built, so watch mode can keep using them.
+    """
+    basepath = args.basepath
+    profile = BuildProfile() if args.profile else None
+
+    # Inputs shared by every page; a change to any of them rebuilds everything
+    inputs = {
+        "generator": GENERATOR_VERSION,
+        "template": hash_file(TEMPLATE_FILE),
+        "basepath": basepath,
+    }
+    if args.minify:
+        inputs["minify"] = True
+    fingerprints = urls = None
+    if args.fingerprint:
+        # Every page links to assets by name, so new names rebuild everything
+        with timed(profile, "fingerprint"):
+            fingerprints = plan_fingerprints(STATIC_DIR)
+        urls = asset_urls(fingerprints)
+        inputs["assets"] = digest(urls)
+    # Sizes end up in the pages showing the images, which the manifest and
+    # the render cache check them against
+    image_cache = ImageSizeCache.load(IMAGE_SIZES_FILE)
+    with timed(profile, "images"):
+        images = image_cache.scan(STATIC_DIR)
+    manifest = BuildManifest.load(MANIFEST_FILE, inputs)
+    search = SearchIndex.load(SEARCH_INDEX_FILE) if args.search else None
+    links = LinkChecker() if args.check_links else None
+
+    # Build into a staging copy of the output so the live site is never
+    # missing or half-written. With nothing known about a previous build,
+    # start from a clean slate.
+    with timed(profile, "stage"):
+        staging_dir = stage_output(PUBLIC_DIR, reuse=not manifest.is_empty)
+
+    ok = False
+    try:
+        with timed(profile, "static"):
+            sync_static(
+                STATIC_DIR,
+                staging_dir,
+                manifest,
+                args.checksum,
+                args.publish,
+                fingerprints=fingerprints,
+            )
+            if urls:
+                write_headers(staging_dir, urls, normalize_basepath(basepath))
+            else:
+                remove_headers(staging_dir, manifest)
+        # Before the pages, so links aren't checked against stale files
+        if search is None:
+            remove_search_index(staging_dir)
+        if args.site_url is None:
+            remove_sitemap(staging_dir, manifest)
+        with timed(profile, "compile"):
+            template = Template.load(TEMPLATE_FILE, basepath, urls, args.minify, images)
+        generate_pages_recursive(
+            CONTENT_DIR,
+            TEMPLATE_FILE,
+            staging_dir,
+            basepath,
+            manifest,
+            template=template,
+            jobs=args.jobs,
+            profile=profile,
+            cache=cache,
+            site_url=args.site_url,
+            search=search,
+            links=links,
+        )
+        manifest.prune(staging_dir)
+        # Also run without --precompress, to delete siblings left from
+        # earlier builds that would now be out of date
+        with timed(profile, "precompress"):
+            precompress_output(
+                staging_dir,
+                manifest,
+                args.precompress_min_size,
+                enabled=args.precompress,
+            )
+        ok = True
+    except BuildError as e:
+        print(f"Error: {e}", file=sys.stderr)
+    finally:
+        if ok:
+            with timed(profile, "swap"):
+                swap_output(staging_dir, PUBLIC_DIR)
+            # Saved after the swap: if we stop in between, the next build
+            # sees outdated hashes and rebuilds rather than trusting them
+            with timed(profile, "manifest"):
+                manifest.save()
+                image_cache.save()
+                if search is not None:
+                    search.save()
+        else:
+            # The live output and the manifest describing it stay as they were
+            discard_output(staging_dir)
+        print(manifest.summary())
+        print(image_cache.summary())
+        if search is not None:
+            print(search.summary())
+        if links is not None and ok:
+            print(links.summary(), file=sys.stderr if links.broken else sys.stdout)
+        if cache is not None:
+            print(cache.summary())
+        if profile is not None:
+            profile.finish()
+            print(profile.summary(args.profile_top))
+            profile.save(PROFILE_FILE, args.profile_top)
+    if not ok:
+        manifest = BuildManifest.load(MANIFEST_FILE, inputs)
+        if search is not None:
+            search = SearchIndex.load(SEARCH_INDEX_FILE)
+    return manifest, template, search, ok
+
+
+def is_under(path, dir_path):
+    return path == dir_path or path.startswith(dir_path + os.sep)
+
+
+def watch(args, manifest, template, search=None, cache=None):
+    """
+    Rebuild whatever a batch of source changes affects, until interrupted.
+    """
+    links = LinkChecker() if args.check_links else None
+    watcher = create_watcher([CONTENT_DIR, STATIC_DIR], [TEMPLATE_FILE], args.poll)
+    print(f"Watching {CONTENT_DIR}/, {STATIC_DIR}/ and {TEMPLATE_FILE} for changes")
+    try:
+        for changes in iter_changes(watcher):
+            started = time.perf_counter()
+            failed = False
+            try:
+                static_changed = any(is_under(path, STATIC_DIR) for path in changes)
+                if TEMPLATE_FILE in changes or static_changed:
+                    # Every page depends on the template, and pages showing
+                    # images or linking to fingerprinted assets depend on
+                    # static files. Unchanged pages are still skipped.
+                    manifest, template, search, _ = build(args, cache)
+                    continue
+
+                content_changes = [
+                    path for path in changes if is_under(path, CONTENT_DIR)
+                ]
+                update_pages(
+                    content_changes,
+                    CONTENT_DIR,
+                    TEMPLATE_FILE,
+                    PUBLIC_DIR,
+                    args.basepath,
+                    manifest,
+                    template=template,
+                    jobs=args.jobs,
+                    cache=cache,
+                    site_url=args.site_url,
+                    search=search,
+                    links=links,
+                )
+                if links is not None:
+                    print(
+                        links.summary(),
+                        file=sys.stderr if links.broken else sys.stdout,
+                    )
+                if args.precompress:
+                    precompress_output(PUBLIC_DIR, manifest, args.precompress_min_size)
+            except BuildError as e:
+                print(f"Error: {e}", file=sys.stderr)
+            except OSError as e:
+                # A source disappeared mid-batch, e.g. an editor saving by
+                # rename. Rather than saving a partly updated manifest, go
+                # back to the saved one: pages written since then look
+                # outdated and are rebuilt instead of trusted.
+                print(f"Error: {e}", file=sys.stderr)
+                failed = True
+            finally:
+                if failed:
+                    manifest = BuildManifest.load(MANIFEST_FILE, manifest.inputs)
+                    if search is not None:
+                        search = SearchIndex.load(SEARCH_INDEX_FILE)
+                else:
+                    manifest.save()
+                    if search is not None:
+                        search.save()
+                elapsed = (time.perf_counter() - started) * 1000
+                print(f"Rebuilt {len(changes)} changed path(s) in {elapsed:.0f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["serve"]:
+        args = parse_serve_args(argv[1:])
+        serve(
+            CONTENT_DIR,
+            STATIC_DIR,
+            TEMPLATE_FILE,
+            args.host,
+            args.port,
+            args.basepath,
+            args.poll,
+        )
+        return
 
-    delete_from_folder(PUBLIC_DIR)
-    copy_files(STATIC_DIR, PUBLIC_DIR)
-    generate_pages_recursive(CONTENT_DIR, TEMPLATE_FILE, PUBLIC_DIR, basepath)
+    args = parse_args(argv)
+    cache = None
+    if args.render_cache_mb > 0:
+        cache = RenderCache(RENDER_CACHE_FILE, args.render_cache_mb * 1_000_000)
+    try:
+        if args.cprofile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                manifest, template, search, ok = build(args, cache)
+            finally:
+                profiler.disable()
+                profiler.dump_stats(args.cprofile)
+        else:
+            manifest, template, search, ok = build(args, cache)
+        if args.watch:
+            watch(args, manifest, template, search, cache)
+        elif not ok:
+            sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
 
 if __name__ == "__main__":
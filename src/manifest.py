@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+import time
+
+# Bump whenever a change to the generator alters the HTML it produces (or
+# the layout of the manifest), so that every page is rebuilt on the next run.
+GENERATOR_VERSION = "9"
+
+CACHE_DIR = ".ssg-cache"
+MANIFEST_FILE = os.path.join(CACHE_DIR, "manifest.json")
+
+
+def hash_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(file_path):
+    with open(file_path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def sizes_match(shown, sizes):
+    """
+    Check that images noted by ShownImages still have the sizes they were
+    shown at, with sizes (None for none known) mapping URLs to sizes.
+    """
+    sizes = sizes or {}
+    for url, size in shown.items():
+        current = sizes.get(url)
+        if (None if current is None else list(current)) != size:
+            return False
+    return True
+
+
+class BuildManifest:
+    """
+    Persistent record of the inputs each generated page was built from.
+
+    Pages are keyed by their markdown source path and record their output
+    path relative to the output directory, so a build can write into a
+    staging copy of that directory, the sizes of the images they show, so
+    only pages showing a changed image are rebuilt, and, once links are
+    checked, the URLs they link to. Inputs shared by every
+    page (generator version, template hash, basepath) are stored once; if
+    any of them differ from the previous build, every page is stale, but
+    its output path is kept so it can be pruned if its source is gone.
+
+    Static assets are tracked separately, keyed by their path relative to
+    the static directory, since they don't depend on the shared inputs.
+    So are precompressed outputs, keyed by their path relative to the
+    output directory, and the time each source's hash last changed, which
+    must survive a change of the shared inputs.
+    """
+
+    def __init__(self, path, inputs):
+        self.path = path
+        self.inputs = inputs
+        self.pages = {}
+        self.assets = {}
+        # Output path -> hash and siblings of every precompressed file
+        self.compressed = {}
+        # Source path -> its hash and the time that hash last changed
+        self.lastmod = {}
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
+        self.asset_hits = 0
+        self.asset_misses = 0
+        self.asset_removed = 0
+        self.compress_hits = 0
+        self.compress_misses = 0
+        self.compress_removed = 0
+
+    @classmethod
+    def load(cls, path, inputs):
+        manifest = cls(path, inputs)
+        if not os.path.exists(path):
+            return manifest
+
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            # A corrupt manifest just means a full rebuild
+            return manifest
+
+        manifest.assets = data.get("assets", {})
+        manifest.compressed = data.get("compressed", {})
+        manifest.lastmod = data.get("lastmod", {})
+        manifest.pages = data.get("pages", {})
+        if data.get("inputs") != inputs:
+            # Pages built from different shared inputs can't be reused, but
+            # their outputs are still known, so the ones left stale can be
+            # deleted
+            manifest.pages = {
+                source_path: {"dest": entry["dest"]}
+                for source_path, entry in manifest.pages.items()
+            }
+        return manifest
+
+    @property
+    def is_empty(self):
+        return not self.pages and not self.assets
+
+    def is_fresh(self, source_path, source_hash, dest_path, root_dir, images=None):
+        """
+        Check whether a page can be skipped, counting the result as a hit or miss.
+
+        With the current image sizes as images, a page showing an image at
+        another size isn't.
+        """
+        self.seen.add(source_path)
+        entry = self.pages.get(source_path)
+        if (
+            entry is not None
+            and entry.get("hash") == source_hash
+            and entry["dest"] == os.path.relpath(dest_path, root_dir)
+            and (
+                images is None
+                or ("images" in entry and sizes_match(entry["images"], images))
+            )
+            and os.path.exists(dest_path)
+        ):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(
+        self, source_path, source_hash, dest_path, root_dir, links=None, images=None
+    ):
+        self.seen.add(source_path)
+        entry = {"hash": source_hash, "dest": os.path.relpath(dest_path, root_dir)}
+        if images is not None:
+            entry["images"] = images
+        if links is not None:
+            entry["links"] = list(dict.fromkeys(links))
+        self.pages[source_path] = entry
+
+    def links_of(self, source_path):
+        """
+        The URLs a page links to, or None if they weren't collected.
+        """
+        entry = self.pages.get(source_path)
+        return None if entry is None else entry.get("links")
+
+    def note_source(self, source_path, source_hash, now=None):
+        """
+        Record the time a source's content last changed, for sitemaps.
+        """
+        entry = self.lastmod.get(source_path)
+        if entry is None or entry["hash"] != source_hash:
+            if now is None:
+                now = time.time()
+            self.lastmod[source_path] = {
+                "hash": source_hash,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)),
+            }
+
+    def lastmod_of(self, source_path):
+        entry = self.lastmod.get(source_path)
+        return None if entry is None else entry["time"]
+
+    def prune(self, root_dir):
+        """
+        Delete outputs whose sources no longer exist and drop their entries.
+        """
+        for source_path in list(self.pages):
+            if source_path not in self.seen:
+                self.remove_page(source_path, root_dir)
+
+    def remove_page(self, source_path, root_dir):
+        """
+        Delete the output generated from source_path and drop its entry.
+        """
+        self.lastmod.pop(source_path, None)
+        dest_path = os.path.join(root_dir, self.pages.pop(source_path)["dest"])
+        if os.path.exists(dest_path):
+            print(f"Removing stale page: {dest_path}")
+            os.remove(dest_path)
+            remove_empty_dirs(os.path.dirname(dest_path), root_dir)
+        self.removed += 1
+
+    def save(self):
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(
+                {
+                    "inputs": self.inputs,
+                    "pages": self.pages,
+                    "assets": self.assets,
+                    "compressed": self.compressed,
+                    "lastmod": self.lastmod,
+                },
+                file,
+                indent=2,
+            )
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        summary = (
+            f"Page cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.removed} removed\n"
+            f"Static assets: {self.asset_hits} unchanged, "
+            f"{self.asset_misses} copied, {self.asset_removed} removed"
+        )
+        if self.compressed or self.compress_removed:
+            summary += (
+                f"\nPrecompressed: {self.compress_hits} unchanged, "
+                f"{self.compress_misses} compressed, {self.compress_removed} removed"
+            )
+        return summary
+
+
+def remove_empty_dirs(dir_path, root_dir):
+    """
+    Remove empty directories from dir_path upwards, stopping at root_dir.
+    """
+    root_dir = os.path.abspath(root_dir)
+    dir_path = os.path.abspath(dir_path)
+    while dir_path != root_dir and dir_path.startswith(root_dir + os.sep):
+        if os.listdir(dir_path):
+            break
+        os.rmdir(dir_path)
+        dir_path = os.path.dirname(dir_path)
@@ -0,0 +1,175 @@
+from html.parser import HTMLParser
+
+from htmlnode import PRESERVE_WHITESPACE_TAGS, WHITESPACE_RE, format_attribute
+
+# Elements that never render the whitespace around them
+BLOCK_TAGS = {
+    "html",
+    "head",
+    "body",
+    "title",
+    "meta",
+    "link",
+    "base",
+    "article",
+    "aside",
+    "blockquote",
+    "details",
+    "dialog",
+    "dd",
+    "div",
+    "dl",
+    "dt",
+    "fieldset",
+    "figcaption",
+    "figure",
+    "footer",
+    "form",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "header",
+    "hgroup",
+    "hr",
+    "li",
+    "main",
+    "nav",
+    "ol",
+    "p",
+    "pre",
+    "section",
+    "summary",
+    "table",
+    "tbody",
+    "td",
+    "tfoot",
+    "th",
+    "thead",
+    "tr",
+    "ul",
+}
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "source",
+    "track",
+    "wbr",
+}
+
+
+class Minifier(HTMLParser):
+    """
+    Re-emits an HTML document without comments, insignificant whitespace,
+    unneeded attribute quotes or the closing slash of void elements.
+
+    Whitespace next to block-level elements is dropped and other runs of it
+    collapse to one space. The contents of pre, code, textarea, script and
+    style elements are kept exactly as written.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.out = []
+        # Depth of elements whose contents are kept as written
+        self.preserve = 0
+        # Whether the last thing written was a block-level tag (or nothing)
+        self.after_block = True
+        # Collapsed whitespace that is only written if inline content follows
+        self.pending = ""
+
+    def write_tag(self, tag, markup):
+        if tag in BLOCK_TAGS:
+            self.pending = ""
+        self.out.append(self.pending)
+        self.out.append(markup)
+        self.pending = ""
+        self.after_block = tag in BLOCK_TAGS
+
+    def attributes(self, attrs, minify=True):
+        formatted = ""
+        for name, value in attrs:
+            if value is None:
+                formatted += f" {name}"
+            else:
+                value = value.replace("&", "&amp;").replace('"', "&quot;")
+                formatted += " " + format_attribute(name, value, minify)
+        return formatted
+
+    def text(self, data):
+        if self.preserve:
+            self.out.append(data)
+            return
+        data = WHITESPACE_RE.sub(" ", data)
+        if self.after_block or self.pending:
+            data = data.lstrip()
+        if not data:
+            return
+        self.out.append(self.pending)
+        if data.endswith(" "):
+            data = data[:-1]
+            self.pending = " "
+        else:
+            self.pending = ""
+        self.out.append(data)
+        self.after_block = False
+
+    def handle_starttag(self, tag, attrs):
+        self.write_tag(tag, f"<{tag}{self.attributes(attrs)}>")
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self.preserve += 1
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            self.write_tag(tag, f"<{tag}{self.attributes(attrs)}>")
+        else:
+            # Self-closing SVG and MathML elements keep their slash, which
+            # an unquoted value would swallow
+            self.write_tag(tag, f"<{tag}{self.attributes(attrs, False)}/>")
+
+    def handle_endtag(self, tag):
+        if tag in PRESERVE_WHITESPACE_TAGS and self.preserve:
+            self.preserve -= 1
+        self.write_tag(tag, f"</{tag}>")
+
+    def handle_data(self, data):
+        self.text(data)
+
+    def handle_entityref(self, name):
+        self.text(f"&{name};")
+
+    def handle_charref(self, name):
+        self.text(f"&#{name};")
+
+    def handle_decl(self, decl):
+        self.out.append(f"<!{decl}>")
+        self.after_block = True
+
+    def unknown_decl(self, data):
+        self.out.append(f"<![{data}]>")
+
+    def handle_pi(self, data):
+        self.out.append(f"<?{data}>")
+
+    def handle_comment(self, data):
+        pass
+
+
+def minify_html(html):
+    """
+    Minify an HTML document or fragment, see Minifier.
+    """
+    minifier = Minifier()
+    minifier.feed(html)
+    minifier.close()
+    return "".join(minifier.out)
@@ -0,0 +1,101 @@
+import ctypes
+import ctypes.util
+import os
+import shutil
+import sys
+
+from assets import publish_file, walk_files
+
+STAGING_SUFFIX = ".staging"
+
+# From <fcntl.h> and <linux/fs.h>
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def staging_dir_for(output_dir):
+    """
+    The staging directory sits next to the output so the swap is a rename
+    within one filesystem.
+    """
+    return os.path.normpath(output_dir) + STAGING_SUFFIX
+
+
+def stage_output(output_dir, reuse=True):
+    """
+    Create a fresh staging directory for a build of output_dir.
+
+    With reuse=True the current output is mirrored into it with hardlinks,
+    so unchanged files cost one link each instead of a copy. Pages and
+    assets are always replaced by renaming or unlinking, never written
+    through, so the live files behind those links are left untouched.
+    """
+    staging_dir = staging_dir_for(output_dir)
+    # Left behind by a build that was interrupted
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(staging_dir)
+
+    if reuse and os.path.isdir(output_dir):
+        for dir_path, dir_names, _ in os.walk(output_dir):
+            rel_dir = os.path.relpath(dir_path, output_dir)
+            for dir_name in dir_names:
+                os.makedirs(os.path.join(staging_dir, rel_dir, dir_name))
+        for rel_path in walk_files(output_dir):
+            publish_file(
+                os.path.join(output_dir, rel_path),
+                os.path.join(staging_dir, rel_path),
+                "hardlink",
+            )
+    return staging_dir
+
+
+def exchange_paths(path_a, path_b):
+    """
+    Atomically swap two paths with renameat2(RENAME_EXCHANGE).
+
+    Raises OSError where the platform or filesystem doesn't support it.
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("renameat2 is only available on Linux")
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    try:
+        renameat2 = libc.renameat2
+    except AttributeError:
+        # glibc older than 2.28
+        raise OSError("renameat2 is not available")
+    result = renameat2(
+        AT_FDCWD, os.fsencode(path_a), AT_FDCWD, os.fsencode(path_b), RENAME_EXCHANGE
+    )
+    if result != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno), path_a)
+
+
+def swap_output(staging_dir, output_dir):
+    """
+    Replace output_dir with staging_dir and delete the previous output.
+
+    Readers of output_dir see either the old tree or the new one. Where an
+    atomic exchange isn't supported, the old tree is renamed out of the way
+    first, leaving output_dir missing for the moment between two renames.
+    """
+    if not os.path.exists(output_dir):
+        os.rename(staging_dir, output_dir)
+        return
+
+    try:
+        exchange_paths(staging_dir, output_dir)
+        old_dir = staging_dir
+    except OSError:
+        old_dir = output_dir + ".old"
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        os.rename(output_dir, old_dir)
+        os.rename(staging_dir, output_dir)
+    shutil.rmtree(old_dir)
+
+
+def discard_output(staging_dir):
+    if os.path.exists(staging_dir):
+        shutil.rmtree(staging_dir)
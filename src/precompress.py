@@ -0,0 +1,130 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from assets import walk_files
+from manifest import hash_file, remove_empty_dirs
+
+try:
+    from compression import zstd
+except ImportError:  # Python before 3.14
+    zstd = None
+
+COMPRESS_EXTENSIONS = {".html", ".css", ".svg"}
+# Below this many bytes a compressed response saves next to nothing
+DEFAULT_MIN_SIZE = 1024
+
+GZIP_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+def gzip_compress(data):
+    # A fixed mtime keeps the output identical from build to build
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def zstd_compress(data):
+    return zstd.compress(data, level=ZSTD_LEVEL)
+
+
+# Sibling suffix -> compressor, for every format this Python can write
+ENCODINGS = {".gz": gzip_compress}
+if zstd is not None:
+    ENCODINGS[".zst"] = zstd_compress
+
+
+def write_sibling(path, data):
+    # Renamed into place: the old sibling may be a hardlink into the live output
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+def remove_siblings(file_path, suffixes):
+    for suffix in suffixes:
+        if os.path.exists(file_path + suffix):
+            os.remove(file_path + suffix)
+
+
+def compress_file(file_path, previous, suffixes):
+    """
+    Write the compressed siblings of file_path unless its hash is unchanged.
+
+    Returns the file's new record and whether anything was compressed. A
+    sibling that comes out no smaller than the file itself is left out.
+    """
+    file_hash = hash_file(file_path)
+    if (
+        previous is not None
+        and previous["hash"] == file_hash
+        and previous["encodings"] == suffixes
+        and all(os.path.exists(file_path + suffix) for suffix in previous["siblings"])
+    ):
+        return previous, False
+
+    with open(file_path, "rb") as file:
+        data = file.read()
+    siblings = []
+    for suffix in suffixes:
+        compressed = ENCODINGS[suffix](data)
+        if len(compressed) < len(data):
+            write_sibling(file_path + suffix, compressed)
+            siblings.append(suffix)
+    old_siblings = [] if previous is None else previous["siblings"]
+    remove_siblings(file_path, set(old_siblings) - set(siblings))
+    return {"hash": file_hash, "encodings": suffixes, "siblings": siblings}, True
+
+
+def precompress_output(
+    output_dir, manifest, min_size=DEFAULT_MIN_SIZE, threads=None, enabled=True
+):
+    """
+    Keep .gz (and, where available, .zst) siblings next to the HTML, CSS
+    and SVG files in output_dir that are at least min_size bytes.
+
+    Files whose content hash matches the manifest keep their siblings; the
+    rest are compressed on a pool of threads, which zlib and zstd release
+    the GIL for. Siblings of files that are gone, shrank below min_size or
+    (with enabled=False) all of them are deleted, so a server never picks
+    a sibling that is out of date.
+    """
+    suffixes = list(ENCODINGS)
+    candidates = []
+    if enabled:
+        for rel_path in walk_files(output_dir):
+            if os.path.splitext(rel_path)[1].lower() not in COMPRESS_EXTENSIONS:
+                continue
+            if os.path.getsize(os.path.join(output_dir, rel_path)) >= min_size:
+                candidates.append(rel_path)
+
+    compressed = {}
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [
+            (
+                rel_path,
+                executor.submit(
+                    compress_file,
+                    os.path.join(output_dir, rel_path),
+                    manifest.compressed.get(rel_path),
+                    suffixes,
+                ),
+            )
+            for rel_path in candidates
+        ]
+        for rel_path, future in futures:
+            record, changed = future.result()
+            compressed[rel_path] = record
+            if changed:
+                manifest.compress_misses += 1
+            else:
+                manifest.compress_hits += 1
+
+    for rel_path in manifest.compressed.keys() - compressed.keys():
+        file_path = os.path.join(output_dir, rel_path)
+        remove_siblings(file_path, manifest.compressed[rel_path]["siblings"])
+        if os.path.isdir(os.path.dirname(file_path)):
+            remove_empty_dirs(os.path.dirname(file_path), output_dir)
+        manifest.compress_removed += 1
+
+    manifest.compressed = compressed
@@ -0,0 +1,101 @@
+import contextlib
+import json
+import os
+import time
+
+from manifest import CACHE_DIR
+
+PROFILE_FILE = os.path.join(CACHE_DIR, "profile.json")
+
+# Stages timed for every generated page, in the order they run
+PAGE_STAGES = ("read", "parse", "serialize", "template", "write")
+
+
+class BuildProfile:
+    """
+    Wall-clock timings for one build, per stage and per page.
+
+    Build-wide stages (static sync, hashing, ...) are timed with stage().
+    Page stages are timed inside generate_page, which may run in a worker
+    process, so each page's timings are handed back and added here.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.stages = {}
+        # Source path -> {stage: seconds}
+        self.pages = {}
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add_page(self, source_path, timings):
+        self.pages[source_path] = timings
+        for name, seconds in timings.items():
+            self.add(name, seconds)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+
+    def slowest(self, count):
+        """
+        Return the count slowest (source path, seconds) pairs, slowest first.
+        """
+        totals = [(path, sum(timings.values())) for path, timings in self.pages.items()]
+        totals.sort(key=lambda item: item[1], reverse=True)
+        return totals[:count]
+
+    def to_dict(self, top=10):
+        return {
+            "elapsed": self.elapsed,
+            "pages_generated": len(self.pages),
+            "stages": self.stages,
+            "slowest": [
+                {"path": path, "seconds": seconds}
+                for path, seconds in self.slowest(top)
+            ],
+            "pages": self.pages,
+        }
+
+    def summary(self, top=10):
+        total = sum(self.stages.values()) or 1.0
+        lines = [
+            f"Profile: {len(self.pages)} page(s) generated in {self.elapsed:.3f} s"
+        ]
+        # Page stages are summed across workers, so with --jobs they can add
+        # up to more than the elapsed time
+        for name, seconds in sorted(
+            self.stages.items(), key=lambda item: item[1], reverse=True
+        ):
+            lines.append(f"  {name:<10} {seconds:9.3f} s {seconds / total:6.1%}")
+        slowest = self.slowest(top)
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} page(s):")
+            for path, seconds in slowest:
+                lines.append(f"  {seconds * 1000:9.2f} ms  {path}")
+        return "\n".join(lines)
+
+    def save(self, path, top=10):
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(top), file, indent=2)
+
+
+def timed(profile, name):
+    """
+    Time a block as stage name of profile, or do nothing when profile is None.
+    """
+    if profile is None:
+        return contextlib.nullcontext()
+    return profile.stage(name)
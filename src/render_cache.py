@@ -0,0 +1,350 @@
+import json
+import os
+import sqlite3
+import time
+import zlib
+from urllib.request import pathname2url
+
+from manifest import CACHE_DIR, GENERATOR_VERSION, hash_bytes, sizes_match
+
+RENDER_CACHE_FILE = os.path.join(CACHE_DIR, "render.sqlite3")
+DEFAULT_MAX_MB = 256
+# Fastest zlib level: pages are compressed on every miss, and higher levels
+# cost several times as much for a few percent less space
+COMPRESS_LEVEL = 1
+
+# Bump whenever SCHEMA changes; older databases are emptied and recreated
+SCHEMA_VERSION = 5
+SCHEMA = """
+CREATE TABLE entries (
+    key TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    html BLOB NOT NULL,
+    images TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE TABLE blocks (
+    key TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    terms TEXT,
+    links TEXT,
+    images TEXT,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+"""
+TABLES = ("entries", "blocks")
+# What was found in a block besides its HTML, as JSON: its search terms,
+# the URLs it links to and the sizes of the images it shows. Terms and
+# links are NULL until a build needs them, images for blocks showing none.
+BLOCK_DATA_COLUMNS = ("terms", "links", "images")
+BLOCK_SIZE = " + ".join(
+    ["LENGTH(CAST(html AS BLOB))"]
+    + [f"COALESCE(LENGTH(CAST({column} AS BLOB)), 0)" for column in BLOCK_DATA_COLUMNS]
+)
+# Stay well below SQLite's limit on parameters per statement
+MAX_PARAMS = 500
+# Pages from bigger sources bypass the cache and are streamed straight to
+# disk, as caching them means holding the whole page in memory
+MAX_SOURCE_BYTES = 2_000_000
+
+# Read-only connections by process id and cache path. A forked worker
+# inherits its parent's, but SQLite connections must not be used across a
+# fork, so each process only ever uses the ones it opened itself.
+_readers = {}
+
+
+def render_key(source_hash, render_context):
+    """
+    Content HTML depends only on the markdown, the parser and the template's
+    render_context: the basepath, any fingerprinted asset names and whether
+    output is minified.
+    """
+    return f"{GENERATOR_VERSION}:{render_context}:{source_hash}"
+
+
+def block_key(block, render_context):
+    """
+    A block's HTML depends only on its markdown, the parser and the
+    template's render_context.
+    """
+    block_hash = hash_bytes(block.encode("utf-8"))
+    return f"{GENERATOR_VERSION}:{render_context}:{block_hash}"
+
+
+def encode_data(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_entry(row):
+    title, html = row
+    return title, zlib.decompress(html).decode("utf-8")
+
+
+class RenderCache:
+    """
+    On-disk cache of rendered page content, shared across builds.
+
+    Each entry holds a page's title and the HTML of its markdown_to_html_node
+    tree, zlib-compressed, keyed by render_key. Below the pages, the HTML
+    fragment of every block is kept by block_key, so a page that changed
+    only converts its changed blocks again. Fragments are small and stored
+    uncompressed, along with the block's search terms and link URLs once a
+    build has needed them. Pages and blocks showing images keep the sizes
+    they show them at, and are only reused while those sizes still hold,
+    so a changed image doesn't invalidate anything not showing it.
+
+    Only the build process writes; pool workers read through read_only()
+    connections, which WAL mode lets run alongside the writer. Once pages
+    and blocks together exceed max_bytes, the least recently used are
+    evicted. Sources over MAX_SOURCE_BYTES are never cached.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_MB * 1_000_000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.block_hits = 0
+        self.block_misses = 0
+        self.evicted = 0
+        dir_name = os.path.dirname(path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        try:
+            self.connection = self.connect()
+        except sqlite3.OperationalError:
+            # Locked by another build or unreadable, which says nothing
+            # about its contents; those are kept
+            raise
+        except sqlite3.DatabaseError:
+            # A corrupt cache just means rendering everything again. Its
+            # write-ahead log and shared memory go too, as they would be
+            # replayed into the new database.
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+            self.connection = self.connect()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != SCHEMA_VERSION:
+                with connection:
+                    for table in TABLES:
+                        connection.execute(f"DROP TABLE IF EXISTS {table}")
+                    connection.executescript(SCHEMA)
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except sqlite3.Error:
+            connection.close()
+            raise
+        return connection
+
+    @staticmethod
+    def read_only(path):
+        """
+        Return this process's read-only connection to the cache at path.
+        """
+        reader_key = (os.getpid(), path)
+        connection = _readers.get(reader_key)
+        if connection is None:
+            uri = f"file:{pathname2url(os.path.abspath(path))}?mode=ro"
+            connection = sqlite3.connect(uri, uri=True, timeout=30)
+            _readers[reader_key] = connection
+        return connection
+
+    @staticmethod
+    def lookup(connection, key, images=None, shown=None):
+        """
+        Return (title, content HTML) for key, or None on a miss.
+
+        An entry showing images at other sizes than those in images (None
+        for none known) is a miss. Pass a dict as shown to add the sizes of
+        the images a hit shows to it.
+        """
+        try:
+            row = connection.execute(
+                "SELECT title, html, images FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        entry_shown = {} if row[2] is None else json.loads(row[2])
+        if not sizes_match(entry_shown, images):
+            return None
+        if shown is not None:
+            shown.update(entry_shown)
+        return decode_entry(row[:2])
+
+    @staticmethod
+    def lookup_blocks(connection, keys):
+        """
+        Return a dict of the HTML fragments known for the given block keys.
+        """
+        keys = list(dict.fromkeys(keys))
+        fragments = {}
+        try:
+            for start in range(0, len(keys), MAX_PARAMS):
+                batch = keys[start : start + MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                fragments.update(
+                    connection.execute(
+                        f"SELECT key, html FROM blocks WHERE key IN ({placeholders})",
+                        batch,
+                    )
+                )
+        except sqlite3.Error:
+            return {}
+        return fragments
+
+    @staticmethod
+    def lookup_block_data(connection, keys, column):
+        """
+        Return a dict of what is known in column (one of BLOCK_DATA_COLUMNS)
+        for the given block keys.
+        """
+        if column not in BLOCK_DATA_COLUMNS:
+            raise ValueError(f"Unknown block data: {column}")
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        try:
+            for start in range(0, len(keys), MAX_PARAMS):
+                batch = keys[start : start + MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                for key, data in connection.execute(
+                    f"SELECT key, {column} FROM blocks "
+                    f"WHERE key IN ({placeholders}) AND {column} IS NOT NULL",
+                    batch,
+                ):
+                    found[key] = json.loads(data)
+        except sqlite3.Error:
+            return {}
+        return found
+
+    def get(self, key, images=None):
+        return self.lookup(self.connection, key, images)
+
+    def get_blocks(self, keys):
+        return self.lookup_blocks(self.connection, keys)
+
+    def get_block_data(self, keys, column):
+        return self.lookup_block_data(self.connection, keys, column)
+
+    def update(
+        self,
+        hits,
+        entries,
+        block_hits=(),
+        block_entries=(),
+        block_terms=(),
+        block_links=(),
+        block_images=(),
+    ):
+        """
+        Mark the keys in hits as used and store new (key, title, html,
+        shown) entries, shown being the sizes of the images the page shows
+        as noted by ShownImages.
+
+        Block keys in block_hits and new (key, html) block fragments in
+        block_entries are handled the same way. The (key, terms) pairs in
+        block_terms, (key, URLs) pairs in block_links and (key, shown)
+        pairs in block_images are stored with blocks already in the cache.
+        """
+        now = time.time()
+        self.hits += len(hits)
+        self.misses += len(entries)
+        self.block_hits += len(block_hits)
+        self.block_misses += len(block_entries)
+        rows = []
+        for key, title, html, shown in entries:
+            data = zlib.compress(html.encode("utf-8"), COMPRESS_LEVEL)
+            images = encode_data(shown) if shown else None
+            size = len(data) + len(title) + len(images or "")
+            rows.append((key, title, data, images, size, now))
+        block_rows = [
+            (key, html, len(html.encode("utf-8")), now) for key, html in block_entries
+        ]
+        data_rows = {
+            column: [(encode_data(data), key) for key, data in pairs]
+            for column, pairs in zip(
+                BLOCK_DATA_COLUMNS, (block_terms, block_links, block_images)
+            )
+        }
+        sized_keys = {
+            key for column_rows in data_rows.values() for _, key in column_rows
+        }
+        with self.connection:
+            for table, keys in (("entries", hits), ("blocks", block_hits)):
+                self.connection.executemany(
+                    f"UPDATE {table} SET used = ? WHERE key = ?",
+                    [(now, key) for key in keys],
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self.connection.executemany(
+                # Terms and links found before stay valid: the key covers
+                # everything the block's contents depend on. The sizes of
+                # its images, which the key leaves out, come with the
+                # fragment in block_images.
+                "INSERT INTO blocks (key, html, size, used) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET html = excluded.html, "
+                f"size = {BLOCK_SIZE}, used = excluded.used",
+                block_rows,
+            )
+            for column, column_rows in data_rows.items():
+                self.connection.executemany(
+                    f"UPDATE blocks SET {column} = ? WHERE key = ?", column_rows
+                )
+            self.connection.executemany(
+                f"UPDATE blocks SET size = {BLOCK_SIZE} WHERE key = ?",
+                [(key,) for key in sized_keys],
+            )
+        self.evict()
+
+    def evict(self):
+        """
+        Delete the least recently used entries until the cache fits max_bytes.
+        """
+        total = sum(
+            self.connection.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM {table}"
+            ).fetchone()[0]
+            for table in TABLES
+        )
+        if total <= self.max_bytes:
+            return
+
+        excess = total - self.max_bytes
+        doomed = {table: [] for table in TABLES}
+        for table, key, size, _ in self.connection.execute(
+            "SELECT 'entries', key, size, used FROM entries "
+            "UNION ALL SELECT 'blocks', key, size, used FROM blocks ORDER BY used"
+        ):
+            doomed[table].append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self.connection:
+            for table, keys in doomed.items():
+                self.connection.executemany(f"DELETE FROM {table} WHERE key = ?", keys)
+                self.evicted += len(keys)
+
+    def summary(self):
+        return (
+            f"Render cache: {self.hits} hits, {self.misses} misses, "
+            f"{self.block_hits} blocks reused, {self.block_misses} blocks "
+            f"converted, {self.evicted} evicted"
+        )
+
+    def close(self):
+        self.connection.close()
+        # Pages generated in this process read through their own connection
+        reader = _readers.pop((os.getpid(), self.path), None)
+        if reader is not None:
+            reader.close()
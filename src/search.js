@@ -0,0 +1,79 @@
+// Client for the search index written by main.py --search. Lists the pages
+// matching what is typed into input[data-search] in [data-search-results],
+// fetching only the index shards of the words typed.
+(() => {
+  const base = new URL(".", document.currentScript.src);
+  const files = new Map();
+  const load = (name) => {
+    if (!files.has(name)) {
+      const url = new URL(name, base);
+      files.set(name, fetch(url).then((response) => (response.ok ? response.json() : {})));
+    }
+    return files.get(name);
+  };
+
+  // Words and shard names as search.py makes them
+  const words = (text) =>
+    (text.toLowerCase().match(/[\p{L}\p{N}_]+/gu) || []).filter(
+      (word) => Array.from(word).length >= 2,
+    );
+  const shardName = (word) =>
+    Array.from(word)
+      .slice(0, 2)
+      .map((char) => (/[a-z0-9]/.test(char) ? char : `_${char.codePointAt(0).toString(16)}_`))
+      .join("");
+
+  // Pages containing a word starting with every word of the query, best first
+  const search = async (query) => {
+    const matches = await Promise.all(
+      words(query).map(async (word) => {
+        const shard = await load(`${shardName(word)}.json`);
+        const scores = new Map();
+        for (const [term, postings] of Object.entries(shard)) {
+          if (term.startsWith(word)) {
+            for (const [id, weight] of postings) {
+              scores.set(id, (scores.get(id) || 0) + weight);
+            }
+          }
+        }
+        return scores;
+      }),
+    );
+    if (!matches.length) {
+      return [];
+    }
+    const [first, ...rest] = matches;
+    const ranked = [];
+    for (const [id, score] of first) {
+      if (rest.every((scores) => scores.has(id))) {
+        ranked.push([rest.reduce((total, scores) => total + scores.get(id), score), id]);
+      }
+    }
+    ranked.sort((a, b) => b[0] - a[0] || a[1] - b[1]);
+    const pages = await load("pages.json");
+    return ranked.slice(0, 20).map(([, id]) => pages[id]).filter(Boolean);
+  };
+
+  const results = document.querySelector("[data-search-results]");
+  for (const input of document.querySelectorAll("input[data-search]")) {
+    let latest = 0;
+    input.addEventListener("input", async () => {
+      const run = ++latest;
+      const pages = await search(input.value);
+      // A later keystroke has already started another search
+      if (run !== latest || !results) {
+        return;
+      }
+      results.replaceChildren(
+        ...pages.map(([url, title]) => {
+          const item = document.createElement("li");
+          const link = document.createElement("a");
+          link.href = url;
+          link.textContent = title;
+          item.append(link);
+          return item;
+        }),
+      );
+    });
+  }
+})();
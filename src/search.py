@@ -0,0 +1,249 @@
+import json
+import os
+import re
+import shutil
+from string import ascii_lowercase, digits
+
+from manifest import CACHE_DIR
+from sitemap import page_path, write_atomically
+
+SEARCH_INDEX_FILE = os.path.join(CACHE_DIR, "search.json")
+# Output directory of the index shards, the page list and the client script
+SEARCH_DIR = "search-index"
+PAGES_FILE = "pages.json"
+SCRIPT_FILE = "search.js"
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), SCRIPT_FILE)
+
+# Terms are sharded by their first characters, so a query only loads the
+# shards of the words typed so far
+PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 2
+TERM_RE = re.compile(r"\w+")
+SHARD_NAME_CHARS = frozenset(ascii_lowercase + digits)
+# Words in headings count for more, so the pages about a word rank first
+TAG_WEIGHTS = {"h1": 8, "h2": 4, "h3": 2}
+
+
+def add_terms(text, terms, weight=1):
+    """
+    Add the weight of every word in text to the terms dict.
+    """
+    for term in TERM_RE.findall(text.lower()):
+        if len(term) >= MIN_TERM_LENGTH:
+            terms[term] = terms.get(term, 0) + weight
+
+
+def shard_name(term):
+    # Characters other than a-z and 0-9 are spelled out, as search.js does
+    return "".join(
+        char if char in SHARD_NAME_CHARS else f"_{ord(char):x}_"
+        for char in term[:PREFIX_LENGTH]
+    )
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def write_if_changed(path, text):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            if file.read() == text:
+                return False
+    except OSError:
+        pass
+    write_atomically(path, lambda file: file.write(text))
+    return True
+
+
+def remove_search_index(dest_dir_path):
+    """
+    Delete the search index written to dest_dir_path, if any.
+    """
+    search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+    if os.path.isdir(search_dir):
+        shutil.rmtree(search_dir)
+
+
+class SearchIndex:
+    """
+    Inverted index of the words on every page, kept across builds.
+
+    Each page is indexed from the TextNodes it is converted through, and
+    only again once its source hash changes. Terms are grouped into shards
+    by their first PREFIX_LENGTH characters; a shard file maps each of its
+    terms to the [page id, weight] pairs of the pages using it. Page ids
+    index pages.json, a list of [URL, title] pairs. Ids stay with a page
+    for as long as it exists, so rebuilding some pages only rewrites the
+    shards of the terms they gained or lost.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Source path -> hash, output path, title, id and terms of each page
+        self.pages = {}
+        # Shard name -> term -> page id (as a string) -> weight
+        self.shards = {}
+        self.seen = set()
+        self.dirty = set()
+        self.used_ids = set()
+        self.next_id = 0
+        self.indexed = 0
+        self.removed = 0
+        self.written = 0
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            index.pages = data["pages"]
+            index.shards = data["shards"]
+        except (OSError, ValueError, KeyError):
+            # A missing or corrupt index just means indexing every page
+            index.pages = {}
+            index.shards = {}
+        index.used_ids = {entry["id"] for entry in index.pages.values()}
+        return index
+
+    def is_fresh(self, source_path, source_hash):
+        """
+        Check whether a page is indexed as of the given source hash.
+        """
+        self.seen.add(source_path)
+        entry = self.pages.get(source_path)
+        return entry is not None and entry["hash"] == source_hash
+
+    def allocate_id(self):
+        while self.next_id in self.used_ids:
+            self.next_id += 1
+        self.used_ids.add(self.next_id)
+        return self.next_id
+
+    def release_id(self, page_id):
+        self.used_ids.discard(page_id)
+        self.next_id = min(self.next_id, page_id)
+
+    def set_weight(self, page_id, term, weight):
+        """
+        Set a page's weight for a term, or drop the term from the page with
+        a weight of None, marking the shard dirty if anything changed.
+        """
+        name = shard_name(term)
+        shard = self.shards.get(name, {})
+        pages = shard.get(term, {})
+        if pages.get(page_id) == weight:
+            return
+        if weight is None:
+            del pages[page_id]
+            if not pages:
+                del shard[term]
+            if not shard:
+                del self.shards[name]
+        else:
+            self.shards.setdefault(name, shard).setdefault(term, pages)[
+                page_id
+            ] = weight
+        self.dirty.add(name)
+
+    def record(self, source_path, source_hash, dest_rel_path, title, terms):
+        """
+        Index a page under its source path, replacing its previous terms.
+        """
+        self.seen.add(source_path)
+        entry = self.pages.get(source_path)
+        if entry is None:
+            page_id = self.allocate_id()
+            old_terms = []
+        else:
+            page_id = entry["id"]
+            old_terms = entry["terms"]
+        for term in old_terms:
+            if term not in terms:
+                self.set_weight(str(page_id), term, None)
+        for term, weight in terms.items():
+            self.set_weight(str(page_id), term, weight)
+        self.pages[source_path] = {
+            "hash": source_hash,
+            "dest": dest_rel_path,
+            "title": title,
+            "id": page_id,
+            "terms": sorted(terms),
+        }
+        self.indexed += 1
+
+    def remove(self, source_path):
+        entry = self.pages.pop(source_path, None)
+        if entry is None:
+            return
+        for term in entry["terms"]:
+            self.set_weight(str(entry["id"]), term, None)
+        self.release_id(entry["id"])
+        self.removed += 1
+
+    def prune(self):
+        """
+        Drop the pages whose sources weren't seen in this build.
+        """
+        for source_path in list(self.pages):
+            if source_path not in self.seen:
+                self.remove(source_path)
+
+    def write(self, dest_dir_path, basepath="/"):
+        """
+        Write the index into dest_dir_path.
+
+        Shards are only written when their terms changed or their file is
+        missing, and shards left without terms are deleted. The page list
+        and the client script are rewritten only if they differ.
+        """
+        search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+        os.makedirs(search_dir, exist_ok=True)
+
+        documents = [None] * (max(self.used_ids, default=-1) + 1)
+        for entry in self.pages.values():
+            documents[entry["id"]] = [
+                page_path(entry["dest"], basepath),
+                entry["title"],
+            ]
+        write_if_changed(os.path.join(search_dir, PAGES_FILE), dumps(documents))
+        with open(SCRIPT_PATH, "r", encoding="utf-8") as file:
+            write_if_changed(os.path.join(search_dir, SCRIPT_FILE), file.read())
+
+        existing = set(os.listdir(search_dir))
+        shard_files = set()
+        for name, shard in self.shards.items():
+            file_name = name + ".json"
+            shard_files.add(file_name)
+            if name not in self.dirty and file_name in existing:
+                continue
+            postings = {
+                term: sorted(
+                    [int(page_id), weight] for page_id, weight in pages.items()
+                )
+                for term, pages in shard.items()
+            }
+            write_atomically(
+                os.path.join(search_dir, file_name),
+                lambda file: file.write(dumps(postings)),
+            )
+            self.written += 1
+        for file_name in existing - shard_files - {PAGES_FILE, SCRIPT_FILE}:
+            os.remove(os.path.join(search_dir, file_name))
+        self.dirty.clear()
+
+    def save(self):
+        dir_name = os.path.dirname(self.path)
+        if dir_name:
+            os.makedirs(dir_name, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"pages": self.pages, "shards": self.shards}, file)
+        os.replace(tmp_path, self.path)
+
+    def summary(self):
+        return (
+            f"Search index: {self.indexed} pages indexed, {self.removed} removed, "
+            f"{self.written} shards written"
+        )
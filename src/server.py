@@ -0,0 +1,255 @@
+import mimetypes
+import os
+import posixpath
+import queue
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from images import ImageSizeCache
+from template import Template, normalize_basepath
+from utilities import render_page
+from watch import create_watcher, iter_changes
+
+LIVE_RELOAD_PATH = "__livereload"
+LIVE_RELOAD_SCRIPT = (
+    "<script>new EventSource("
+    '"{basepath}' + LIVE_RELOAD_PATH + '").onmessage = () => location.reload();'
+    "</script>"
+)
+# Seconds between keep-alive comments on idle reload streams
+HEARTBEAT_INTERVAL = 15
+
+
+def inject_live_reload(html, basepath):
+    script = LIVE_RELOAD_SCRIPT.format(basepath=basepath)
+    index = html.rfind("</body>")
+    if index == -1:
+        return html + script
+    return html[:index] + script + html[index:]
+
+
+class DevServer:
+    """
+    Renders pages on demand and keeps them in memory until their source changes.
+
+    Static files are read straight from the static directory. Browsers that
+    have a page open are told to reload over server-sent events whenever a
+    watched source changes.
+    """
+
+    def __init__(self, content_dir, static_dir, template_path, basepath="/"):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.basepath = normalize_basepath(basepath)
+        # Kept in memory only, so a running build's cache is never touched
+        self.image_cache = ImageSizeCache(None)
+        self.template = self.load_template()
+        # Markdown source path -> rendered page bytes
+        self.pages = {}
+        # Bumped on every change, so renders that started before one aren't
+        # kept
+        self.generation = 0
+        self.lock = threading.Lock()
+        # One queue of pending events per connected browser
+        self.clients = set()
+
+    def load_template(self):
+        images = self.image_cache.scan(self.static_dir)
+        return Template.load(self.template_path, self.basepath, images=images)
+
+    def resolve_page(self, rel_path):
+        """
+        Find the markdown source for a URL path relative to the basepath.
+        """
+        rel_path = rel_path.strip("/")
+        if rel_path.endswith(".html"):
+            candidates = [rel_path[: -len(".html")] + ".md"]
+        elif rel_path:
+            candidates = [posixpath.join(rel_path, "index.md"), rel_path + ".md"]
+        else:
+            candidates = ["index.md"]
+
+        for candidate in candidates:
+            source_path = os.path.join(self.content_dir, *candidate.split("/"))
+            if os.path.isfile(source_path):
+                return source_path
+        return None
+
+    def resolve_static(self, rel_path):
+        static_root = os.path.realpath(self.static_dir)
+        file_path = os.path.realpath(os.path.join(static_root, rel_path.lstrip("/")))
+        if not file_path.startswith(static_root + os.sep):
+            return None
+        if not os.path.isfile(file_path):
+            return None
+        return file_path
+
+    def get_page(self, source_path):
+        with self.lock:
+            page = self.pages.get(source_path)
+            template = self.template
+            generation = self.generation
+        if page is not None:
+            return page
+
+        with open(source_path, "r") as file:
+            md = file.read()
+        html = inject_live_reload(render_page(md, template), self.basepath)
+        page = html.encode("utf-8")
+        with self.lock:
+            # A change during rendering may have made this page outdated
+            if self.generation == generation:
+                self.pages[source_path] = page
+        return page
+
+    def handle_changes(self, changes):
+        template = None
+        if self.template_path in changes or any(
+            path == self.static_dir or path.startswith(self.static_dir + os.sep)
+            for path in changes
+        ):
+            # Every page depends on the template, and on image sizes
+            template = self.load_template()
+        with self.lock:
+            self.generation += 1
+            if template is not None:
+                self.template = template
+                self.pages.clear()
+            else:
+                for path in changes:
+                    for source_path in list(self.pages):
+                        if source_path == path or source_path.startswith(path + os.sep):
+                            del self.pages[source_path]
+            clients = list(self.clients)
+        for client in clients:
+            client.put("reload")
+
+    def watch(self, polling=False):
+        watcher = create_watcher(
+            [self.content_dir, self.static_dir], [self.template_path], polling
+        )
+        try:
+            for changes in iter_changes(watcher):
+                print(f"Changed: {', '.join(sorted(changes))}")
+                try:
+                    self.handle_changes(changes)
+                except Exception as e:
+                    # Keep serving what there is, e.g. while the template is
+                    # saved by rename or broken mid-edit
+                    print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        finally:
+            watcher.close()
+
+    def add_client(self):
+        client = queue.Queue()
+        with self.lock:
+            self.clients.add(client)
+        return client
+
+    def remove_client(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+
+def make_handler(dev_server):
+    class DevRequestHandler(BaseHTTPRequestHandler):
+        send_content = True
+
+        def do_HEAD(self):
+            self.send_content = False
+            self.do_GET()
+
+        def do_GET(self):
+            path = unquote(urlsplit(self.path).path)
+            basepath = dev_server.basepath
+            if not (path + "/").startswith(basepath):
+                self.send_error(404)
+                return
+            rel_path = posixpath.normpath("/" + path[len(basepath) :]).lstrip("/")
+            if rel_path == ".":
+                rel_path = ""
+
+            if rel_path == LIVE_RELOAD_PATH and self.send_content:
+                self.stream_events()
+                return
+
+            source_path = dev_server.resolve_page(rel_path)
+            if source_path is not None:
+                try:
+                    body = dev_server.get_page(source_path)
+                except Exception as e:
+                    message = f"Error rendering {source_path}: {type(e).__name__}: {e}"
+                    self.send_body(500, message.encode("utf-8"), "text/plain")
+                    return
+                self.send_body(200, body, "text/html; charset=utf-8")
+                return
+
+            file_path = dev_server.resolve_static(rel_path)
+            if file_path is None:
+                self.send_error(404)
+                return
+            with open(file_path, "rb") as file:
+                body = file.read()
+            content_type = mimetypes.guess_type(file_path)[0]
+            self.send_body(200, body, content_type or "application/octet-stream")
+
+        def send_body(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            # Always revalidate so edits show up on reload
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if self.send_content:
+                self.wfile.write(body)
+
+        def stream_events(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            client = dev_server.add_client()
+            try:
+                while True:
+                    try:
+                        event = client.get(timeout=HEARTBEAT_INTERVAL)
+                        self.wfile.write(f"data: {event}\n\n".encode("utf-8"))
+                    except queue.Empty:
+                        # Comments keep the connection open and find closed ones
+                        self.wfile.write(b": ping\n\n")
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                dev_server.remove_client(client)
+
+    return DevRequestHandler
+
+
+def serve(
+    content_dir,
+    static_dir,
+    template_path,
+    host="127.0.0.1",
+    port=8888,
+    basepath="/",
+    polling=False,
+):
+    """
+    Serve the site from memory with live reload until interrupted.
+    """
+    dev_server = DevServer(content_dir, static_dir, template_path, basepath)
+    httpd = ThreadingHTTPServer((host, port), make_handler(dev_server))
+    httpd.daemon_threads = True
+    threading.Thread(target=dev_server.watch, args=(polling,), daemon=True).start()
+
+    print(f"Serving at http://{host}:{port}{dev_server.basepath}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
@@ -0,0 +1,117 @@
+import os
+import re
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+SITEMAP_FILE = "sitemap.xml"
+# Numbered sitemaps listed by the index once a site outgrows one file
+SITEMAP_PART_RE = re.compile(r"sitemap-(\d+)\.xml")
+# The protocol's limit on URLs per sitemap
+MAX_URLS = 50_000
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def page_path(dest_rel_path, basepath="/"):
+    """
+    The URL path of a page from its path relative to the output directory.
+    """
+    path = dest_rel_path.replace(os.sep, "/")
+    if path == "index.html":
+        path = ""
+    elif path.endswith("/index.html"):
+        path = path[: -len("index.html")]
+    return quote(basepath + path)
+
+
+def page_url(dest_rel_path, site_url, basepath="/"):
+    """
+    The absolute URL of a page from its path relative to the output directory.
+    """
+    return site_url.rstrip("/") + page_path(dest_rel_path, basepath)
+
+
+def write_atomically(path, write):
+    # Replaced by rename: the old file may be a hardlink into the live output
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        write(file)
+    os.replace(tmp_path, path)
+
+
+def write_urlset(file, entries):
+    write = file.write
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write(f'<urlset xmlns="{SITEMAP_NS}">\n')
+    for loc, lastmod in entries:
+        write(f"  <url><loc>{escape(loc)}</loc>")
+        if lastmod is not None:
+            write(f"<lastmod>{lastmod}</lastmod>")
+        write("</url>\n")
+    write("</urlset>\n")
+
+
+def write_index(file, parts):
+    write = file.write
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write(f'<sitemapindex xmlns="{SITEMAP_NS}">\n')
+    for loc, lastmod in parts:
+        write(f"  <sitemap><loc>{escape(loc)}</loc>")
+        if lastmod is not None:
+            write(f"<lastmod>{lastmod}</lastmod>")
+        write("</sitemap>\n")
+    write("</sitemapindex>\n")
+
+
+def write_sitemap(dest_dir_path, pages, site_url, basepath="/"):
+    """
+    Write sitemap.xml for pages, a list of (path relative to dest_dir_path,
+    lastmod or None) pairs.
+
+    Up to MAX_URLS pages go in sitemap.xml itself. Past that they are split
+    over sitemap-1.xml, sitemap-2.xml, ... and sitemap.xml becomes an index
+    of those, each listed with the latest lastmod of its pages. Every file
+    is streamed out entry by entry, and numbered sitemaps left over from a
+    larger site are deleted.
+    """
+    entries = sorted(
+        (page_url(rel_path, site_url, basepath), lastmod) for rel_path, lastmod in pages
+    )
+    sitemap_path = os.path.join(dest_dir_path, SITEMAP_FILE)
+    parts = []
+    if len(entries) <= MAX_URLS:
+        write_atomically(sitemap_path, lambda file: write_urlset(file, entries))
+    else:
+        for number, start in enumerate(range(0, len(entries), MAX_URLS), 1):
+            chunk = entries[start : start + MAX_URLS]
+            name = f"sitemap-{number}.xml"
+            write_atomically(
+                os.path.join(dest_dir_path, name),
+                lambda file: write_urlset(file, chunk),
+            )
+            lastmods = [lastmod for _, lastmod in chunk if lastmod is not None]
+            parts.append(
+                (
+                    site_url.rstrip("/") + quote(basepath + name),
+                    max(lastmods, default=None),
+                )
+            )
+        write_atomically(sitemap_path, lambda file: write_index(file, parts))
+
+    for name in os.listdir(dest_dir_path):
+        match = SITEMAP_PART_RE.fullmatch(name)
+        if match and int(match.group(1)) > len(parts):
+            os.remove(os.path.join(dest_dir_path, name))
+
+
+def remove_sitemap(dest_dir_path, manifest):
+    """
+    Delete sitemap.xml and any numbered sitemaps left by an earlier
+    --site-url build, unless they were copied from the static directory.
+    """
+    for name in os.listdir(dest_dir_path):
+        if name in manifest.assets:
+            continue
+        if name == SITEMAP_FILE or SITEMAP_PART_RE.fullmatch(name):
+            file_path = os.path.join(dest_dir_path, name)
+            print(f"Removing stale file: {file_path}")
+            os.remove(file_path)
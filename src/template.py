@@ -0,0 +1,126 @@
+import json
+import re
+
+from manifest import hash_bytes
+from minify import minify_html
+
+PLACEHOLDER_RE = re.compile(r"\{\{ (Title|Content) \}\}")
+# A root-relative (but not protocol-relative) href or src attribute value
+URL_ATTRIBUTE_RE = re.compile(r'(?<![\w-])((?:href|src)=")(/(?!/)[^"]*)')
+
+
+def normalize_basepath(basepath):
+    # Ensure basepath ends with / if it's not just "/"
+    if basepath != "/" and not basepath.endswith("/"):
+        basepath = basepath + "/"
+    return basepath
+
+
+def prefix_basepath(url, basepath):
+    """
+    Prefix a root-relative URL with the (normalized) basepath.
+    """
+    if basepath == "/" or not url.startswith("/") or url.startswith("//"):
+        return url
+    return basepath + url[1:]
+
+
+def resolve_url(url, basepath="/", assets=None):
+    """
+    Map a root-relative URL to the URL it is published under.
+
+    assets maps the URLs of fingerprinted static files to their
+    fingerprinted URLs; the result is then prefixed with the basepath.
+    """
+    if assets:
+        url = assets.get(url, url)
+    return prefix_basepath(url, basepath)
+
+
+def rewrite_urls(html, basepath="/", assets=None):
+    """
+    Resolve the root-relative href and src URLs in an HTML string.
+
+    Only used on the template when it is compiled; page content gets its
+    URLs resolved as its nodes are built.
+    """
+    if basepath == "/" and not assets:
+        return html
+    return URL_ATTRIBUTE_RE.sub(
+        lambda match: match.group(1) + resolve_url(match.group(2), basepath, assets),
+        html,
+    )
+
+
+def digest(data):
+    """
+    Hash a JSON-serializable value, e.g. an asset or image size map.
+    """
+    return hash_bytes(json.dumps(data, sort_keys=True).encode("utf-8"))
+
+
+class Template:
+    """
+    A page template split at its placeholders.
+
+    The template is scanned once when compiled. Rendering a page joins the
+    literal segments with the page values, so no per-page search or replace
+    runs over the template text.
+
+    With minify=True the template is minified when compiled, and minify
+    tells the renderer to minify page content as it is serialized. images
+    holds the intrinsic sizes of static images for the renderer to add.
+    """
+
+    def __init__(self, text, basepath="/", assets=None, minify=False, images=None):
+        self.basepath = normalize_basepath(basepath)
+        self.assets = assets
+        self.minify = minify
+        self.images = images
+        # Everything besides the markdown that decides a page's content HTML,
+        # for keying cached content. Image sizes are left out: cached content
+        # keeps the sizes of the images it shows, to be checked on use.
+        self.render_context = self.basepath
+        if assets:
+            self.render_context += ":" + digest(assets)
+        if minify:
+            self.render_context += ":minify"
+
+        text = rewrite_urls(text, self.basepath, assets)
+        if minify:
+            text = minify_html(text)
+        # Alternating literal segments and placeholder names, e.g.
+        # ["<title>", "Title", "</title>...", "Content", "..."]
+        self.parts = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            self.parts.append(text[position : match.start()])
+            self.parts.append(match.group(1))
+            position = match.end()
+        self.parts.append(text[position:])
+
+    @classmethod
+    def load(cls, template_path, basepath="/", assets=None, minify=False, images=None):
+        with open(template_path, "r") as file:
+            return cls(file.read(), basepath, assets, minify, images)
+
+    def render(self, title, content):
+        values = {"Title": title, "Content": content}
+        parts = self.parts[:]
+        # Placeholder names sit at the odd indices
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return "".join(parts)
+
+    def write(self, out, title, content_chunks):
+        """
+        Stream a page to out, writing the content chunks as they are produced.
+        """
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                out.write(part)
+            elif part == "Title":
+                out.write(title)
+            else:
+                for chunk in content_chunks:
+                    out.write(chunk)
@@ -0,0 +1,219 @@
+import os
+import stat
+import unittest
+
+from assets import (
+    HEADERS_FILE,
+    PUBLISH_STRATEGIES,
+    asset_urls,
+    fingerprinted_name,
+    plan_fingerprints,
+    publish_file,
+    rewrite_css_urls,
+    sync_static,
+    walk_files,
+    remove_headers,
+    write_headers,
+)
+from manifest import BuildManifest
+from testing import TempDirTests
+
+
+class TestSyncStatic(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.public)
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+
+    def sync(self, checksum=False, strategy="copy", fingerprints=None):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        sync_static(
+            self.static,
+            self.public,
+            manifest,
+            checksum,
+            strategy,
+            fingerprints=fingerprints,
+        )
+        manifest.save()
+        return manifest
+
+    def test_walk_files(self):
+        self.assertEqual(
+            sorted(walk_files(self.static)),
+            sorted(["index.css", os.path.join("images", "a.png")]),
+        )
+
+    def test_first_sync_copies_everything(self):
+        manifest = self.sync()
+        self.assertEqual((manifest.asset_hits, manifest.asset_misses), (0, 2))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "images", "a.png")))
+
+    def test_second_sync_copies_nothing(self):
+        self.sync()
+        manifest = self.sync()
+        self.assertEqual((manifest.asset_hits, manifest.asset_misses), (2, 0))
+
+    def test_changed_file_is_copied(self):
+        self.sync()
+        css_path = os.path.join(self.static, "index.css")
+        self.write(css_path, "body { color: red; }")
+        manifest = self.sync()
+        self.assertEqual((manifest.asset_hits, manifest.asset_misses), (1, 1))
+        with open(os.path.join(self.public, "index.css")) as file:
+            self.assertEqual(file.read(), "body { color: red; }")
+
+    def test_checksum_detects_same_size_and_mtime(self):
+        self.sync(checksum=True)
+        css_path = os.path.join(self.static, "index.css")
+        stat = os.stat(css_path)
+        self.write(css_path, "body{!}")
+        os.utime(css_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.sync().asset_misses, 0)
+        self.assertEqual(self.sync(checksum=True).asset_misses, 1)
+
+    def test_orphans_are_removed_but_pages_kept(self):
+        self.sync()
+        page_path = os.path.join(self.public, "index.html")
+        self.write(page_path, "<html></html>")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        manifest = self.sync()
+        self.assertEqual(manifest.asset_removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(page_path))
+
+    def test_every_strategy_publishes(self):
+        src_path = os.path.join(self.static, "index.css")
+        os.chmod(src_path, 0o750)
+        for strategy in PUBLISH_STRATEGIES:
+            dst_path = os.path.join(self.public, f"{strategy}.css")
+            used = publish_file(src_path, dst_path, strategy)
+            self.assertIn(used, (strategy, "copy"))
+            with open(dst_path) as file:
+                self.assertEqual(file.read(), "body {}")
+            self.assertEqual(stat.S_IMODE(os.stat(dst_path).st_mode), 0o750)
+
+    def test_publish_replaces_hardlink_without_touching_source(self):
+        src_path = os.path.join(self.static, "index.css")
+        dst_path = os.path.join(self.public, "index.css")
+        publish_file(src_path, dst_path, "hardlink")
+        other_path = os.path.join(self.static, "images", "a.png")
+        publish_file(other_path, dst_path, "copy")
+        with open(src_path) as file:
+            self.assertEqual(file.read(), "body {}")
+
+    def test_sync_with_hardlinks(self):
+        manifest = self.sync(strategy="hardlink")
+        self.assertEqual(manifest.asset_misses, 2)
+        self.assertEqual(self.sync(strategy="hardlink").asset_hits, 2)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError):
+            self.sync(strategy="teleport")
+
+
+class TestFingerprints(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.public)
+        self.write("index.css", 'body { background: url("images/a.png?v=1"); }')
+        self.write(os.path.join("images", "a.png"), "png")
+        self.write("CNAME", "example.com")
+
+    def write(self, rel_path, text):
+        super().write(os.path.join(self.static, rel_path), text)
+
+    def sync(self):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        fingerprints = plan_fingerprints(self.static)
+        sync_static(self.static, self.public, manifest, fingerprints=fingerprints)
+        manifest.save()
+        return manifest, asset_urls(fingerprints)
+
+    def test_fingerprinted_name(self):
+        self.assertEqual(
+            fingerprinted_name(os.path.join("a", "b.min.css"), "0123456789"),
+            os.path.join("a", "b.min.01234567.css"),
+        )
+
+    def test_rewrite_css_urls(self):
+        urls = {"/images/a.png": "/images/a.12345678.png"}
+        css = (
+            "a { background: url(../images/a.png); } "
+            "b { background: url('/images/a.png#x'); } "
+            'c { background: url("data:image/png;base64,AA"); } '
+            "d { background: url(//cdn/images/a.png); }"
+        )
+        self.assertEqual(
+            rewrite_css_urls(css, "/css/site.css", urls),
+            "a { background: url(../images/a.12345678.png); } "
+            "b { background: url('/images/a.12345678.png#x'); } "
+            'c { background: url("data:image/png;base64,AA"); } '
+            "d { background: url(//cdn/images/a.png); }",
+        )
+
+    def test_sync_publishes_fingerprinted_names(self):
+        _, urls = self.sync()
+        self.assertEqual(sorted(urls), ["/images/a.png", "/index.css"])
+        self.assertTrue(os.path.exists(os.path.join(self.public, "CNAME")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+        with open(os.path.join(self.public, urls["/index.css"][1:])) as file:
+            self.assertIn(os.path.basename(urls["/images/a.png"]), file.read())
+
+    def test_second_sync_copies_nothing(self):
+        self.sync()
+        manifest, _ = self.sync()
+        self.assertEqual((manifest.asset_hits, manifest.asset_misses), (3, 0))
+
+    def test_changed_image_renames_image_and_stylesheet(self):
+        _, old_urls = self.sync()
+        self.write(os.path.join("images", "a.png"), "png2")
+        manifest, urls = self.sync()
+        self.assertEqual((manifest.asset_hits, manifest.asset_misses), (1, 2))
+        for url in ("/index.css", "/images/a.png"):
+            self.assertNotEqual(urls[url], old_urls[url])
+            self.assertFalse(
+                os.path.exists(os.path.join(self.public, old_urls[url][1:]))
+            )
+            self.assertTrue(os.path.exists(os.path.join(self.public, urls[url][1:])))
+
+    def test_write_headers(self):
+        self.write("_headers", "/*\n  X-Frame-Options: DENY\n")
+        _, urls = self.sync()
+        write_headers(self.public, urls, "/ssg/")
+        with open(os.path.join(self.public, HEADERS_FILE)) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(lines[:2], ["/*", "  X-Frame-Options: DENY"])
+        self.assertIn("/ssg" + urls["/index.css"], lines)
+        self.assertEqual(
+            lines.count("  Cache-Control: public, max-age=31536000, immutable"), 2
+        )
+        # The static _headers file itself is untouched
+        with open(os.path.join(self.static, HEADERS_FILE)) as file:
+            self.assertEqual(file.read(), "/*\n  X-Frame-Options: DENY\n")
+
+    def test_remove_headers(self):
+        _, urls = self.sync()
+        write_headers(self.public, urls)
+        manifest, _ = self.sync()
+        remove_headers(self.public, manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.public, HEADERS_FILE)))
+
+        # Unless the static directory has one
+        self.write("_headers", "/*\n  X-Frame-Options: DENY\n")
+        manifest, _ = self.sync()
+        remove_headers(self.public, manifest)
+        self.assertTrue(os.path.exists(os.path.join(self.public, HEADERS_FILE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
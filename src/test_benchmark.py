@@ -0,0 +1,44 @@
+import os
+import unittest
+
+from benchmark import CorpusWriter, generate_corpus, parse_mix, run_benchmarks
+from testing import TempDirTests
+
+
+class TestBenchmark(TempDirTests, unittest.TestCase):
+    def test_parse_mix(self):
+        mix = parse_mix("code=0,link=0.5")
+        self.assertEqual((mix["code"], mix["link"], mix["heading"]), (0, 0.5, 2))
+        with self.assertRaises(ValueError):
+            parse_mix("tables=1")
+        with self.assertRaises(ValueError):
+            parse_mix("heading=0,paragraph=0,list=0,ordered_list=0,code=0,quote=0")
+
+    def test_corpus_is_reproducible(self):
+        first = [CorpusWriter(10, seed=3).page(i) for i in range(10)]
+        second = [CorpusWriter(10, seed=3).page(i) for i in range(10)]
+        other = [CorpusWriter(10, seed=4).page(i) for i in range(10)]
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+
+    def test_mix_controls_content(self):
+        mix = parse_mix("heading=0,list=0,ordered_list=0,quote=0,paragraph=0")
+        writer = CorpusWriter(5, mix=mix, blocks=3)
+        self.assertEqual(writer.page(0).count("```"), 6)
+
+    def test_run_benchmarks(self):
+        root_dir = os.path.join(self.tmp.name, "corpus")
+        size = generate_corpus(root_dir, 20)
+        result = run_benchmarks(root_dir)
+        self.assertEqual((result["pages"], result["bytes"]), (20, size))
+        self.assertEqual(
+            list(result["stages"]),
+            ["parse", "to_html", "generate_page", "build", "rebuild"],
+        )
+        for stage in result["stages"].values():
+            self.assertGreater(stage["pages_per_s"], 0)
+        self.assertTrue(os.path.exists(os.path.join(root_dir, "docs", "index.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
+import io
 import unittest
 
-from htmlnode import HTMLNode, LeafNode, ParentNode
+from htmlnode import HTMLNode, LeafNode, ParentNode, iter_html, write_html
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -131,6 +132,74 @@ class TestHTMLNode(unittest.TestCase):
             "<div><span><b>grandchild</b></span></div>",
         )
 
+    # Streaming serializer tests
+
+    def test_write_html_matches_to_html(self):
+        node = ParentNode(
+            "div",
+            [
+                ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")]),
+                LeafNode("img", "", {"src": "/a.png", "alt": "a"}),
+            ],
+            {"class": "post"},
+        )
+        out = io.StringIO()
+        write_html(node, out)
+        self.assertEqual(
+            out.getvalue(),
+            '<div class="post"><p><b>bold</b> text</p><img src="/a.png" alt="a" /></div>',
+        )
+        self.assertEqual(out.getvalue(), node.to_html())
+
+    def test_write_html_leaf(self):
+        out = io.StringIO()
+        write_html(LeafNode("p", "Hello"), out)
+        self.assertEqual(out.getvalue(), "<p>Hello</p>")
+
+    def test_iter_html_deep_nesting(self):
+        node = LeafNode(None, "deep")
+        for _ in range(10000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(html.count("</span>"), 10000)
+
+    def test_iter_html_nested_error(self):
+        node = ParentNode("div", [ParentNode("p", [])])
+        with self.assertRaises(ValueError):
+            list(iter_html(node))
+
+    def test_minify_attributes(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode("a", "x", {"href": "/a b", "class": "c"}),
+                LeafNode("img", "", {"src": "/i.png", "alt": ""}),
+            ],
+        )
+        self.assertEqual(
+            node.to_html(minify=True),
+            '<p><a href="/a b" class=c>x</a><img src=/i.png alt=""></p>',
+        )
+
+    def test_minify_collapses_whitespace_outside_code(self):
+        node = ParentNode(
+            "p",
+            [
+                LeafNode(None, "a \n  b "),
+                LeafNode("i", "c\n d"),
+                LeafNode("code", "e  \n f"),
+            ],
+        )
+        self.assertEqual(
+            "".join(iter_html(node, minify=True)),
+            "<p>a b <i>c d</i><code>e  \n f</code></p>",
+        )
+
+    def test_nodes_have_no_instance_dict(self):
+        self.assertFalse(hasattr(LeafNode("p", "text"), "__dict__"))
+        self.assertFalse(hasattr(ParentNode("p", [LeafNode("b", "x")]), "__dict__"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,116 @@
+import os
+import struct
+import unittest
+import zlib
+
+from images import ImageSizeCache, read_image_size
+from testing import TempDirTests
+
+
+def png(width, height):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + chunk
+        + struct.pack(">I", zlib.crc32(chunk))
+    )
+
+
+def gif(width, height):
+    return b"GIF89a" + struct.pack("<HH", width, height) + bytes(20)
+
+
+def jpeg(width, height):
+    app0 = b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = struct.pack(">BHHB", 8, height, width, 3) + bytes(9)
+    return (
+        b"\xff\xd8"
+        + b"\xff\xe0"
+        + struct.pack(">H", len(app0) + 2)
+        + app0
+        # Fill bytes before a marker are allowed
+        + b"\xff\xff\xc2"
+        + struct.pack(">H", len(sof) + 2)
+        + sof
+        + b"\xff\xd9"
+    )
+
+
+def webp(chunk, payload):
+    data = chunk + struct.pack("<I", len(payload)) + payload
+    return b"RIFF" + struct.pack("<I", len(data) + 4) + b"WEBP" + data
+
+
+class TestReadImageSize(TempDirTests, unittest.TestCase):
+    def size_of(self, data, name="image"):
+        path = os.path.join(self.tmp.name, name)
+        self.write(path, data)
+        return read_image_size(path)
+
+    def test_png(self):
+        self.assertEqual(self.size_of(png(1100, 438)), (1100, 438))
+
+    def test_gif(self):
+        self.assertEqual(self.size_of(gif(16, 9)), (16, 9))
+
+    def test_jpeg(self):
+        self.assertEqual(self.size_of(jpeg(800, 600)), (800, 600))
+
+    def test_webp_lossy(self):
+        frame = b"\x00\x00\x00\x9d\x01\x2a" + struct.pack("<HH", 320, 240)
+        self.assertEqual(self.size_of(webp(b"VP8 ", frame)), (320, 240))
+
+    def test_webp_lossless(self):
+        bits = (320 - 1) | ((240 - 1) << 14)
+        self.assertEqual(
+            self.size_of(webp(b"VP8L", b"\x2f" + struct.pack("<I", bits))), (320, 240)
+        )
+
+    def test_webp_extended(self):
+        payload = bytes(4) + (1919).to_bytes(3, "little") + (1079).to_bytes(3, "little")
+        self.assertEqual(self.size_of(webp(b"VP8X", payload)), (1920, 1080))
+
+    def test_unknown_and_truncated(self):
+        self.assertIsNone(self.size_of(b"not an image"))
+        self.assertIsNone(self.size_of(png(10, 10)[:18]))
+        self.assertIsNone(self.size_of(jpeg(10, 10)[:12]))
+
+
+class TestImageSizeCache(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.cache_path = os.path.join(self.tmp.name, "images.json")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(os.path.join("images", "a.png"), png(2, 3))
+        self.write("b.gif", gif(4, 5))
+        self.write("index.css", b"body {}")
+
+    def write(self, rel_path, data):
+        super().write(os.path.join(self.static, rel_path), data)
+
+    def scan(self):
+        cache = ImageSizeCache.load(self.cache_path)
+        sizes = cache.scan(self.static)
+        cache.save()
+        return cache, sizes
+
+    def test_scan(self):
+        cache, sizes = self.scan()
+        self.assertEqual(sizes, {"/images/a.png": (2, 3), "/b.gif": (4, 5)})
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+
+    def test_unchanged_images_are_not_read_again(self):
+        self.scan()
+        # A trailing byte changes the file size along with the contents
+        self.write("b.gif", gif(6, 7) + b"\0")
+        cache, sizes = self.scan()
+        self.assertEqual(sizes["/b.gif"], (6, 7))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(len(cache.sizes), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import unittest
+
+from links import LinkChecker, link_target, resolves
+from manifest import BuildManifest
+from testing import TempDirTests
+from utilities import generate_pages_recursive, update_pages
+
+
+class TestLinkTarget(unittest.TestCase):
+    def test_root_relative(self):
+        self.assertEqual(link_target("/blog/tom", "index.html"), "blog/tom")
+        self.assertEqual(link_target("/blog/tom/#top", "index.html"), "blog/tom/")
+        self.assertEqual(link_target("/", "blog/index.html"), "")
+        self.assertEqual(link_target("/a%20b.png?v=1", "index.html"), "a b.png")
+
+    def test_relative(self):
+        page = os.path.join("blog", "tom", "index.html")
+        self.assertEqual(link_target("../majesty", page), "blog/majesty")
+        self.assertEqual(link_target("./", page), "blog/tom/")
+        self.assertEqual(link_target("../../../x", page), "../x")
+
+    def test_external_and_fragments(self):
+        for url in ("https://example.com", "//cdn.test/a.js", "mailto:a@b", "#top"):
+            self.assertIsNone(link_target(url, "index.html"))
+
+    def test_resolves(self):
+        paths = {"index.html", "blog/tom/index.html", "about.html", "a.png"}
+        for target in ("", "blog/tom", "blog/tom/", "about", "about.html", "a.png"):
+            self.assertTrue(resolves(target, paths), target)
+        for target in ("blog", "blog/", "b.png", "about/", "../index.html"):
+            self.assertFalse(resolves(target, paths), target)
+
+
+class TestLinkChecker(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog", "tom"))
+        self.write(self.template, "{{ Title }}{{ Content }}")
+        self.write(
+            os.path.join(self.content, "index.md"),
+            "# Home\n\n[Tom](/blog/tom) [Jerry](/blog/jerry) ![logo](/logo.png)",
+        )
+        self.tom = os.path.join(self.content, "blog", "tom", "index.md")
+        self.write(self.tom, "# Tom\n\n[back](../../) [web](https://example.com)")
+
+    def build(self, jobs=1):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        manifest.assets = {"logo.png": {}}
+        links = LinkChecker()
+        generate_pages_recursive(
+            self.content,
+            self.template,
+            self.public,
+            "/ssg",
+            manifest,
+            jobs=jobs,
+            links=links,
+        )
+        manifest.save()
+        return manifest, links
+
+    def test_reports_broken_links(self):
+        _, links = self.build(jobs=2)
+        self.assertEqual(links.checked, 4)
+        self.assertEqual(
+            links.broken, [(os.path.join(self.content, "index.md"), "/blog/jerry")]
+        )
+        self.assertIn("1 broken", links.summary())
+
+    def test_unchanged_pages_keep_their_links(self):
+        self.build()
+        jerry = os.path.join(self.content, "blog", "jerry.md")
+        self.write(jerry, "# Jerry")
+        manifest, links = self.build()
+        self.assertEqual((manifest.hits, manifest.misses), (2, 1))
+        self.assertEqual((links.checked, links.broken), (4, []))
+
+    def test_pages_built_without_links_are_generated_again(self):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        generate_pages_recursive(
+            self.content, self.template, self.public, "/ssg", manifest
+        )
+        manifest.save()
+        manifest, links = self.build()
+        self.assertEqual(manifest.links_of(self.tom), ["../../", "https://example.com"])
+        self.assertEqual(len(links.broken), 1)
+
+    def test_removed_page_breaks_links_to_it(self):
+        manifest, links = self.build()
+        os.remove(self.tom)
+        os.rmdir(os.path.dirname(self.tom))
+        update_pages(
+            [os.path.dirname(self.tom)],
+            self.content,
+            self.template,
+            self.public,
+            "/ssg",
+            manifest,
+            links=links,
+        )
+        self.assertEqual([url for _, url in links.broken], ["/blog/tom", "/blog/jerry"])
+
+    def test_generated_files_are_link_targets(self):
+        self.write(
+            self.tom,
+            "# Tom\n\n[map](/sitemap.xml) [search](/search-index/search.js) "
+            "[headers](/_headers) [gone](/sitemap-1.xml)",
+        )
+        os.makedirs(os.path.join(self.public, "search-index"))
+        self.write(os.path.join(self.public, "search-index", "search.js"), "")
+        self.write(os.path.join(self.public, "_headers"), "")
+        manifest = BuildManifest.load(self.manifest_path, {})
+        manifest.assets = {"logo.png": {}}
+        links = LinkChecker()
+        generate_pages_recursive(
+            self.content,
+            self.template,
+            self.public,
+            "/ssg",
+            manifest,
+            site_url="https://example.com",
+            links=links,
+        )
+        self.assertEqual(
+            [url for _, url in links.broken], ["/sitemap-1.xml", "/blog/jerry"]
+        )
+
+    def test_requires_manifest(self):
+        with self.assertRaises(ValueError):
+            generate_pages_recursive(
+                self.content, self.template, self.public, links=LinkChecker()
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
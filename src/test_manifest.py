@@ -0,0 +1,115 @@
+import os
+import unittest
+
+from manifest import BuildManifest, hash_bytes
+from testing import TempDirTests
+from utilities import generate_pages_recursive
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestBuildManifest(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.tmp.name
+        self.content = os.path.join(self.root, "content")
+        self.public = os.path.join(self.root, "public")
+        self.template = os.path.join(self.root, "template.html")
+        self.manifest_path = os.path.join(self.root, "cache", "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+
+    def build(self, inputs=None):
+        manifest = BuildManifest.load(self.manifest_path, inputs or {"v": 1})
+        generate_pages_recursive(
+            self.content, self.template, self.public, "/", manifest
+        )
+        manifest.prune(self.public)
+        manifest.save()
+        return manifest
+
+    def test_first_build_misses_everything(self):
+        manifest = self.build()
+        self.assertEqual((manifest.hits, manifest.misses), (0, 2))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_unchanged_build_hits_everything(self):
+        self.build()
+        manifest = self.build()
+        self.assertEqual((manifest.hits, manifest.misses), (2, 0))
+
+    def test_changed_source_is_rebuilt(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# New Home")
+        manifest = self.build()
+        self.assertEqual((manifest.hits, manifest.misses), (1, 1))
+        with open(os.path.join(self.public, "index.html")) as file:
+            self.assertIn("New Home", file.read())
+
+    def test_changed_inputs_rebuild_everything(self):
+        self.build({"v": 1})
+        manifest = self.build({"v": 2})
+        self.assertEqual((manifest.hits, manifest.misses), (0, 2))
+
+    def test_changed_inputs_still_remove_stale_outputs(self):
+        self.build({"v": 1})
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        manifest = self.build({"v": 2})
+        self.assertEqual((manifest.misses, manifest.removed), (1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+
+    def test_changed_inputs_keep_assets(self):
+        manifest = self.build({"v": 1})
+        manifest.assets = {"a.png": {"size": 1, "mtime": 0}}
+        manifest.save()
+        manifest = BuildManifest.load(self.manifest_path, {"v": 2})
+        self.assertEqual(manifest.assets, {"a.png": {"size": 1, "mtime": 0}})
+        self.assertFalse(manifest.is_empty)
+
+    def test_missing_output_is_rebuilt(self):
+        self.build()
+        os.remove(os.path.join(self.public, "index.html"))
+        manifest = self.build()
+        self.assertEqual((manifest.hits, manifest.misses), (1, 1))
+
+    def test_deleted_source_removes_output(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        manifest = self.build()
+        self.assertEqual(manifest.removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_corrupt_manifest_is_empty(self):
+        os.makedirs(os.path.dirname(self.manifest_path))
+        self.write(self.manifest_path, "{not json")
+        manifest = BuildManifest.load(self.manifest_path, {"v": 1})
+        self.assertTrue(manifest.is_empty)
+
+    def test_lastmod_only_moves_when_source_changes(self):
+        manifest = BuildManifest(self.manifest_path, {})
+        manifest.note_source("a.md", "h1", now=0)
+        manifest.note_source("a.md", "h1", now=100)
+        self.assertEqual(manifest.lastmod_of("a.md"), "1970-01-01T00:00:00Z")
+        manifest.note_source("a.md", "h2", now=100)
+        self.assertEqual(manifest.lastmod_of("a.md"), "1970-01-01T00:01:40Z")
+        self.assertIsNone(manifest.lastmod_of("b.md"))
+
+    def test_lastmod_survives_changed_inputs(self):
+        post = os.path.join(self.content, "blog", "post.md")
+        lastmod = self.build().lastmod_of(post)
+        manifest = self.build({"v": 2})
+        self.assertEqual(manifest.misses, 2)
+        self.assertEqual(manifest.lastmod_of(post), lastmod)
+        os.remove(post)
+        self.assertIsNone(self.build({"v": 2}).lastmod_of(post))
+
+    def test_hash_bytes(self):
+        self.assertEqual(hash_bytes(b"a"), hash_bytes(b"a"))
+        self.assertNotEqual(hash_bytes(b"a"), hash_bytes(b"b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+from minify import minify_html
+from template import Template
+
+
+class TestMinify(unittest.TestCase):
+    def test_whitespace_between_blocks_is_dropped(self):
+        html = "<!doctype html>\n<html>\n  <head>\n    <title>T</title>\n  </head>\n</html>\n"
+        self.assertEqual(
+            minify_html(html),
+            "<!doctype html><html><head><title>T</title></head></html>",
+        )
+
+    def test_inline_whitespace_collapses_to_one_space(self):
+        self.assertEqual(
+            minify_html("<p>\n  a   <b>b</b>\n  <i>c</i>  </p>"),
+            "<p>a <b>b</b> <i>c</i></p>",
+        )
+
+    def test_preformatted_content_is_kept(self):
+        html = "<pre>  a\n   b </pre>\n<p><code>x   y</code></p><script> if (a  <  b) {} </script>"
+        self.assertEqual(
+            minify_html(html),
+            "<pre>  a\n   b </pre><p><code>x   y</code></p><script> if (a  <  b) {} </script>",
+        )
+
+    def test_attributes(self):
+        html = '<meta charset="utf-8" /><a href="/x?a=1&amp;b" title="a b" class="">x</a><input disabled>'
+        self.assertEqual(
+            minify_html(html),
+            '<meta charset=utf-8><a href="/x?a=1&amp;b" title="a b" class="">x</a><input disabled>',
+        )
+
+    def test_self_closing_foreign_elements_keep_quotes(self):
+        self.assertEqual(
+            minify_html('<svg><path d="M0" /></svg>'), '<svg><path d="M0"/></svg>'
+        )
+
+    def test_comments_are_dropped(self):
+        self.assertEqual(minify_html("<p>a<!-- b --></p>"), "<p>a</p>")
+
+    def test_template_minified_at_compile(self):
+        template = Template(
+            '<head>\n  <link href="/index.css" rel="stylesheet" />\n</head>\n'
+            '<meta content="{{ Title }}">\n<article>\n  {{ Content }}\n</article>\n',
+            "/ssg",
+            minify=True,
+        )
+        self.assertEqual(
+            template.render("A title", "<p>x</p>"),
+            "<head><link href=/ssg/index.css rel=stylesheet></head>"
+            '<meta content="A title"><article><p>x</p></article>',
+        )
+        self.assertNotEqual(
+            template.render_context, Template("", "/ssg").render_context
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import unittest
+from unittest import mock
+
+import output
+from output import discard_output, stage_output, staging_dir_for, swap_output
+from testing import TempDirTests
+
+
+class TestOutput(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.public, "blog", "empty"))
+        self.write(os.path.join(self.public, "index.html"), "old home")
+        self.write(os.path.join(self.public, "blog", "post.html"), "old post")
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def test_stage_reuses_files_with_hardlinks(self):
+        staging_dir = stage_output(self.public)
+        self.assertEqual(staging_dir, self.public + ".staging")
+        for rel_path in ("index.html", os.path.join("blog", "post.html")):
+            self.assertTrue(
+                os.path.samefile(
+                    os.path.join(self.public, rel_path),
+                    os.path.join(staging_dir, rel_path),
+                )
+            )
+        self.assertTrue(os.path.isdir(os.path.join(staging_dir, "blog", "empty")))
+
+    def test_stage_without_reuse_is_empty(self):
+        staging_dir = stage_output(self.public, reuse=False)
+        self.assertEqual(os.listdir(staging_dir), [])
+
+    def test_stage_replaces_leftover_staging(self):
+        leftover = staging_dir_for(self.public)
+        os.makedirs(leftover)
+        self.write(os.path.join(leftover, "junk.html"), "junk")
+        staging_dir = stage_output(self.public)
+        self.assertFalse(os.path.exists(os.path.join(staging_dir, "junk.html")))
+
+    def test_swap_publishes_staging(self):
+        staging_dir = stage_output(self.public)
+        # Replace a page the way generate_page does, by renaming over it
+        tmp_path = os.path.join(staging_dir, "index.html.tmp")
+        self.write(tmp_path, "new home")
+        os.replace(tmp_path, os.path.join(staging_dir, "index.html"))
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "old home")
+
+        swap_output(staging_dir, self.public)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "new home")
+        self.assertEqual(
+            self.read(os.path.join(self.public, "blog", "post.html")), "old post"
+        )
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["public"])
+
+    def test_swap_without_atomic_exchange(self):
+        staging_dir = stage_output(self.public, reuse=False)
+        self.write(os.path.join(staging_dir, "index.html"), "new home")
+        with mock.patch.object(output, "exchange_paths", side_effect=OSError):
+            swap_output(staging_dir, self.public)
+        self.assertEqual(os.listdir(self.public), ["index.html"])
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["public"])
+
+    def test_swap_into_missing_output(self):
+        new_public = os.path.join(self.tmp.name, "site")
+        staging_dir = stage_output(new_public)
+        swap_output(staging_dir, new_public)
+        self.assertTrue(os.path.isdir(new_public))
+        self.assertFalse(os.path.exists(staging_dir))
+
+    def test_discard(self):
+        staging_dir = stage_output(self.public)
+        discard_output(staging_dir)
+        self.assertFalse(os.path.exists(staging_dir))
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "old home")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import gzip
+import os
+import unittest
+
+from manifest import BuildManifest
+from precompress import ENCODINGS, precompress_output
+from testing import TempDirTests
+
+
+class TestPrecompress(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = os.path.join(self.tmp.name, "docs")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.output, "blog"))
+        self.page = os.path.join(self.output, "blog", "index.html")
+        self.write(self.page, "<p>hello</p>" * 200)
+        self.write(os.path.join(self.output, "small.css"), "body {}")
+        self.write(os.path.join(self.output, "image.png"), "png" * 1000)
+
+    def precompress(self, enabled=True):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        precompress_output(self.output, manifest, 1024, enabled=enabled)
+        manifest.save()
+        return manifest
+
+    def test_large_text_files_get_siblings(self):
+        manifest = self.precompress()
+        self.assertEqual(manifest.compress_misses, 1)
+        for suffix in ENCODINGS:
+            self.assertTrue(os.path.exists(self.page + suffix))
+        with gzip.open(self.page + ".gz", "rt") as file:
+            self.assertEqual(file.read(), "<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "small.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.output, "image.png.gz")))
+
+    def test_output_is_reproducible(self):
+        self.precompress()
+        with open(self.page + ".gz", "rb") as file:
+            first = file.read()
+        os.remove(self.page + ".gz")
+        self.precompress()
+        with open(self.page + ".gz", "rb") as file:
+            self.assertEqual(file.read(), first)
+
+    def test_unchanged_files_are_skipped(self):
+        self.precompress()
+        manifest = self.precompress()
+        self.assertEqual((manifest.compress_hits, manifest.compress_misses), (1, 0))
+
+    def test_changed_file_is_compressed_again(self):
+        self.precompress()
+        self.write(self.page, "<p>bye</p>" * 200)
+        manifest = self.precompress()
+        self.assertEqual(manifest.compress_misses, 1)
+        with gzip.open(self.page + ".gz", "rt") as file:
+            self.assertEqual(file.read(), "<p>bye</p>" * 200)
+
+    def test_siblings_of_removed_files_are_deleted(self):
+        self.precompress()
+        os.remove(self.page)
+        manifest = self.precompress()
+        self.assertEqual(manifest.compress_removed, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.output, "blog")))
+
+    def test_disabled_deletes_siblings(self):
+        self.precompress()
+        manifest = self.precompress(enabled=False)
+        self.assertEqual(manifest.compress_removed, 1)
+        self.assertFalse(os.path.exists(self.page + ".gz"))
+        self.assertEqual(manifest.compressed, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import unittest
+
+from profiling import BuildProfile, timed
+
+
+class TestBuildProfile(unittest.TestCase):
+    def setUp(self):
+        self.profile = BuildProfile()
+        self.profile.add_page("a.md", {"parse": 0.003, "write": 0.001})
+        self.profile.add_page("b.md", {"parse": 0.001, "write": 0.001})
+        self.profile.add_page("c.md", {"parse": 0.005, "write": 0.0})
+        with timed(self.profile, "static"):
+            pass
+        self.profile.finish()
+
+    def test_stages_are_summed(self):
+        self.assertAlmostEqual(self.profile.stages["parse"], 0.009)
+        self.assertAlmostEqual(self.profile.stages["write"], 0.002)
+        self.assertIn("static", self.profile.stages)
+
+    def test_slowest(self):
+        slowest = [path for path, _ in self.profile.slowest(2)]
+        self.assertEqual(slowest, ["c.md", "a.md"])
+
+    def test_summary(self):
+        summary = self.profile.summary(top=1)
+        self.assertIn("Profile: 3 page(s)", summary)
+        self.assertIn("Slowest 1 page(s):", summary)
+        self.assertIn("c.md", summary)
+        self.assertNotIn("b.md", summary)
+
+    def test_save(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache", "profile.json")
+            self.profile.save(path, top=2)
+            with open(path) as file:
+                data = json.load(file)
+        self.assertEqual(data["pages_generated"], 3)
+        self.assertEqual([page["path"] for page in data["slowest"]], ["c.md", "a.md"])
+        self.assertEqual(set(data["pages"]), {"a.md", "b.md", "c.md"})
+
+    def test_timed_without_profile(self):
+        with timed(None, "static"):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
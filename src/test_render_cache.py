@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import unittest
+from unittest import mock
+
+from render_cache import RenderCache, block_key, render_key
+from testing import TempDirTests
+from textnode import markdown_to_html_node
+from utilities import generate_pages_recursive, render_content_blocks
+
+
+class TestRenderCache(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "cache", "render.sqlite3")
+        self.cache = RenderCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_round_trip(self):
+        html = "<div><p>" + "hello " * 1000 + "</p></div>"
+        self.cache.update([], [("k", "Title", html, {})])
+        self.assertEqual(self.cache.get("k"), ("Title", html))
+        self.assertIsNone(self.cache.get("missing"))
+        (size,) = self.cache.connection.execute("SELECT size FROM entries").fetchone()
+        self.assertLess(size, len(html) // 10)
+
+    def test_read_only_connection(self):
+        self.cache.update([], [("k", "Title", "<div></div>", {})])
+        reader = RenderCache.read_only(self.path)
+        self.assertEqual(RenderCache.lookup(reader, "k"), ("Title", "<div></div>"))
+        with self.assertRaises(Exception):
+            reader.execute("DELETE FROM entries")
+
+    def test_read_only_connection_per_process(self):
+        reader = RenderCache.read_only(self.path)
+        self.assertIs(RenderCache.read_only(self.path), reader)
+        # A forked worker opens its own rather than using its parent's
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(RenderCache.read_only(self.path), reader)
+            # Closing the cache closes the reader of the current process
+            self.cache.close()
+        self.cache = RenderCache(self.path)
+
+    def test_key_includes_basepath(self):
+        self.assertNotEqual(render_key("abc", "/"), render_key("abc", "/ssg/"))
+
+    def test_lru_eviction(self):
+        # Incompressible HTML, so each entry has a predictable size
+        html = os.urandom(3000).hex()
+        self.cache.max_bytes = 12000
+        self.cache.update([], [("a", "", html, {}), ("b", "", html, {})])
+        self.cache.update([], [("c", "", html, {})])
+        self.cache.update(["a"], [])
+        self.cache.update([], [("d", "", html, {})])
+        self.assertEqual(self.cache.evicted, 1)
+        self.assertIsNone(self.cache.get("b"))
+        for key in ("a", "c", "d"):
+            self.assertIsNotNone(self.cache.get(key))
+
+    def test_corrupt_cache_is_replaced(self):
+        self.cache.close()
+        os.remove(self.path)
+        self.write(self.path, "not a database" * 100)
+        self.write(self.path + "-wal", "not a log" * 100)
+        self.cache = RenderCache(self.path)
+        self.assertIsNone(self.cache.get("k"))
+        self.cache.update([], [("k", "Title", "<div></div>", {})])
+        self.assertEqual(self.cache.get("k"), ("Title", "<div></div>"))
+
+    def test_locked_cache_is_kept(self):
+        self.cache.update([], [("k", "Title", "<div></div>", {})])
+        self.cache.close()
+        with mock.patch.object(
+            RenderCache,
+            "connect",
+            side_effect=sqlite3.OperationalError("database is locked"),
+        ):
+            with self.assertRaises(sqlite3.OperationalError):
+                RenderCache(self.path)
+        self.cache = RenderCache(self.path)
+        self.assertEqual(self.cache.get("k"), ("Title", "<div></div>"))
+
+    def test_blocks_round_trip(self):
+        self.cache.update([], [], [], [("a", "<p>a</p>"), ("b", "<p>b</p>")])
+        self.assertEqual(
+            self.cache.get_blocks(["a", "c", "a"]),
+            {"a": "<p>a</p>"},
+        )
+
+    def test_old_schema_is_replaced(self):
+        self.cache.update([], [("k", "Title", "<div></div>", {})])
+        self.cache.connection.execute("PRAGMA user_version = 1")
+        self.cache.close()
+        self.cache = RenderCache(self.path)
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_edited_page_only_converts_changed_blocks(self):
+        md_path = os.path.join(self.tmp.name, "page.md")
+        blocks = ["# Title"] + [f"Paragraph [{i}](/p/{i})" for i in range(50)]
+        self.write(md_path, "\n\n".join(blocks))
+        reader = RenderCache.read_only(self.path)
+        _, reused, converted = render_content_blocks(md_path, reader, "/ssg/")
+        self.assertEqual((len(reused), len(converted)), (0, 51))
+        self.cache.update([], [], reused, list(converted.items()))
+
+        blocks[10] = "Edited **paragraph**"
+        md = "\n\n".join(blocks)
+        self.write(md_path, md)
+        content, reused, converted = render_content_blocks(md_path, reader, "/ssg/")
+        self.assertEqual(len(reused), 50)
+        self.assertEqual(list(converted), [block_key(blocks[10], "/ssg/")])
+        self.assertEqual(
+            content, ("Title", markdown_to_html_node(md, "/ssg/").to_html())
+        )
+
+    def test_entries_keep_image_sizes(self):
+        entry = ("k", "Title", "<div></div>", {"/a.png": [1, 2], "/b.png": None})
+        self.cache.update([], [entry])
+        shown = {}
+        reader = RenderCache.read_only(self.path)
+        self.assertEqual(
+            RenderCache.lookup(reader, "k", {"/a.png": (1, 2)}, shown),
+            ("Title", "<div></div>"),
+        )
+        self.assertEqual(shown, {"/a.png": [1, 2], "/b.png": None})
+        self.assertIsNone(self.cache.get("k", {"/a.png": (3, 4)}))
+        self.assertIsNone(self.cache.get("k", {"/a.png": (1, 2), "/b.png": (5, 6)}))
+
+    def test_changed_image_only_converts_blocks_showing_it(self):
+        md_path = os.path.join(self.tmp.name, "page.md")
+        self.write(md_path, "# Title\n\n![a](/a.png)\n\n![b](/b.png)\n\nText")
+        reader = RenderCache.read_only(self.path)
+        images = {"/a.png": (1, 2), "/b.png": (3, 4)}
+        block_images = {}
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/", images=images, block_images=block_images
+        )
+        self.assertEqual(len(block_images), 2)
+        self.cache.update(
+            [],
+            [],
+            reused,
+            list(converted.items()),
+            block_images=list(block_images.items()),
+        )
+
+        images["/a.png"] = (5, 6)
+        shown = {}
+        content, reused, converted = render_content_blocks(
+            md_path, reader, "/", images=images, shown=shown
+        )
+        self.assertEqual(len(reused), 3)
+        self.assertEqual(list(converted), [block_key("![a](/a.png)", "/")])
+        self.assertEqual(shown, {"/a.png": [5, 6], "/b.png": [3, 4]})
+        self.assertIn('width="5" height="6"', content[1])
+
+    def test_blocks_keep_search_terms(self):
+        md_path = os.path.join(self.tmp.name, "page.md")
+        self.write(md_path, "# Title\n\nOne word\n\nOne more")
+        reader = RenderCache.read_only(self.path)
+        # Blocks cached before indexing have no terms yet
+        _, reused, converted = render_content_blocks(md_path, reader, "/ssg/")
+        self.cache.update([], [], reused, list(converted.items()))
+        self.assertEqual(self.cache.get_block_data(list(converted), "terms"), {})
+
+        terms = {}
+        block_terms = {}
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/ssg/", terms=terms, block_terms=block_terms
+        )
+        self.assertEqual((len(reused), len(converted)), (0, 3))
+        self.assertEqual(terms, {"title": 8, "one": 2, "word": 1, "more": 1})
+        self.cache.update(
+            [], [], reused, list(converted.items()), list(block_terms.items())
+        )
+
+        self.write(md_path, "# Title\n\nOne word\n\nOne less")
+        again = {}
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/ssg/", terms=again
+        )
+        self.assertEqual((len(reused), len(converted)), (2, 1))
+        self.assertEqual(again, {"title": 8, "one": 2, "word": 1, "less": 1})
+
+    def test_blocks_keep_links_alongside_terms(self):
+        md_path = os.path.join(self.tmp.name, "page.md")
+        self.write(md_path, "# Title\n\nSee [a](/a) and [b](/b)")
+        reader = RenderCache.read_only(self.path)
+        links = []
+        block_links = {}
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/ssg/", links=links, block_links=block_links
+        )
+        self.assertEqual(links, ["/a", "/b"])
+        self.cache.update(
+            [], [], reused, list(converted.items()), block_links=block_links.items()
+        )
+
+        # Storing terms later converts the blocks again but keeps their links
+        block_terms = {}
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/ssg/", terms={}, block_terms=block_terms
+        )
+        self.cache.update(
+            [], [], reused, list(converted.items()), list(block_terms.items())
+        )
+        terms = {}
+        links = []
+        _, reused, converted = render_content_blocks(
+            md_path, reader, "/ssg/", terms=terms, links=links
+        )
+        self.assertEqual((len(reused), len(converted)), (2, 0))
+        self.assertEqual(links, ["/a", "/b"])
+        self.assertEqual(terms["see"], 1)
+
+    def test_template_change_reuses_content(self):
+        content = os.path.join(self.tmp.name, "content")
+        public = os.path.join(self.tmp.name, "public")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        self.write(os.path.join(content, "index.md"), "# Home\n\n[a](/a)")
+        self.write(os.path.join(content, "about.md"), "# About")
+        self.write(template, "<title>{{ Title }}</title>{{ Content }}")
+        generate_pages_recursive(content, template, public, "/ssg/", cache=self.cache)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+
+        self.write(template, "<h1>{{ Title }}</h1>{{ Content }}")
+        generate_pages_recursive(
+            content, template, public, "/ssg/", jobs=2, cache=self.cache
+        )
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+        with open(os.path.join(public, "index.html")) as file:
+            self.assertEqual(
+                file.read(),
+                '<h1>Home</h1><div><h1>Home</h1><p><a href="/ssg/a">a</a></p></div>',
+            )
+
+    def test_big_sources_bypass_cache(self):
+        content = os.path.join(self.tmp.name, "content")
+        public = os.path.join(self.tmp.name, "public")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(content)
+        self.write(os.path.join(content, "index.md"), "# Home\n\n" + "text " * 100)
+        self.write(os.path.join(content, "about.md"), "# About")
+        self.write(template, "{{ Content }}")
+        with mock.patch("utilities.MAX_SOURCE_BYTES", 100):
+            generate_pages_recursive(content, template, public, cache=self.cache)
+            generate_pages_recursive(content, template, public, cache=self.cache)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+        self.assertEqual(self.cache.block_misses, 1)
+        with open(os.path.join(public, "index.html")) as file:
+            self.assertEqual(
+                file.read(), "<div><h1>Home</h1><p>" + "text " * 99 + "text</p></div>"
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+import json
+import os
+import unittest
+
+from manifest import BuildManifest
+from render_cache import RenderCache
+from search import (
+    SEARCH_DIR,
+    SearchIndex,
+    add_terms,
+    remove_search_index,
+    shard_name,
+)
+from testing import TempDirTests
+from utilities import generate_pages_recursive, update_pages
+
+
+class TestTerms(unittest.TestCase):
+    def test_add_terms(self):
+        terms = {"tom": 1}
+        add_terms("Tom's hat, a 2nd_hat!", terms, 2)
+        self.assertEqual(terms, {"tom": 3, "hat": 2, "2nd_hat": 2})
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("tolkien"), "to")
+        self.assertEqual(shard_name("t"), "t")
+        self.assertEqual(shard_name("éowyn"), "_e9_o")
+        self.assertEqual(shard_name("_x"), "_5f_x")
+
+
+class TestSearchIndex(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.index_path = os.path.join(self.tmp.name, "search.json")
+        self.manifest_path = os.path.join(self.tmp.name, "manifest.json")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "{{ Title }}{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome home")
+        self.write(
+            os.path.join(self.content, "blog", "tom.md"), "# Tom\n\nTom sings **loud**"
+        )
+
+    def read_json(self, name):
+        with open(os.path.join(self.public, SEARCH_DIR, name)) as file:
+            return json.load(file)
+
+    def build(self, cache=None, jobs=1):
+        search = SearchIndex.load(self.index_path)
+        manifest = BuildManifest.load(self.manifest_path, {})
+        generate_pages_recursive(
+            self.content,
+            self.template,
+            self.public,
+            "/ssg",
+            manifest,
+            jobs=jobs,
+            cache=cache,
+            search=search,
+        )
+        manifest.save()
+        search.save()
+        return search
+
+    def postings(self, term):
+        pages = self.read_json("pages.json")
+        name = shard_name(term) + ".json"
+        if not os.path.exists(os.path.join(self.public, SEARCH_DIR, name)):
+            return {}
+        shard = self.read_json(name)
+        return {pages[page_id][0]: weight for page_id, weight in shard.get(term, [])}
+
+    def test_writes_shards_and_pages(self):
+        search = self.build(jobs=2)
+        self.assertEqual(search.indexed, 2)
+        self.assertEqual(
+            sorted(map(tuple, self.read_json("pages.json"))),
+            [("/ssg/", "Home"), ("/ssg/blog/tom.html", "Tom")],
+        )
+        self.assertEqual(self.postings("tom"), {"/ssg/blog/tom.html": 9})
+        self.assertEqual(self.postings("home"), {"/ssg/": 9})
+        self.assertTrue(
+            os.path.exists(os.path.join(self.public, SEARCH_DIR, "search.js"))
+        )
+
+    def test_only_changed_shards_are_written(self):
+        self.build()
+        self.write(
+            os.path.join(self.content, "blog", "tom.md"), "# Tom\n\nTom sings **soft**"
+        )
+        search = self.build()
+        self.assertEqual((search.indexed, search.written), (1, 1))
+        self.assertEqual(self.postings("soft"), {"/ssg/blog/tom.html": 1})
+        # The shard of "loud" had no other terms
+        self.assertFalse(
+            os.path.exists(os.path.join(self.public, SEARCH_DIR, "lo.json"))
+        )
+
+        search = self.build()
+        self.assertEqual((search.indexed, search.written), (0, 0))
+
+    def test_pages_built_before_are_indexed(self):
+        manifest = BuildManifest.load(self.manifest_path, {})
+        generate_pages_recursive(
+            self.content, self.template, self.public, "/ssg", manifest
+        )
+        manifest.save()
+        self.assertEqual(self.build().indexed, 2)
+        self.assertEqual(self.postings("welcome"), {"/ssg/": 1})
+
+    def test_render_cache_blocks_reuse_terms(self):
+        cache = RenderCache(os.path.join(self.tmp.name, "render.sqlite3"))
+        try:
+            self.build(cache)
+            self.write(
+                os.path.join(self.content, "blog", "tom.md"),
+                "# Tom\n\nTom sings **loud**\n\nand dances",
+            )
+            search = self.build(cache)
+            self.assertEqual((cache.block_hits, cache.block_misses), (2, 5))
+        finally:
+            cache.close()
+        self.assertEqual(search.indexed, 1)
+        self.assertEqual(self.postings("tom"), {"/ssg/blog/tom.html": 9})
+        self.assertEqual(self.postings("dances"), {"/ssg/blog/tom.html": 1})
+
+    def test_removed_pages_are_dropped(self):
+        self.build()
+        tom = os.path.join(self.content, "blog", "tom.md")
+        os.remove(tom)
+        search = self.build()
+        self.assertEqual(search.removed, 1)
+        self.assertCountEqual(self.read_json("pages.json"), [["/ssg/", "Home"], None])
+        self.assertFalse(
+            os.path.exists(os.path.join(self.public, SEARCH_DIR, "si.json"))
+        )
+
+        # The freed id goes to the next new page
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        self.build()
+        self.assertEqual(self.postings("about"), {"/ssg/about.html": 8})
+        self.assertEqual(len(self.read_json("pages.json")), 2)
+
+    def test_update_pages_removes_deleted_page(self):
+        search = self.build()
+        manifest = BuildManifest.load(self.manifest_path, {})
+        tom = os.path.join(self.content, "blog", "tom.md")
+        os.remove(tom)
+        update_pages(
+            [tom],
+            self.content,
+            self.template,
+            self.public,
+            "/ssg",
+            manifest,
+            search=search,
+        )
+        self.assertEqual(self.postings("tom"), {})
+        self.assertNotIn(tom, search.pages)
+
+    def test_remove_search_index(self):
+        self.build()
+        remove_search_index(self.public)
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR)))
+        # Missing shards are written again even though nothing changed
+        self.assertGreater(self.build().written, 0)
+        self.assertEqual(self.postings("home"), {"/ssg/": 9})
+
+
+if __name__ == "__main__":
+    unittest.main()
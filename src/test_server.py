@@ -0,0 +1,137 @@
+import io
+import os
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from http.server import ThreadingHTTPServer
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import server
+from server import DevServer, inject_live_reload, make_handler
+from testing import TempDirTests
+
+
+class TestDevServer(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        os.makedirs(self.static)
+        self.write(
+            self.template, "<title>{{ Title }}</title><body>{{ Content }}</body>"
+        )
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Blog](/blog)")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+
+        self.dev_server = DevServer(self.content, self.static, self.template, "/ssg/")
+        handler = make_handler(self.dev_server)
+        # Keep request logs out of the test output
+        handler.log_message = lambda *args: None
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get(self, path, method="GET"):
+        url = f"http://127.0.0.1:{self.port}{path}"
+        with urlopen(Request(url, method=method)) as response:
+            return response.read().decode("utf-8"), response.headers
+
+    def test_inject_live_reload(self):
+        html = inject_live_reload("<body><p>x</p></body>", "/")
+        self.assertTrue(html.endswith("</script></body>"))
+        self.assertIn('EventSource("/__livereload")', html)
+
+    def test_resolve_page(self):
+        blog = os.path.join(self.content, "blog", "index.md")
+        self.assertEqual(self.dev_server.resolve_page("blog"), blog)
+        self.assertEqual(self.dev_server.resolve_page("blog/index.html"), blog)
+        self.assertIsNone(self.dev_server.resolve_page("missing"))
+
+    def test_serves_rendered_page_with_basepath(self):
+        body, headers = self.get("/ssg/")
+        self.assertIn("<title>Home</title>", body)
+        self.assertIn('<a href="/ssg/blog">Blog</a>', body)
+        self.assertIn('EventSource("/ssg/__livereload")', body)
+        self.assertEqual(headers["Cache-Control"], "no-cache")
+
+    def test_serves_static_from_source(self):
+        body, headers = self.get("/ssg/index.css")
+        self.assertEqual(body, "body {}")
+        self.assertEqual(headers["Content-Type"], "text/css")
+
+    def test_head_sends_headers_only(self):
+        body, headers = self.get("/ssg/index.css", "HEAD")
+        self.assertEqual(body, "")
+        self.assertEqual(headers["Content-Length"], "7")
+
+    def test_missing_and_outside_paths(self):
+        for path in ("/ssg/missing", "/other/", "/ssg/../template.html"):
+            with self.assertRaises(HTTPError) as cm:
+                self.get(path)
+            self.assertEqual(cm.exception.code, 404)
+
+    def test_change_invalidates_page_and_notifies(self):
+        source_path = os.path.join(self.content, "index.md")
+        self.get("/ssg/")
+        self.assertIn(source_path, self.dev_server.pages)
+        client = self.dev_server.add_client()
+        self.write(source_path, "# Changed")
+        self.dev_server.handle_changes({source_path})
+        self.assertEqual(client.get(timeout=1), "reload")
+        self.assertIn("<title>Changed</title>", self.get("/ssg/")[0])
+
+    def test_template_change_clears_every_page(self):
+        self.get("/ssg/")
+        self.get("/ssg/blog/")
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.dev_server.handle_changes({self.template})
+        self.assertEqual(self.dev_server.pages, {})
+        self.assertIn("<h1>Blog</h1>", self.get("/ssg/blog/")[0])
+
+    def test_page_changed_while_rendering_is_not_kept(self):
+        source_path = os.path.join(self.content, "index.md")
+        render_page = server.render_page
+
+        def render_during_change(md, template):
+            self.dev_server.handle_changes({source_path})
+            return render_page(md, template)
+
+        with mock.patch.object(server, "render_page", render_during_change):
+            self.get("/ssg/")
+        self.assertNotIn(source_path, self.dev_server.pages)
+        self.get("/ssg/")
+        self.assertIn(source_path, self.dev_server.pages)
+
+    def test_watch_survives_failed_batch(self):
+        source_path = os.path.join(self.content, "index.md")
+        client = self.dev_server.add_client()
+        os.remove(self.template)
+        batches = [{self.template}, {source_path}]
+        stderr = io.StringIO()
+        with mock.patch.object(server, "iter_changes", return_value=batches):
+            with mock.patch.object(server, "create_watcher"):
+                with redirect_stdout(io.StringIO()), redirect_stderr(stderr):
+                    self.dev_server.watch()
+        self.assertIn("FileNotFoundError", stderr.getvalue())
+        self.assertEqual(client.get(timeout=1), "reload")
+        self.assertIn("<title>Home</title>", self.get("/ssg/")[0])
+
+    def test_render_error_is_reported(self):
+        self.write(os.path.join(self.content, "broken.md"), "no title")
+        with self.assertRaises(HTTPError) as cm:
+            self.get("/ssg/broken.html")
+        self.assertEqual(cm.exception.code, 500)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import unittest
+from unittest import mock
+
+import sitemap
+from manifest import BuildManifest
+from sitemap import page_url, remove_sitemap, write_sitemap
+from testing import TempDirTests
+from utilities import generate_pages_recursive
+
+
+class TestSitemap(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.public = self.tmp.name
+
+    def read(self, name):
+        with open(os.path.join(self.public, name)) as file:
+            return file.read()
+
+    def test_page_url(self):
+        site = "https://example.com/"
+        self.assertEqual(
+            page_url("index.html", site, "/ssg/"), "https://example.com/ssg/"
+        )
+        self.assertEqual(
+            page_url(os.path.join("blog", "tom", "index.html"), site),
+            "https://example.com/blog/tom/",
+        )
+        self.assertEqual(
+            page_url("a page.html", site), "https://example.com/a%20page.html"
+        )
+
+    def test_urlset(self):
+        write_sitemap(
+            self.public,
+            [("b.html", None), ("a.html", "2024-01-02T03:04:05Z")],
+            "https://example.com",
+        )
+        self.assertEqual(
+            self.read("sitemap.xml"),
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            "  <url><loc>https://example.com/a.html</loc>"
+            "<lastmod>2024-01-02T03:04:05Z</lastmod></url>\n"
+            "  <url><loc>https://example.com/b.html</loc></url>\n"
+            "</urlset>\n",
+        )
+
+    def test_split_into_index_past_max_urls(self):
+        pages = [(f"{i}.html", f"2024-01-0{i}T00:00:00Z") for i in range(1, 6)]
+        with mock.patch.object(sitemap, "MAX_URLS", 2):
+            write_sitemap(self.public, pages, "https://example.com", "/ssg/")
+        index = self.read("sitemap.xml")
+        self.assertIn("<sitemapindex", index)
+        self.assertIn(
+            "<loc>https://example.com/ssg/sitemap-3.xml</loc>"
+            "<lastmod>2024-01-05T00:00:00Z</lastmod>",
+            index,
+        )
+        self.assertEqual(self.read("sitemap-1.xml").count("<url>"), 2)
+        self.assertEqual(self.read("sitemap-3.xml").count("<url>"), 1)
+
+        with mock.patch.object(sitemap, "MAX_URLS", 3):
+            write_sitemap(self.public, pages, "https://example.com", "/ssg/")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "sitemap-3.xml")))
+        write_sitemap(self.public, pages, "https://example.com", "/ssg/")
+        self.assertEqual(sorted(os.listdir(self.public)), ["sitemap.xml"])
+
+    def test_remove_sitemap(self):
+        pages = [(f"{i}.html", None) for i in range(1, 4)]
+        with mock.patch.object(sitemap, "MAX_URLS", 2):
+            write_sitemap(self.public, pages, "https://example.com")
+        self.write(os.path.join(self.public, "index.html"), "")
+        manifest = BuildManifest(os.path.join(self.tmp.name, "m.json"), {})
+        remove_sitemap(self.public, manifest)
+        self.assertEqual(os.listdir(self.public), ["index.html"])
+
+        # One copied from the static directory stays
+        self.write(os.path.join(self.public, "sitemap.xml"), "<urlset/>")
+        manifest.assets["sitemap.xml"] = {}
+        remove_sitemap(self.public, manifest)
+        self.assertEqual(self.read("sitemap.xml"), "<urlset/>")
+
+    def test_generate_pages_recursive_writes_sitemap(self):
+        content = os.path.join(self.tmp.name, "content")
+        public = os.path.join(self.tmp.name, "public")
+        template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(content, "blog"))
+        for path, text in (
+            (template, "{{ Title }}{{ Content }}"),
+            (os.path.join(content, "index.md"), "# Home"),
+            (os.path.join(content, "blog", "post.md"), "# Post"),
+        ):
+            self.write(path, text)
+        generate_pages_recursive(
+            content, template, public, "/ssg", site_url="https://example.com"
+        )
+        with open(os.path.join(public, "sitemap.xml")) as file:
+            text = file.read()
+        self.assertIn("<loc>https://example.com/ssg/</loc>", text)
+        self.assertIn("<loc>https://example.com/ssg/blog/post.html</loc>", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
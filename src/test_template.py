@@ -0,0 +1,87 @@
+import unittest
+
+from template import (
+    Template,
+    normalize_basepath,
+    prefix_basepath,
+    resolve_url,
+    rewrite_urls,
+)
+
+
+class TestTemplate(unittest.TestCase):
+    def test_render(self):
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(
+            template.render("Hello", "<p>Hi</p>"),
+            "<title>Hello</title><main><p>Hi</p></main>",
+        )
+
+    def test_render_no_placeholders(self):
+        template = Template("<p>static</p>")
+        self.assertEqual(template.render("Title", "Content"), "<p>static</p>")
+
+    def test_render_repeated_placeholder(self):
+        template = Template("{{ Title }}|{{ Title }}")
+        self.assertEqual(template.render("T", "C"), "T|T")
+
+    def test_render_values_are_not_expanded(self):
+        template = Template("{{ Title }}:{{ Content }}")
+        self.assertEqual(template.render("{{ Content }}", "x"), "{{ Content }}:x")
+
+    def test_basepath_applied_at_compile(self):
+        template = Template(
+            '<link href="/index.css" /><img src="/a.png" />{{ Content }}', "/ssg"
+        )
+        self.assertEqual(
+            template.render("", ""),
+            '<link href="/ssg/index.css" /><img src="/ssg/a.png" />',
+        )
+
+    def test_normalize_basepath(self):
+        self.assertEqual(normalize_basepath("/"), "/")
+        self.assertEqual(normalize_basepath("/ssg"), "/ssg/")
+        self.assertEqual(normalize_basepath("/ssg/"), "/ssg/")
+
+    def test_rewrite_urls(self):
+        html = '<a href="/x">x</a><a href="https://y">y</a>'
+        self.assertEqual(
+            rewrite_urls(html, "/ssg/"),
+            '<a href="/ssg/x">x</a><a href="https://y">y</a>',
+        )
+
+    def test_rewrite_urls_only_rewrites_attributes(self):
+        html = '<a data-href="/x" href="//cdn/y"><img src="/z.png"></a>'
+        self.assertEqual(
+            rewrite_urls(html, "/ssg/"),
+            '<a data-href="/x" href="//cdn/y"><img src="/ssg/z.png"></a>',
+        )
+
+    def test_prefix_basepath(self):
+        self.assertEqual(prefix_basepath("/blog/tom", "/ssg/"), "/ssg/blog/tom")
+        self.assertEqual(prefix_basepath("/blog", "/"), "/blog")
+        self.assertEqual(prefix_basepath("https://x/y", "/ssg/"), "https://x/y")
+        self.assertEqual(prefix_basepath("//cdn/y", "/ssg/"), "//cdn/y")
+        self.assertEqual(prefix_basepath("#top", "/ssg/"), "#top")
+
+    def test_resolve_url(self):
+        assets = {"/index.css": "/index.0123abcd.css"}
+        self.assertEqual(
+            resolve_url("/index.css", "/ssg/", assets), "/ssg/index.0123abcd.css"
+        )
+        self.assertEqual(resolve_url("/index.css?v=1", "/", assets), "/index.css?v=1")
+        self.assertEqual(resolve_url("/blog", "/ssg/", assets), "/ssg/blog")
+
+    def test_assets_applied_at_compile(self):
+        assets = {"/index.css": "/index.0123abcd.css"}
+        template = Template('<link href="/index.css" />{{ Content }}', "/ssg", assets)
+        self.assertEqual(
+            template.render("", ""), '<link href="/ssg/index.0123abcd.css" />'
+        )
+        self.assertNotEqual(
+            template.render_context, Template("", "/ssg").render_context
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
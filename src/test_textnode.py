@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from textnode import (
@@ -5,6 +6,9 @@ from textnode import (
     TextNode,
     TextType,
     block_to_block_type,
+    classify_block,
+    iter_blocks,
+    iter_markdown_html,
     extract_markdown_images,
     extract_markdown_links,
     markdown_to_blocks,
@@ -23,6 +27,9 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", TextType.BOLD)
         self.assertEqual(node, node2)
 
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(TextNode("text", TextType.TEXT), "__dict__"))
+
     def test_eq_false_different_text(self):
         n1 = TextNode("hello", TextType.TEXT)
         n2 = TextNode("world", TextType.TEXT)
@@ -81,11 +88,18 @@ class TestTextNode(unittest.TestCase):
         self.assertEqual(html_node.tag, "img")
         self.assertEqual(html_node.value, "")
         self.assertEqual(
-            html_node.props, {"src": "https://example.com/image.png", "alt": "Alt text"}
+            html_node.props,
+            {
+                "src": "https://example.com/image.png",
+                "alt": "Alt text",
+                "loading": "lazy",
+                "decoding": "async",
+            },
         )
         self.assertEqual(
             html_node.to_html(),
-            '<img src="https://example.com/image.png" alt="Alt text" />',
+            '<img src="https://example.com/image.png" alt="Alt text" loading="lazy" '
+            'decoding="async" />',
         )
 
     # split_nodes_delimiter
@@ -1188,12 +1202,113 @@ class TestTextNode(unittest.TestCase):
         self.assertListEqual(expected, result)
 
     def test_text_to_textnodes_nested_delimiters(self):
-        # Nested delimiters don't work because once text is BOLD, it's no longer TEXT
         text = "**bold with _italic_ inside**"
         result = text_to_textnodes(text)
         expected = [
             TextNode("", TextType.TEXT),
-            TextNode("bold with _italic_ inside", TextType.BOLD),
+            TextNode(
+                "bold with _italic_ inside",
+                TextType.BOLD,
+                children=[
+                    TextNode("bold with ", TextType.TEXT),
+                    TextNode("italic", TextType.ITALIC),
+                    TextNode(" inside", TextType.TEXT),
+                ],
+            ),
+            TextNode("", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_bold_inside_italic(self):
+        text = "An _italic **and bold**_ word"
+        result = text_to_textnodes(text)
+        expected = [
+            TextNode("An ", TextType.TEXT),
+            TextNode(
+                "italic **and bold**",
+                TextType.ITALIC,
+                children=[
+                    TextNode("italic ", TextType.TEXT),
+                    TextNode("and bold", TextType.BOLD),
+                ],
+            ),
+            TextNode(" word", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_nested_to_html(self):
+        nodes = text_to_textnodes("_a **b** [c](d)_")
+        html = "".join(text_node_to_html_node(tn).to_html() for tn in nodes)
+        self.assertEqual(html, '<i>a <b>b</b> <a href="d">c</a></i>')
+
+    def test_text_to_textnodes_improper_nesting_raises(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("**bold _italic** text_")
+
+    def test_text_to_textnodes_unclosed_inner_delimiter_is_text(self):
+        result = text_to_textnodes("**snake_case**")
+        expected = [
+            TextNode("", TextType.TEXT),
+            TextNode("snake_case", TextType.BOLD),
+            TextNode("", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_unmatched_backtick_in_emphasis_is_text(self):
+        result = text_to_textnodes("**bold with ` tick** and _it_")
+        expected = [
+            TextNode("", TextType.TEXT),
+            TextNode("bold with ` tick", TextType.BOLD),
+            TextNode(" and ", TextType.TEXT),
+            TextNode("it", TextType.ITALIC),
+            TextNode("", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_unmatched_raises(self):
+        with self.assertRaises(ValueError):
+            text_to_textnodes("a **b")
+        with self.assertRaises(ValueError):
+            text_to_textnodes("a `b")
+
+    def test_text_to_textnodes_unclosed_brackets(self):
+        # Links don't span lines, and each "[" is tried as the start of one
+        text = "[a " * 20000 + "\n[b](c) [d\n](e)"
+        result = text_to_textnodes(text)
+        expected = [
+            TextNode("[a " * 20000 + "\n", TextType.TEXT),
+            TextNode("b", TextType.LINK, "c"),
+            TextNode(" [d\n](e)", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_link_url_with_underscores(self):
+        text = "See [docs](https://example.com/some_page_here) now"
+        result = text_to_textnodes(text)
+        expected = [
+            TextNode("See ", TextType.TEXT),
+            TextNode("docs", TextType.LINK, "https://example.com/some_page_here"),
+            TextNode(" now", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_code_is_literal(self):
+        text = "Use `snake_case` names"
+        result = text_to_textnodes(text)
+        expected = [
+            TextNode("Use ", TextType.TEXT),
+            TextNode("snake_case", TextType.CODE),
+            TextNode(" names", TextType.TEXT),
+        ]
+        self.assertListEqual(expected, result)
+
+    def test_text_to_textnodes_image_then_bold(self):
+        text = "![a](x.png)**b**"
+        result = text_to_textnodes(text)
+        expected = [
+            TextNode("", TextType.TEXT),
+            TextNode("a", TextType.IMAGE, "x.png"),
+            TextNode("b", TextType.BOLD),
             TextNode("", TextType.TEXT),
         ]
         self.assertListEqual(expected, result)
@@ -1250,12 +1365,19 @@ class TestTextNode(unittest.TestCase):
         self.assertListEqual(expected, result)
 
     def test_text_to_textnodes_code_in_bold(self):
-        # Nested delimiters don't work because once text is BOLD, it's no longer TEXT
         text = "**bold with `code` inside**"
         result = text_to_textnodes(text)
         expected = [
             TextNode("", TextType.TEXT),
-            TextNode("bold with `code` inside", TextType.BOLD),
+            TextNode(
+                "bold with `code` inside",
+                TextType.BOLD,
+                children=[
+                    TextNode("bold with ", TextType.TEXT),
+                    TextNode("code", TextType.CODE),
+                    TextNode(" inside", TextType.TEXT),
+                ],
+            ),
             TextNode("", TextType.TEXT),
         ]
         self.assertListEqual(expected, result)
@@ -1396,6 +1518,33 @@ Another block"""
         blocks = markdown_to_blocks(md)
         self.assertEqual(blocks, [])
 
+    def test_markdown_to_blocks_code_block_with_blank_lines(self):
+        md = "Intro\n\n```\nfirst\n\n\nsecond\n```\n\nOutro"
+        self.assertEqual(
+            markdown_to_blocks(md),
+            ["Intro", "```\nfirst\n\n\nsecond\n```", "Outro"],
+        )
+
+    def test_markdown_to_blocks_one_line_code_block(self):
+        md = "```code```\n\nafter"
+        self.assertEqual(markdown_to_blocks(md), ["```code```", "after"])
+
+    def test_iter_blocks_from_file_lines(self):
+        lines = io.StringIO("# Title\n\nPara\ngraph\n\n\n- item\n")
+        blocks = iter_blocks(lines)
+        self.assertEqual(next(blocks), "# Title")
+        self.assertEqual(list(blocks), ["Para\ngraph", "- item"])
+
+    def test_iter_markdown_html_matches_to_html(self):
+        md = "# Title\n\nSome **bold**\n\n```\ncode\n\nmore\n```\n\n- a\n- b"
+        streamed = "".join(iter_markdown_html(io.StringIO(md)))
+        self.assertEqual(streamed, markdown_to_html_node(md).to_html())
+        self.assertIn("<pre><code>code\n\nmore\n</code></pre>", streamed)
+
+    def test_iter_markdown_html_empty_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_markdown_html(io.StringIO("\n\n")))
+
     # Tests for block_to_block_type
     def test_block_to_block_type_paragraph(self):
         block = "This is a regular paragraph with some text."
@@ -1581,6 +1730,52 @@ Another block"""
         block = "1. \n2. Item"
         self.assertEqual(block_to_block_type(block), BlockType.ORDERED_LIST)
 
+    def test_block_to_block_type_nested_unordered_list(self):
+        block = "- First\n  - Nested\n    - Deeper\n- Second"
+        self.assertEqual(block_to_block_type(block), BlockType.UNORDERED_LIST)
+
+    def test_block_to_block_type_ordered_list_with_nested_items(self):
+        block = "1. First\n   - Nested\n   - Nested\n2. Second"
+        self.assertEqual(block_to_block_type(block), BlockType.ORDERED_LIST)
+
+    def test_block_to_block_type_nested_line_not_an_item(self):
+        block = "- First\n  continued"
+        self.assertEqual(block_to_block_type(block), BlockType.PARAGRAPH)
+
+    def test_classify_block_returns_items(self):
+        block_type, lines, items = classify_block("1. One\n  - Sub\n2. Two")
+        self.assertEqual(block_type, BlockType.ORDERED_LIST)
+        self.assertEqual(lines, ["1. One", "  - Sub", "2. Two"])
+        self.assertEqual(
+            [(item.indent, item.number, item.text) for item in items],
+            [(0, 1, "One"), (2, None, "Sub"), (0, 2, "Two")],
+        )
+
+    def test_markdown_to_html_node_nested_lists(self):
+        md = "- a\n  - b **x**\n    1. c\n  - d\n- e"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><ul><li>a<ul><li>b <b>x</b><ol><li>c</li></ol></li>"
+            "<li>d</li></ul></li><li>e</li></ul></div>",
+        )
+
+    def test_markdown_to_html_node_dedent_between_levels(self):
+        md = "- a\n    - b\n  - c\n- d"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><ul><li>a<ul><li>b</li><li>c</li></ul></li><li>d</li></ul></div>",
+        )
+
+    def test_markdown_to_html_node_nested_ordered_start(self):
+        md = "1. a\n   3. c\n2. b"
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            '<div><ol><li>a<ol start="3"><li>c</li></ol></li><li>b</li></ol></div>',
+        )
+
     def test_paragraphs(self):
         md = """
     This is **bolded** paragraph
@@ -1613,6 +1808,61 @@ Another block"""
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
+    def test_markdown_to_html_node_basepath(self):
+        md = "[a](/a) ![b](/b.png) [c](https://c)\n\n- _[d](/d)_"
+        self.assertEqual(
+            markdown_to_html_node(md, "/ssg").to_html(),
+            '<div><p><a href="/ssg/a">a</a> <img src="/ssg/b.png" alt="b" loading="lazy" decoding="async" /> '
+            '<a href="https://c">c</a></p>'
+            '<ul><li><i><a href="/ssg/d">d</a></i></li></ul></div>',
+        )
+
+    def test_markdown_to_html_node_basepath_leaves_text_alone(self):
+        md = '`<a href="/x">`\n\n```\n<img src="/y.png">\n```'
+        html = markdown_to_html_node(md, "/ssg/").to_html()
+        self.assertIn('<code><a href="/x"></code>', html)
+        self.assertIn('<img src="/y.png">', html)
+        self.assertEqual("".join(iter_markdown_html(md.split("\n"), "/ssg/")), html)
+
+    def test_markdown_to_html_node_fingerprinted_assets(self):
+        md = "![a](/a.png) [b](/b.png#x) [c](/c)"
+        assets = {"/a.png": "/a.1234abcd.png", "/b.png#x": "/b.5678.png#x"}
+        self.assertEqual(
+            markdown_to_html_node(md, "/ssg/", assets).to_html(),
+            '<div><p><img src="/ssg/a.1234abcd.png" alt="a" loading="lazy" '
+            'decoding="async" /> '
+            '<a href="/ssg/b.5678.png#x">b</a> <a href="/ssg/c">c</a></p></div>',
+        )
+
+    def test_markdown_to_html_node_image_sizes(self):
+        md = "![a](/a.png) ![b](/b.png)"
+        self.assertEqual(
+            markdown_to_html_node(md, "/ssg/", images={"/a.png": (640, 480)}).to_html(),
+            '<div><p><img src="/ssg/a.png" alt="a" width="640" height="480" '
+            'loading="lazy" decoding="async" /> '
+            '<img src="/ssg/b.png" alt="b" loading="lazy" decoding="async" /></p></div>',
+        )
+
+    def test_markdown_to_html_node_collects_search_terms(self):
+        md = "# Tom **Bombadil**\n\nTom _sings_ [a song](/s) ![old Tom](/t.png)\n\n```\nsings()\n```"
+        terms = {}
+        html = markdown_to_html_node(md, terms=terms).to_html()
+        self.assertEqual(html, markdown_to_html_node(md).to_html())
+        self.assertEqual(
+            terms,
+            {"tom": 10, "bombadil": 8, "sings": 2, "song": 1, "old": 1},
+        )
+        streamed = {}
+        list(iter_markdown_html(md.split("\n"), terms=streamed))
+        self.assertEqual(streamed, terms)
+
+    def test_markdown_to_html_node_collects_links(self):
+        md = "# [Home](/)\n\n- **[a](/a) ![b](b.png)**\n\n> [c](https://c)\n\n`[d](/d)`"
+        links = []
+        html = markdown_to_html_node(md, "/ssg/", links=links).to_html()
+        self.assertEqual(html, markdown_to_html_node(md, "/ssg/").to_html())
+        self.assertEqual(links, ["/", "/a", "b.png", "https://c"])
+
     def test_markdown_to_html_node_heading_h1(self):
         md = "# This is a heading"
         node = markdown_to_html_node(md)
@@ -1801,7 +2051,7 @@ code block here
         html = node.to_html()
         self.assertEqual(
             html,
-            '<div><p>This is a paragraph with an <img src="https://example.com/img.png" alt="image" /> in it.</p></div>',
+            '<div><p>This is a paragraph with an <img src="https://example.com/img.png" alt="image" loading="lazy" decoding="async" /> in it.</p></div>',
         )
 
     def test_markdown_to_html_node_code_block_empty(self):
@@ -1,6 +1,19 @@
+import os
 import unittest
 
-from utilities import extract_title
+from manifest import BuildManifest
+from profiling import PAGE_STAGES, BuildProfile
+from render_cache import RenderCache
+from template import Template
+from testing import TempDirTests
+from utilities import (
+    BuildError,
+    extract_title,
+    find_pages,
+    generate_pages_recursive,
+    page_dest_path,
+    update_pages,
+)
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -62,3 +75,146 @@ More content here"""
     def test_extract_title_indented_h1(self):
         md = "   # Indented Title"
         self.assertEqual(extract_title(md), "Indented Title")
+
+
+class TestGeneratePages(TempDirTests, unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        for i in range(4):
+            self.write(os.path.join(self.content, "blog", f"{i}.md"), f"# Post {i}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as file:
+            return file.read()
+
+    def test_find_pages(self):
+        pages = find_pages(self.content, self.public)
+        self.assertEqual(len(pages), 5)
+        self.assertIn(
+            (
+                os.path.join(self.content, "index.md"),
+                os.path.join(self.public, "index.html"),
+            ),
+            pages,
+        )
+
+    def test_generate_pages_parallel(self):
+        generate_pages_recursive(self.content, self.template, self.public, jobs=2)
+        self.assertEqual(
+            self.read("index.html"), "<title>Home</title><div><h1>Home</h1></div>"
+        )
+        self.assertIn("Post 3", self.read("blog", "3.html"))
+
+    def test_generate_pages_collects_failures(self):
+        bad_path = os.path.join(self.content, "blog", "bad.md")
+        self.write(bad_path, "no title here")
+        with self.assertRaises(BuildError) as cm:
+            generate_pages_recursive(self.content, self.template, self.public, jobs=2)
+        self.assertEqual([path for path, _ in cm.exception.failures], [bad_path])
+        # The other pages were still written
+        self.assertIn("Post 0", self.read("blog", "0.html"))
+
+    def test_profiled_pages_match_streamed_pages(self):
+        self.write(
+            os.path.join(self.content, "index.md"),
+            "# Home\n\n- [a](/a)\n- ![b](/b.png)\n\n```\ncode\n```",
+        )
+        generate_pages_recursive(self.content, self.template, self.public, "/ssg/")
+        streamed = self.read("index.html")
+        profile = BuildProfile()
+        generate_pages_recursive(
+            self.content, self.template, self.public, "/ssg/", jobs=2, profile=profile
+        )
+        self.assertEqual(self.read("index.html"), streamed)
+        self.assertEqual(len(profile.pages), 5)
+        for stage in PAGE_STAGES + ("discover", "hash"):
+            self.assertIn(stage, profile.stages)
+
+    def test_minified_pages_match_across_paths(self):
+        self.write(
+            os.path.join(self.content, "index.md"),
+            "# Home\n\n**a\n  b** [c](/c)\n\n```\nkeep   this\n  indented\n```",
+        )
+        template = Template.load(self.template, "/ssg/", minify=True)
+        generate_pages_recursive(
+            self.content, self.template, self.public, "/ssg/", template=template
+        )
+        streamed = self.read("index.html")
+        self.assertIn("<b>a b</b> <a href=/ssg/c>c</a>", streamed)
+        self.assertIn("<pre><code>keep   this\n  indented\n</code></pre>", streamed)
+        generate_pages_recursive(
+            self.content,
+            self.template,
+            self.public,
+            "/ssg/",
+            template=template,
+            profile=BuildProfile(),
+        )
+        self.assertEqual(self.read("index.html"), streamed)
+
+    def test_changed_image_only_rebuilds_pages_showing_it(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![a](/a.png)")
+        self.write(
+            os.path.join(self.content, "blog", "0.md"), "# Post 0\n\n![b](/b.png)"
+        )
+        manifest = BuildManifest(os.path.join(self.tmp.name, "m.json"), {})
+        cache = RenderCache(os.path.join(self.tmp.name, "render.sqlite3"))
+        self.addCleanup(cache.close)
+
+        def build(images):
+            template = Template.load(self.template, images=images)
+            generate_pages_recursive(
+                self.content,
+                self.template,
+                self.public,
+                manifest=manifest,
+                template=template,
+                cache=cache,
+            )
+
+        build({"/a.png": (1, 2)})
+        manifest.hits = manifest.misses = 0
+        # Resized, and newly found: both pages show an image that changed
+        build({"/a.png": (3, 4), "/b.png": (5, 6)})
+        self.assertEqual((manifest.hits, manifest.misses), (3, 2))
+        self.assertIn('width="3" height="4"', self.read("index.html"))
+        self.assertIn('width="5" height="6"', self.read("blog", "0.html"))
+
+        manifest.hits = manifest.misses = 0
+        build({"/a.png": (3, 4), "/b.png": (5, 6), "/c.png": (7, 8)})
+        self.assertEqual((manifest.hits, manifest.misses), (5, 0))
+
+    def test_page_dest_path(self):
+        self.assertEqual(
+            page_dest_path(
+                os.path.join(self.content, "blog", "0.md"), self.content, self.public
+            ),
+            os.path.join(self.public, "blog", "0.html"),
+        )
+
+    def test_update_pages_only_touches_changed(self):
+        manifest = BuildManifest(os.path.join(self.tmp.name, "m.json"), {})
+        generate_pages_recursive(
+            self.content, self.template, self.public, manifest=manifest
+        )
+        changed = os.path.join(self.content, "blog", "1.md")
+        self.write(changed, "# Edited")
+        removed_dir = os.path.join(self.content, "blog")
+        update_pages([changed], self.content, self.template, self.public, "/", manifest)
+        self.assertEqual((manifest.hits, manifest.misses), (0, 6))
+        self.assertIn("Edited", self.read("blog", "1.html"))
+
+        for name in os.listdir(removed_dir):
+            os.remove(os.path.join(removed_dir, name))
+        os.rmdir(removed_dir)
+        update_pages(
+            [removed_dir], self.content, self.template, self.public, "/", manifest
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
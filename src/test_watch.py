@@ -0,0 +1,76 @@
+import os
+import sys
+import unittest
+
+from testing import TempDirTests
+from watch import InotifyWatcher, PollingWatcher, iter_changes
+
+
+class WatcherTests(TempDirTests):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        self.page = os.path.join(self.content, "index.md")
+        os.makedirs(self.content)
+        self.write(self.page, "# Home")
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.tmp.name, "other.txt"), "")
+        self.watcher = self.create_watcher([self.content], [self.template])
+
+    def tearDown(self):
+        self.watcher.close()
+
+    def test_no_changes(self):
+        self.assertEqual(self.watcher.wait(0.1), set())
+
+    def test_modified_file(self):
+        self.write(self.page, "# Changed home")
+        self.assertEqual(self.watcher.wait(1), {self.page})
+
+    def test_deleted_file(self):
+        os.remove(self.page)
+        self.assertIn(self.page, self.watcher.wait(1))
+
+    def test_watched_single_file(self):
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.assertEqual(self.watcher.wait(1), {self.template})
+
+    def test_unwatched_sibling_ignored(self):
+        self.write(os.path.join(self.tmp.name, "other.txt"), "changed")
+        self.assertEqual(self.watcher.wait(0.2), set())
+
+    def test_iter_changes_merges_burst(self):
+        self.write(self.page, "# One")
+        self.write(self.template, "{{ Title }}")
+        changes = next(iter_changes(self.watcher, debounce=0.1))
+        self.assertEqual(changes, {self.page, self.template})
+
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+    def create_watcher(self, dirs, files):
+        return PollingWatcher(dirs, files, interval=0.01)
+
+    def setUp(self):
+        super().setUp()
+        # mtimes can be coarse, so make sure writes change the size too
+        self.write(self.page, "")
+        self.watcher.state = self.watcher.snapshot()
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux only")
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+    def create_watcher(self, dirs, files):
+        return InotifyWatcher(dirs, files)
+
+    def test_new_directory_is_watched(self):
+        new_dir = os.path.join(self.content, "blog")
+        os.mkdir(new_dir)
+        self.assertEqual(self.watcher.wait(1), {new_dir})
+        post = os.path.join(new_dir, "post.md")
+        self.write(post, "# Post")
+        self.assertIn(post, self.watcher.wait(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
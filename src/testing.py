@@ -0,0 +1,16 @@
+import tempfile
+
+
+class TempDirTests:
+    """
+    Mixin for test cases working in a temporary directory, self.tmp, which
+    is removed after each test.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, path, text):
+        with open(path, "wb" if isinstance(text, bytes) else "w") as file:
+            file.write(text)
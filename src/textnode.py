@@ -1,7 +1,13 @@
 from enum import Enum
 import enum
 import re
-from htmlnode import LeafNode, ParentNode
+from htmlnode import LeafNode, ParentNode, iter_html
+from search import TAG_WEIGHTS, add_terms
+from template import normalize_basepath, resolve_url
+
+# Added to every image: fetch it once it nears the viewport and decode it
+# off the main thread
+IMAGE_LOADING_PROPS = {"loading": "lazy", "decoding": "async"}
 
 
 class TextType(Enum):
@@ -14,20 +20,28 @@ class TextType(Enum):
 
 
 class TextNode:
-    def __init__(self, text, text_type, url=None):
+    __slots__ = ("text", "text_type", "url", "children")
+
+    def __init__(self, text, text_type, url=None, children=None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        # Nested inline nodes, e.g. italic text inside a bold span
+        self.children = children
 
     def __eq__(self, target):
         return (
             self.text == target.text
             and self.text_type == target.text_type
             and self.url == target.url
+            and self.children == target.children
         )
 
     def __repr__(self):
-        return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
+        fields = f"{self.text}, {self.text_type.value}, {self.url}"
+        if self.children:
+            fields += f", {self.children}"
+        return f"TextNode({fields})"
 
 
 class BlockType(Enum):
@@ -39,42 +53,101 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
-def block_to_block_type(block_md):
+HEADING_RE = re.compile(r"#{1,6} ")
+# Indentation, then "- " or "N. "; whitespace after an ordered marker is dropped
+LIST_ITEM_RE = re.compile(r"([ \t]*)(?:- |(\d+)\. \s*)")
+
+
+class ListItem:
+    __slots__ = ("indent", "number", "text")
+
+    def __init__(self, indent, number, text):
+        self.indent = indent
+        # None for "- " items
+        self.number = number
+        self.text = text
+
+    def __repr__(self):
+        return f"ListItem({self.indent}, {self.number}, {self.text})"
+
+
+def classify_block(block_md):
+    """
+    Classify a block in a single scan over its lines.
+
+    Returns (block type, lines, list items). The lines and, for lists, the
+    parsed ListItem of every line are handed on to the block processors so
+    the block is never split or matched again. Lines indented deeper than
+    the first item are nested list items and may use either marker.
+    """
+    lines = block_md.split("\n")
+
     # Check for heading: 1-6 # characters followed by a space
-    if re.match(r"^#{1,6} ", block_md):
-        return BlockType.HEADING
+    if HEADING_RE.match(block_md):
+        return BlockType.HEADING, lines, None
     # Check for code block: starts and ends with exactly 3 backticks
-    elif (
+    if (
         len(block_md) > 6
         and block_md[:3] == "```"
         and block_md[-3:] == "```"
         and block_md[3] != "`"
         and block_md[-4] != "`"
     ):
-        return BlockType.CODE
-    # Check for quote: every line starts with >
-    elif all([n.startswith(">") for n in block_md.split("\n")]):
-        return BlockType.QUOTE
-    # Check for unordered list: every line starts with "- "
-    elif all([n.startswith("- ") for n in block_md.split("\n")]):
-        return BlockType.UNORDERED_LIST
-    # Check for ordered list: every line starts with number. and numbers are sequential
-    else:
-        lines = block_md.split("\n")
-        if all([re.match(r"^\d+\. ", line) for line in lines]):
-            # Check if numbers start at 1 and increment by 1
-            for i, line in enumerate(lines):
-                match = re.match(r"^(\d+)\. ", line)
-                if match:
-                    expected_num = i + 1
-                    actual_num = int(match.group(1))
-                    if actual_num != expected_num:
-                        return BlockType.PARAGRAPH
-            return BlockType.ORDERED_LIST
-        return BlockType.PARAGRAPH
-
-
-def text_node_to_html_node(text_node):
+        return BlockType.CODE, lines, None
+
+    # Check for quote (every line starts with >) and list at the same time
+    is_quote = True
+    items = []
+    top_level_count = 0
+    for line in lines:
+        if is_quote and not line.startswith(">"):
+            is_quote = False
+
+        if items is not None:
+            item = parse_list_item(line)
+            if item is None or (
+                item.indent == 0
+                and not is_next_top_level_item(items, item, top_level_count)
+            ):
+                items = None
+            else:
+                top_level_count += item.indent == 0
+                items.append(item)
+
+        if not is_quote and items is None:
+            break
+
+    if is_quote:
+        return BlockType.QUOTE, lines, None
+    if items:
+        if items[0].number is None:
+            return BlockType.UNORDERED_LIST, lines, items
+        return BlockType.ORDERED_LIST, lines, items
+    return BlockType.PARAGRAPH, lines, None
+
+
+def parse_list_item(line):
+    match = LIST_ITEM_RE.match(line)
+    if match is None:
+        return None
+    indent = len(match.group(1).expandtabs(4))
+    number = match.group(2)
+    return ListItem(indent, number and int(number), line[match.end() :])
+
+
+def is_next_top_level_item(items, item, top_level_count):
+    # Top-level items share one marker; ordered ones count up from 1
+    first = items[0] if items else item
+    if (first.number is None) != (item.number is None):
+        return False
+    return item.number is None or item.number == top_level_count + 1
+
+
+def block_to_block_type(block_md):
+    return classify_block(block_md)[0]
+
+
+def text_node_to_html_node(text_node, basepath="/", assets=None, images=None):
     props = None
     match text_node.text_type:
         case TextType.TEXT:
@@ -87,14 +160,27 @@ def text_node_to_html_node(text_node):
             tag = "code"
         case TextType.LINK:
             tag = "a"
-            props = {"href": text_node.url}
+            props = {"href": resolve_url(text_node.url, basepath, assets)}
         case TextType.IMAGE:
             tag = "img"
-            props = {"src": text_node.url, "alt": text_node.text}
+            props = {
+                "src": resolve_url(text_node.url, basepath, assets),
+                "alt": text_node.text,
+            }
+            size = None if images is None else images.get(text_node.url)
+            if size is not None:
+                props["width"], props["height"] = str(size[0]), str(size[1])
+            props.update(IMAGE_LOADING_PROPS)
             return LeafNode(tag, "", props)
         case _:
             raise Exception("Error: Unsupported text type")
 
+    if text_node.children:
+        html_children = [
+            text_node_to_html_node(tn, basepath, assets, images)
+            for tn in text_node.children
+        ]
+        return ParentNode(tag, html_children, props)
     return LeafNode(tag, text_node.text, props)
 
 
@@ -197,25 +283,260 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
+INLINE_TOKEN_RE = re.compile(r"\*\*|_|`|!\[|\[")
+IMAGE_RE = re.compile(r"!\[([^\[\]]*)\]\(([^\(\)]*)\)")
+EMPHASIS_DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC}
+
+
 def text_to_textnodes(text):
-    node = TextNode(text, TextType.TEXT)
-    nodes_with_bold = split_nodes_delimiter([node], "**", TextType.BOLD)
-    nodes_with_italic = split_nodes_delimiter(nodes_with_bold, "_", TextType.ITALIC)
-    nodes_with_code = split_nodes_delimiter(nodes_with_italic, "`", TextType.CODE)
-    nodes_with_images = split_nodes_image(nodes_with_code)
-    all_nodes = split_nodes_link(nodes_with_images)
-    return all_nodes
+    """
+    Split inline markdown into TextNodes in a single left-to-right scan.
+
+    Bold and italic delimiters are matched on a stack, so emphasis can nest;
+    a span with nested formatting gets its inner nodes as children. Code
+    spans, image alt text and link text are taken verbatim.
+    """
+    # Each frame holds [delimiter, text type, start of its content, nodes]
+    stack = [[None, None, 0, []]]
+    # Start of the plain text not yet turned into a node
+    start = 0
+    # Media found since the last delimiter, and links since the last image.
+    # Together they decide which empty text nodes are kept, so the result
+    # matches splitting on delimiters, then images, then links.
+    segment_has_media = False
+    link_since_image = False
+
+    def add_text(end, keep_empty):
+        # Empty text is only ever kept at the top level
+        if start < end or (keep_empty and len(stack) == 1):
+            stack[-1][3].append(TextNode(text[start:end], TextType.TEXT))
+
+    # Substring -> where it was last searched for and found (-1: nowhere).
+    # Searches only move forward, so text already searched is never searched
+    # again, however many brackets or backticks there are.
+    found_at = {}
+
+    def find(sub, from_pos):
+        searched_from, found = found_at.get(sub, (len(text) + 1, -1))
+        if searched_from <= from_pos and (found == -1 or found >= from_pos):
+            return found
+        found = text.find(sub, from_pos)
+        found_at[sub] = (from_pos, found)
+        return found
+
+    def match_link(link_start):
+        # Matches like r"\[(.*?)\]\((.*?)\)" would: the first "](" and the
+        # first ")" after it, both on the line the link starts on
+        line_end = find("\n", link_start)
+        if line_end == -1:
+            line_end = len(text)
+        text_end = find("](", link_start + 1)
+        if text_end == -1 or text_end >= line_end:
+            return None
+        url_end = find(")", text_end + 2)
+        if url_end == -1 or url_end >= line_end:
+            return None
+        return (
+            text[link_start + 1 : text_end],
+            text[text_end + 2 : url_end],
+            url_end + 1,
+        )
+
+    pos = 0
+    while True:
+        match = INLINE_TOKEN_RE.search(text, pos)
+        if match is None:
+            break
+        token = match.group()
+        token_start = match.start()
+
+        if token in EMPHASIS_DELIMITERS or token == "`":
+            if token == "`":
+                code_end = find("`", match.end())
+                if len(stack) > 1 and (
+                    code_end == -1
+                    or any(
+                        -1 < find(frame[0], match.end()) < code_end
+                        for frame in stack[1:]
+                    )
+                ):
+                    # Emphasis used to be split off first, leaving its
+                    # backticks alone, so one that isn't closed before the
+                    # open emphasis could close is just text
+                    pos = match.end()
+                    continue
+                if code_end == -1:
+                    raise ValueError(
+                        f"Invalid markdown: unmatched delimiter '`' in text: {text}"
+                    )
+            add_text(token_start, not segment_has_media)
+            segment_has_media = link_since_image = False
+
+            if token == "`":
+                code_text = text[match.end() : code_end]
+                stack[-1][3].append(TextNode(code_text, TextType.CODE))
+                pos = start = code_end + 1
+                continue
+
+            text_type = EMPHASIS_DELIMITERS[token]
+            if any(frame[1] == text_type for frame in stack):
+                # Delimiters opened inside the span being closed were never
+                # matched, so they are just text
+                while stack[-1][1] != text_type:
+                    delimiter, _, _, nodes = stack.pop()
+                    stack[-1][3].append(TextNode(delimiter, TextType.TEXT))
+                    stack[-1][3].extend(nodes)
+                _, _, content_start, nodes = stack.pop()
+                if not block_has_various_children(nodes):
+                    nodes = None
+                span_text = text[content_start:token_start]
+                stack[-1][3].append(TextNode(span_text, text_type, None, nodes))
+            else:
+                stack.append([token, text_type, match.end(), []])
+            pos = start = match.end()
+            continue
+
+        if token == "![":
+            media = IMAGE_RE.match(text, token_start)
+            if media is not None:
+                media = media.group(1), media.group(2), media.end()
+            text_type = TextType.IMAGE
+        else:
+            media = match_link(token_start)
+            text_type = TextType.LINK
+            # Images take precedence over a link that would swallow one
+            if media is not None and IMAGE_RE.search(text, token_start, media[2]):
+                media = None
+        if media is None:
+            # Not an image or link after all, keep it as plain text
+            pos = match.end()
+            continue
+
+        if text_type == TextType.IMAGE:
+            add_text(token_start, not link_since_image)
+            link_since_image = False
+        else:
+            add_text(token_start, True)
+            link_since_image = True
+        segment_has_media = True
+        value, url, media_end = media
+        stack[-1][3].append(TextNode(value, text_type, url))
+        pos = start = media_end
+
+    if len(stack) > 1:
+        raise ValueError(
+            f"Invalid markdown: unmatched delimiter '{stack[-1][0]}' in text: {text}"
+        )
+    add_text(len(text), not segment_has_media)
+    return stack[0][3]
+
+
+def iter_lines(text):
+    """
+    Yield the lines of a string without building a list of them.
+    """
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def is_fence(line):
+    stripped = line.strip()
+    # A one-line ```code``` block opens and closes on the same line
+    return stripped.startswith("```") and not (
+        len(stripped) > 6 and stripped.endswith("```")
+    )
+
+
+def iter_blocks(lines):
+    """
+    Yield the stripped markdown blocks of an iterable of lines, one at a time.
+
+    Blocks are separated by empty lines, except inside ``` fences, so a code
+    block containing blank lines stays whole. Lines may keep their trailing
+    newline, which means an open file can be passed in directly and is read
+    one line at a time.
+    """
+    block_lines = []
+    in_fence = False
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line and not in_fence:
+            block = "\n".join(block_lines).strip()
+            if block:
+                yield block
+            block_lines = []
+            continue
+        if is_fence(line):
+            in_fence = not in_fence
+        block_lines.append(line)
+
+    block = "\n".join(block_lines).strip()
+    if block:
+        yield block
 
 
 def markdown_to_blocks(markdown):
-    blocks = [md.strip() for md in markdown.split("\n\n")]
-    return [b for b in blocks if b]
+    return list(iter_blocks(iter_lines(markdown)))
 
 
 def block_has_various_children(block):
     return any(tn.text_type != TextType.TEXT for tn in block)
 
 
+def index_text_nodes(text_nodes, terms, weight=1):
+    """
+    Add the words of inline nodes to a dict of search terms.
+
+    Spans with nested formatting are indexed through their children, so
+    the delimiters inside them never end up in a term.
+    """
+    for tn in text_nodes:
+        if tn.children:
+            index_text_nodes(tn.children, terms, weight)
+        else:
+            add_terms(tn.text, terms, weight)
+
+
+def collect_links(text_nodes, links):
+    """
+    Append the URL of every link and image among inline nodes to links.
+    """
+    for tn in text_nodes:
+        if tn.text_type in (TextType.LINK, TextType.IMAGE):
+            links.append(tn.url)
+        elif tn.children:
+            collect_links(tn.children, links)
+
+
+def text_nodes_to_html_node(
+    tag, text_nodes, basepath="/", assets=None, images=None, terms=None, links=None
+):
+    """
+    Wrap inline nodes in a tag, as a single LeafNode when they are all plain text.
+
+    HTML nodes for the children are only created when they are needed. Pass
+    a dict as terms to add the words of the nodes to it, weighted by tag,
+    and a list as links to append the URLs of their links and images to it.
+    """
+    if terms is not None:
+        index_text_nodes(text_nodes, terms, TAG_WEIGHTS.get(tag, 1))
+    if links is not None:
+        collect_links(text_nodes, links)
+    if block_has_various_children(text_nodes):
+        return ParentNode(
+            tag,
+            [text_node_to_html_node(tn, basepath, assets, images) for tn in text_nodes],
+        )
+    # If all are TEXT nodes, concatenate them
+    return LeafNode(tag, "".join(tn.text for tn in text_nodes))
+
+
 def block_type_to_tag(block_type):
     match block_type:
         case BlockType.PARAGRAPH:
@@ -234,7 +555,13 @@ def block_type_to_tag(block_type):
             raise ValueError(f"Unsupported block type: {block_type}")
 
 
-def process_heading(block):
+# Shared tag strings, so heading nodes don't each carry their own copy
+HEADING_TAGS = (None, "h1", "h2", "h3", "h4", "h5", "h6")
+
+
+def process_heading(
+    block, basepath="/", assets=None, images=None, terms=None, links=None
+):
     """Process a heading block, determining the level and stripping # characters."""
     # Count the number of # characters to determine heading level
     level = 0
@@ -246,25 +573,19 @@ def process_heading(block):
 
     # Heading level should be between 1 and 6
     level = min(level, 6)
-    tag = f"h{level}"
+    tag = HEADING_TAGS[level]
 
     # Strip the # characters and the space after them
     heading_text = block[level:].strip()
 
     # Process inline markdown in the heading
     text_nodes = text_to_textnodes(heading_text)
-    html_children = [text_node_to_html_node(tn) for tn in text_nodes]
-
-    # Create the heading node
-    if block_has_various_children(text_nodes):
-        return ParentNode(tag, html_children)
-    else:
-        # If all are TEXT nodes, concatenate them
-        text_value = "".join(tn.text for tn in text_nodes)
-        return LeafNode(tag, text_value)
+    return text_nodes_to_html_node(
+        tag, text_nodes, basepath, assets, images, terms, links
+    )
 
 
-def process_code_block(block, tag):
+def process_code_block(block, tag, terms=None):
     """Process a code block without inline markdown parsing."""
     # Strip the triple backticks from start and end
     code_content = block[3:-3]
@@ -285,14 +606,26 @@ def process_code_block(block, tag):
             for line in lines
         ]
         code_content = "\n".join(lines)
+    if terms is not None:
+        add_terms(code_content, terms)
     # Manually create code node - no inline parsing
     code_node = LeafNode("code", code_content)
     return ParentNode(tag, [code_node])
 
 
-def process_quote(block, tag):
+def process_quote(
+    block,
+    tag,
+    lines=None,
+    basepath="/",
+    assets=None,
+    images=None,
+    terms=None,
+    links=None,
+):
     """Process a quote block, stripping > prefixes from each line."""
-    lines = block.split("\n")
+    if lines is None:
+        lines = block.split("\n")
     # Strip the > prefix from each line
     stripped_lines = []
     for line in lines:
@@ -306,99 +639,178 @@ def process_quote(block, tag):
 
     # Process inline markdown
     text_nodes = text_to_textnodes(quote_text)
-    html_children = [text_node_to_html_node(tn) for tn in text_nodes]
-
-    # Create the quote node
-    if block_has_various_children(text_nodes):
-        return ParentNode(tag, html_children)
-    else:
-        # If all are TEXT nodes, concatenate them
-        text_value = "".join(tn.text for tn in text_nodes)
-        return LeafNode(tag, text_value)
-
-
-def process_unordered_list(block, tag):
+    return text_nodes_to_html_node(
+        tag, text_nodes, basepath, assets, images, terms, links
+    )
+
+
+def process_list(
+    items, tag, basepath="/", assets=None, images=None, terms=None, links=None
+):
+    """
+    Build a list from parsed items, creating <li> elements.
+
+    A run of items indented deeper than the item before it becomes a nested
+    list inside that item's <li>. An item dedented to between two open lists
+    stays in the inner one.
+    """
+    root = ParentNode(tag, [])
+    # Open lists from the outermost in, as [indent, list node]
+    levels = [[0, root]]
+    for item in items:
+        while len(levels) > 1 and item.indent <= levels[-2][0]:
+            levels.pop()
+
+        indent, list_node = levels[-1]
+        if item.indent > indent and list_node.children:
+            if item.number is None:
+                sublist = ParentNode("ul", [])
+            elif item.number != 1:
+                sublist = ParentNode("ol", [], {"start": str(item.number)})
+            else:
+                sublist = ParentNode("ol", [])
+            parent_li = list_node.children[-1]
+            if isinstance(parent_li, LeafNode):
+                # The item gains a child, so its plain text needs wrapping
+                parent_li = ParentNode("li", [LeafNode(None, parent_li.value)])
+                list_node.children[-1] = parent_li
+            parent_li.children.append(sublist)
+            levels.append([item.indent, sublist])
+            list_node = sublist
+
+        # Convert inline markdown and wrap in <li> tag
+        text_nodes = text_to_textnodes(item.text)
+        list_node.children.append(
+            text_nodes_to_html_node(
+                "li", text_nodes, basepath, assets, images, terms, links
+            )
+        )
+    return root
+
+
+def list_items_of(block):
+    items = classify_block(block)[2]
+    if items is None:
+        raise ValueError(f"Invalid markdown: not a list block: {block}")
+    return items
+
+
+def process_unordered_list(
+    block,
+    tag,
+    items=None,
+    basepath="/",
+    assets=None,
+    images=None,
+    terms=None,
+    links=None,
+):
     """Process an unordered list block, creating <li> elements."""
-    lines = block.split("\n")
-    list_items = []
-    for line in lines:
-        # Strip the "- " prefix
-        item_text = line[2:]
-        # Convert inline markdown to text nodes
-        text_nodes = text_to_textnodes(item_text)
-        # Convert to HTML nodes
-        html_children = [text_node_to_html_node(tn) for tn in text_nodes]
-        # Wrap in <li> tag
-        if block_has_various_children(text_nodes):
-            li_node = ParentNode("li", html_children)
-        else:
-            # If all are TEXT nodes, concatenate them
-            text_value = "".join(tn.text for tn in text_nodes)
-            li_node = LeafNode("li", text_value)
-        list_items.append(li_node)
-    return ParentNode(tag, list_items)
-
-
-def process_ordered_list(block, tag):
+    return process_list(
+        items or list_items_of(block), tag, basepath, assets, images, terms, links
+    )
+
+
+def process_ordered_list(
+    block,
+    tag,
+    items=None,
+    basepath="/",
+    assets=None,
+    images=None,
+    terms=None,
+    links=None,
+):
     """Process an ordered list block, creating <li> elements."""
-    lines = block.split("\n")
-    list_items = []
-    for line in lines:
-        # Strip the number prefix (e.g., "1. ", "2. ")
-        match = re.match(r"^\d+\.\s+", line)
-        if match:
-            item_text = line[match.end() :]
-        else:
-            item_text = line
-        # Convert inline markdown to text nodes
-        text_nodes = text_to_textnodes(item_text)
-        # Convert to HTML nodes
-        html_children = [text_node_to_html_node(tn) for tn in text_nodes]
-        # Wrap in <li> tag
-        if block_has_various_children(text_nodes):
-            li_node = ParentNode("li", html_children)
-        else:
-            # If all are TEXT nodes, concatenate them
-            text_value = "".join(tn.text for tn in text_nodes)
-            li_node = LeafNode("li", text_value)
-        list_items.append(li_node)
-    return ParentNode(tag, list_items)
-
-
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    html_nodes = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        tag = block_type_to_tag(block_type)
-
-        # Different block types require different processing
-        if block_type == BlockType.HEADING:
-            current_node = process_heading(block)
-        elif block_type == BlockType.CODE:
-            current_node = process_code_block(block, tag)
-        elif block_type == BlockType.QUOTE:
-            current_node = process_quote(block, tag)
-        elif block_type == BlockType.UNORDERED_LIST:
-            current_node = process_unordered_list(block, tag)
-        elif block_type == BlockType.ORDERED_LIST:
-            current_node = process_ordered_list(block, tag)
-        else:
-            text_nodes = text_to_textnodes(block)
-            # Normalize whitespace in TEXT nodes (replace newlines with spaces)
-            for tn in text_nodes:
-                if tn.text_type == TextType.TEXT:
-                    tn.text = re.sub(r"\s+", " ", tn.text)
-            # Convert TextNode objects to HTMLNode objects
-            html_children = [text_node_to_html_node(tn) for tn in text_nodes]
-            if block_has_various_children(text_nodes):
-                current_node = ParentNode(tag, html_children)
-            else:
-                # If all are TEXT nodes, concatenate them into a single string
-                text_value = "".join(tn.text for tn in text_nodes)
-                current_node = LeafNode(tag, text_value)
+    return process_list(
+        items or list_items_of(block), tag, basepath, assets, images, terms, links
+    )
+
+
+def block_to_html_node(
+    block, basepath="/", assets=None, images=None, terms=None, links=None
+):
+    """
+    Convert a markdown block to an HTML node.
+
+    Root-relative link and image URLs are mapped through assets (a dict of
+    fingerprinted asset URLs, if any) and prefixed with the basepath as
+    their nodes are created, so text that merely looks like a URL attribute
+    is never rewritten. Images whose URL is in images (a dict of intrinsic
+    (width, height) sizes, or a ShownImages) get their dimensions. Pass a dict as terms to
+    add the block's words to it for the search index, and a list as links
+    to append the URLs of its links and images to it, as they are converted.
+    """
+    block_type, lines, items = classify_block(block)
+    tag = block_type_to_tag(block_type)
+
+    # Different block types require different processing
+    if block_type == BlockType.HEADING:
+        return process_heading(block, basepath, assets, images, terms, links)
+    elif block_type == BlockType.CODE:
+        return process_code_block(block, tag, terms)
+    elif block_type == BlockType.QUOTE:
+        return process_quote(block, tag, lines, basepath, assets, images, terms, links)
+    elif block_type == BlockType.UNORDERED_LIST:
+        return process_unordered_list(
+            block, tag, items, basepath, assets, images, terms, links
+        )
+    elif block_type == BlockType.ORDERED_LIST:
+        return process_ordered_list(
+            block, tag, items, basepath, assets, images, terms, links
+        )
 
-        html_nodes.append(current_node)
+    text_nodes = text_to_textnodes(block)
+    # Normalize whitespace in TEXT nodes (replace newlines with spaces)
+    for tn in text_nodes:
+        if tn.text_type == TextType.TEXT:
+            tn.text = re.sub(r"\s+", " ", tn.text)
+    return text_nodes_to_html_node(
+        tag, text_nodes, basepath, assets, images, terms, links
+    )
+
+
+def markdown_to_html_node(
+    markdown, basepath="/", assets=None, images=None, terms=None, links=None
+):
+    basepath = normalize_basepath(basepath)
+    html_nodes = [
+        block_to_html_node(block, basepath, assets, images, terms, links)
+        for block in iter_blocks(iter_lines(markdown))
+    ]
 
     # Wrap all block nodes in a single parent div
     return ParentNode("div", html_nodes)
+
+
+def iter_markdown_html(
+    lines,
+    basepath="/",
+    assets=None,
+    minify=False,
+    images=None,
+    terms=None,
+    links=None,
+):
+    """
+    Yield the HTML of markdown lines in chunks, converting one block at a time.
+
+    Produces the same HTML as markdown_to_html_node(markdown, basepath,
+    assets).to_html(minify), but only one block and its nodes are held in
+    memory at once.
+    """
+    basepath = normalize_basepath(basepath)
+    has_blocks = False
+    for block in iter_blocks(lines):
+        if not has_blocks:
+            has_blocks = True
+            yield "<div>"
+        yield from iter_html(
+            block_to_html_node(block, basepath, assets, images, terms, links),
+            minify,
+        )
+
+    if not has_blocks:
+        # Same error to_html() raises for the empty wrapper div
+        raise ValueError("Error: Node must have children")
+    yield "</div>"
@@ -1,38 +1,40 @@
 import os
-import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-from textnode import markdown_to_html_node
+from images import ShownImages
+from manifest import hash_file, sizes_match
+from profiling import timed
+from htmlnode import iter_html
+from render_cache import MAX_SOURCE_BYTES, RenderCache, block_key, render_key
+from sitemap import write_sitemap
+from template import Template, normalize_basepath
+from textnode import (
+    block_to_html_node,
+    iter_blocks,
+    iter_lines,
+    iter_markdown_html,
+    markdown_to_html_node,
+)
 
 
-def delete_from_folder(folder_path):
-    # Delete the public directory if it exists
-    if os.path.exists(folder_path):
-        shutil.rmtree(folder_path)
-    # Recreate the public directory
-    os.makedirs(folder_path)
-
-
-def copy_files(from_path, dest_path):
-    dir = os.listdir(from_path)
-
-    if not os.path.exists(dest_path):
-        os.mkdir(dest_path)
+class BuildError(Exception):
+    """
+    Raised after a build in which one or more pages failed to generate.
+    """
 
-    for item in dir:
-        item_path = os.path.join(from_path, item)
-        if os.path.isfile(item_path):
-            print(f"Copying file: {item_path} -> {dest_path}")
-            shutil.copy(item_path, dest_path)
-        else:
-            new_dest_path = os.path.join(dest_path, item)
-            copy_files(item_path, new_dest_path)
+    def __init__(self, failures):
+        self.failures = failures
+        lines = [f"{path}: {error}" for path, error in failures]
+        super().__init__(f"{len(failures)} page(s) failed:\n" + "\n".join(lines))
 
 
 def extract_title(markdown):
     """
-    Extract the h1 header from markdown text.
+    Extract the h1 header from markdown text or an iterable of its lines.
     """
-    lines = markdown.split("\n")
+    lines = iter_lines(markdown) if isinstance(markdown, str) else markdown
     for line in lines:
         stripped = line.strip()
         # Check if line starts with '#' but not '##' (h1 only, not h2+)
@@ -43,58 +45,725 @@ def extract_title(markdown):
     raise Exception("Error: No h1 header found in markdown")
 
 
-def generate_page(from_path, template_path, dest_path, basepath="/"):
+def render_page(md, template):
     """
-    Generate an HTML page from a markdown file using a template.
+    Render a full HTML page from markdown text in memory.
     """
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    title = extract_title(md)
+    node = markdown_to_html_node(
+        md, template.basepath, template.assets, template.images
+    )
+    html_str = node.to_html(template.minify)
+    return template.render(title, html_str)
+
+
+def write_page(dest_path, write):
+    """
+    Write a page through a temporary file, so a failing page never leaves a
+    half-written file behind.
+    """
+    # Create necessary directories if they don't exist
+    dest_dir = os.path.dirname(dest_path)
+    if dest_dir:
+        os.makedirs(dest_dir, exist_ok=True)
+
+    tmp_path = dest_path + ".tmp"
+    try:
+        with open(tmp_path, "w") as file:
+            write(file)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def add_timings(timings, stages):
+    for name, seconds in stages:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def render_content(
+    from_path,
+    basepath="/",
+    timings=None,
+    assets=None,
+    minify=False,
+    images=None,
+    terms=None,
+    links=None,
+    shown=None,
+):
+    """
+    Read and convert a markdown file, returning its title and content HTML.
+
+    Pass a dict as timings to add the read, parse and serialize times to it,
+    a dict as terms to add the page's search terms to it, a list as links
+    to append the URLs it links to and a dict as shown to add the sizes of
+    the images it shows.
+    """
+    clock = time.perf_counter
+    started = clock()
     with open(from_path, "r") as file:
         md = file.read()
+    title = extract_title(md)
+    read = clock()
+    if shown is not None:
+        images = ShownImages(images, shown)
+    node = markdown_to_html_node(md, basepath, assets, images, terms, links)
+    parsed = clock()
+    html_str = node.to_html(minify)
+    serialized = clock()
+    if timings is not None:
+        add_timings(
+            timings,
+            (
+                ("read", read - started),
+                ("parse", parsed - read),
+                ("serialize", serialized - parsed),
+            ),
+        )
+    return title, html_str
 
-    with open(template_path, "r") as file:
-        template = file.read()
 
-    html_node = markdown_to_html_node(md)
-    html_str = html_node.to_html()
+def render_content_blocks(
+    from_path,
+    connection,
+    basepath="/",
+    timings=None,
+    assets=None,
+    render_context=None,
+    minify=False,
+    images=None,
+    terms=None,
+    block_terms=None,
+    links=None,
+    block_links=None,
+    shown=None,
+    block_images=None,
+):
+    """
+    Convert a markdown file like render_content, reusing cached block HTML.
+
+    Fragments of blocks already in the render cache behind connection are
+    reused, unless they show images at other sizes than those in images,
+    and only the other blocks are converted. Returns the (title,
+    content HTML) pair, the keys of the reused blocks and a dict of the
+    fragments of the converted ones, so the build process can store them.
+
+    Pass a dict as terms to add the page's search terms to it, and a list
+    as links to append the URLs it links to. Blocks reuse the terms and
+    links cached with them, and blocks cached without them are converted
+    again to find them. The terms and links of every converted block are
+    added to block_terms and block_links (if given) by key, for the build
+    process to store. Likewise, pass a dict as shown to add the sizes of
+    the images the page shows, and as block_images to add those of every
+    converted block showing any.
+    """
+    clock = time.perf_counter
+    started = clock()
+    with open(from_path, "r") as file:
+        md = file.read()
     title = extract_title(md)
+    blocks = list(iter_blocks(iter_lines(md)))
+    if not blocks:
+        # Same error to_html() raises for the empty wrapper div
+        raise ValueError("Error: Node must have children")
+    read = clock()
+    render_context = basepath if render_context is None else render_context
+    keys = [block_key(block, render_context) for block in blocks]
+    known = RenderCache.lookup_blocks(connection, keys)
+    known_images = RenderCache.lookup_block_data(connection, keys, "images")
+    known_terms = known_links = {}
+    if terms is not None:
+        known_terms = RenderCache.lookup_block_data(connection, keys, "terms")
+    if links is not None:
+        known_links = RenderCache.lookup_block_data(connection, keys, "links")
+    looked_up = clock()
 
-    new_html = template.replace("{{ Title }}", title).replace("{{ Content }}", html_str)
+    parse_time = 0.0
+    serialize_time = 0.0
+    converted = {}
+    indexed = {}
+    linked = {}
+    pictured = {}
+    parts = ["<div>"]
+    for block, key in zip(blocks, keys):
+        fragment = known.get(key) or converted.get(key)
+        if key not in converted and (
+            (terms is not None and key not in known_terms)
+            or (links is not None and key not in known_links)
+        ):
+            # Only converting the block finds what it contains
+            fragment = None
+        if (
+            key not in converted
+            and key in known_images
+            and not sizes_match(known_images[key], images)
+        ):
+            fragment = None
+        if fragment is None:
+            found_terms = found_links = None
+            if terms is not None:
+                found_terms = indexed[key] = {}
+            if links is not None:
+                found_links = linked[key] = []
+            found_images = pictured[key] = {}
+            block_started = clock()
+            node = block_to_html_node(
+                block,
+                basepath,
+                assets,
+                ShownImages(images, found_images),
+                found_terms,
+                found_links,
+            )
+            parsed = clock()
+            fragment = converted[key] = "".join(iter_html(node, minify))
+            parse_time += parsed - block_started
+            serialize_time += clock() - parsed
+        if terms is not None:
+            found_terms = indexed[key] if key in converted else known_terms[key]
+            for term, weight in found_terms.items():
+                terms[term] = terms.get(term, 0) + weight
+        if links is not None:
+            links.extend(linked[key] if key in converted else known_links[key])
+        if shown is not None:
+            shown.update(
+                pictured[key] if key in converted else known_images.get(key, {})
+            )
+        parts.append(fragment)
+    parts.append("</div>")
+    if block_terms is not None:
+        block_terms.update(indexed)
+    if block_links is not None:
+        block_links.update(linked)
+    if block_images is not None:
+        block_images.update(
+            (key, found_images)
+            for key, found_images in pictured.items()
+            if found_images
+        )
 
-    # Ensure basepath ends with / if it's not just "/"
-    if basepath != "/" and not basepath.endswith("/"):
-        basepath = basepath + "/"
+    if timings is not None:
+        add_timings(
+            timings,
+            (
+                ("read", read - started),
+                ("cache", looked_up - read),
+                ("parse", parse_time),
+                ("serialize", serialize_time),
+            ),
+        )
+    reused = [
+        key for key in dict.fromkeys(keys) if key in known and key not in converted
+    ]
+    return (title, "".join(parts)), reused, converted
 
-    # Replace URL paths with basepath
-    new_html = new_html.replace('href="/', f'href="{basepath}')
-    new_html = new_html.replace('src="/', f'src="{basepath}')
 
-    # Create necessary directories if they don't exist
-    dest_dir = os.path.dirname(dest_path)
-    if dest_dir:
-        os.makedirs(dest_dir, exist_ok=True)
+def generate_page_timed(
+    from_path,
+    dest_path,
+    template,
+    timings,
+    content=None,
+    terms=None,
+    links=None,
+    shown=None,
+):
+    """
+    Generate a page one stage at a time, adding each stage's duration to timings.
 
-    with open(dest_path, "w") as file:
-        file.write(new_html)
+    Produces the same file as the streaming path in generate_page, but holds
+    the whole page in memory so the stages can be timed separately. Returns
+    the page's title.
+    """
+    if content is None:
+        content = render_content(
+            from_path,
+            template.basepath,
+            timings,
+            template.assets,
+            template.minify,
+            template.images,
+            terms,
+            links,
+            shown,
+        )
+    title, html_str = content
 
+    clock = time.perf_counter
+    started = clock()
+    page = template.render(title, html_str)
+    rendered = clock()
+    write_page(dest_path, lambda file: file.write(page))
+    written = clock()
+    add_timings(
+        timings, (("template", rendered - started), ("write", written - rendered))
+    )
+    return title
 
-def generate_pages_recursive(
-    dir_path_content, template_path, dest_dir_path, basepath="/"
+
+def generate_page(
+    from_path,
+    template_path,
+    dest_path,
+    basepath="/",
+    template=None,
+    timings=None,
+    content=None,
+    terms=None,
+    links=None,
+    shown=None,
 ):
     """
-    Recursively generate HTML pages from markdown files in a directory.
+    Generate an HTML page from a markdown file using a template.
+
+    Pass an already compiled template to avoid reading template_path again.
+    Pass a dict as timings to time each stage of the page into it. Pass a
+    (title, content HTML) pair as content, e.g. from the render cache, to
+    skip reading and converting the markdown. Otherwise, pass a dict as
+    terms to add the page's search terms to it, a list as links to append
+    the URLs it links to and a dict as shown to add the sizes of the images
+    it shows, as it is converted. Returns the page's title.
+    """
+    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    if template is None:
+        template = Template.load(template_path, basepath)
+    if timings is not None:
+        return generate_page_timed(
+            from_path, dest_path, template, timings, content, terms, links, shown
+        )
+    if content is not None:
+        title, html_str = content
+        write_page(dest_path, lambda file: template.write(file, title, [html_str]))
+        return title
+
+    # The title is written first, so find it before streaming the content
+    with open(from_path, "r") as file:
+        title = extract_title(file)
+
+    images = template.images
+    if shown is not None:
+        images = ShownImages(images, shown)
+
+    def write(file):
+        with open(from_path, "r") as md_file:
+            chunks = iter_markdown_html(
+                md_file,
+                template.basepath,
+                template.assets,
+                template.minify,
+                images,
+                terms,
+                links,
+            )
+            template.write(file, title, chunks)
+
+    write_page(dest_path, write)
+    return title
+
+
+def page_dest_path(from_path, dir_path_content, dest_dir_path):
+    """
+    Map a path under the content directory to its path under the output directory.
     """
-    dir = os.listdir(dir_path_content)
+    rel_path = os.path.relpath(from_path, dir_path_content)
+    dest_path = os.path.join(dest_dir_path, rel_path)
+    if from_path.endswith(".md"):
+        # Replace the .md extension with .html
+        dest_path = os.path.splitext(dest_path)[0] + ".html"
+    return dest_path
+
 
-    for item in dir:
+def find_pages(dir_path_content, dest_dir_path):
+    """
+    Recursively collect (markdown path, html path) pairs for a content directory.
+    """
+    pages = []
+    for item in os.listdir(dir_path_content):
         item_path = os.path.join(dir_path_content, item)
         new_dest_dir_path = os.path.join(dest_dir_path, item)
 
         if os.path.isfile(item_path) and item_path.endswith(".md"):
             # Replace the .md extension with .html
             html_path = os.path.splitext(new_dest_dir_path)[0] + ".html"
-            generate_page(item_path, template_path, html_path, basepath)
+            pages.append((item_path, html_path))
 
         elif os.path.isdir(item_path):
-            generate_pages_recursive(
-                item_path, template_path, new_dest_dir_path, basepath
+            pages.extend(find_pages(item_path, new_dest_dir_path))
+
+    return pages
+
+
+# One page for generate_page_job to generate. cache_path and cache_key are
+# None for a page the render cache doesn't cover; index and collect_links ask for the page's
+# search terms and link URLs.
+PageJob = namedtuple(
+    "PageJob",
+    [
+        "from_path",
+        "template_path",
+        "dest_path",
+        "basepath",
+        "template",
+        "profiling",
+        "cache_path",
+        "cache_key",
+        "index",
+        "collect_links",
+    ],
+)
+# What generate_page_job reports back, each None where it doesn't apply:
+# the error, the page's stage timings, its (title, content HTML) with its
+# reused and converted blocks for a page missing from the render cache, its
+# title, terms and the terms of its converted blocks for a page to index,
+# the URLs it and its converted blocks link to, and the sizes of the images
+# it and its converted blocks show.
+PageResult = namedtuple(
+    "PageResult", ["error", "timings", "rendered", "indexed", "linked", "shown"]
+)
+
+
+def generate_page_job(job):
+    """
+    Generate the page of a PageJob, returning a PageResult.
+
+    Runs inside pool workers, so a failing page is reported back to the
+    parent as the result's error rather than taking down the whole build.
+    """
+    template = job.template
+    timings = {} if job.profiling else None
+    rendered = None
+    terms = {} if job.index else None
+    links = [] if job.collect_links else None
+    shown = {}
+    block_terms = {}
+    block_links = {}
+    block_images = {}
+    try:
+        content = None
+        if job.cache_path is not None:
+            connection = RenderCache.read_only(job.cache_path)
+            started = time.perf_counter()
+            # Cached pages come without terms or links, but their blocks may
+            # have them
+            if terms is None and links is None:
+                content = RenderCache.lookup(
+                    connection, job.cache_key, template.images, shown
+                )
+            if timings is not None:
+                add_timings(timings, (("cache", time.perf_counter() - started),))
+            if content is None:
+                rendered = render_content_blocks(
+                    job.from_path,
+                    connection,
+                    template.basepath,
+                    timings,
+                    template.assets,
+                    template.render_context,
+                    template.minify,
+                    template.images,
+                    terms,
+                    block_terms,
+                    links,
+                    block_links,
+                    shown,
+                    block_images,
+                )
+                content = rendered[0]
+        title = generate_page(
+            job.from_path,
+            job.template_path,
+            job.dest_path,
+            job.basepath,
+            template,
+            timings,
+            content,
+            terms,
+            links,
+            shown,
+        )
+    except Exception as e:
+        return PageResult(f"{type(e).__name__}: {e}", timings, None, None, None, None)
+    indexed = None if terms is None else (title, terms, block_terms)
+    linked = None if links is None else (links, block_links)
+    return PageResult(None, timings, rendered, indexed, linked, (shown, block_images))
+
+
+def generate_pages(
+    pages,
+    template_path,
+    basepath="/",
+    manifest=None,
+    template=None,
+    jobs=1,
+    profile=None,
+    dest_dir_path=None,
+    cache=None,
+    search=None,
+    check_links=False,
+):
+    """
+    Generate HTML pages from a list of (markdown path, html path) pairs.
+
+    When a manifest is given, pages whose source is unchanged since the
+    last build are skipped; dest_dir_path, the output directory the html
+    paths are under, is then required. With jobs > 1 the remaining pages
+    are generated on a pool of worker processes. Failed pages don't stop
+    the build; they are raised together as a BuildError once every other
+    page is written. When a BuildProfile is given, every generated page is
+    timed into it. When a RenderCache is given, pages whose markdown was
+    converted before only need the template applied, and pages from
+    sources too big to cache are streamed as without one. When a SearchIndex is
+    given, pages not indexed as of their current source are generated and
+    indexed in the same pass; dest_dir_path is then required too. With
+    check_links, the URLs each generated page links to are collected as it
+    is converted and kept in the manifest, which is then required; pages
+    whose links the manifest lacks are generated again. The manifest also
+    keeps the sizes each page shows its images at, so pages showing an
+    image whose size changed are generated again too.
+    """
+    if (manifest is not None or search is not None) and dest_dir_path is None:
+        raise ValueError("dest_dir_path is required with a manifest or search index")
+    if check_links and manifest is None:
+        raise ValueError("a manifest is required to check links")
+    # Compile the template once and share it with every page
+    if template is None:
+        template = Template.load(template_path, basepath)
+
+    pending = []
+    with timed(profile, "hash"):
+        for from_path, dest_path in pages:
+            source_hash = None
+            if manifest is not None or cache is not None or search is not None:
+                source_hash = hash_file(from_path)
+            if manifest is not None:
+                manifest.note_source(from_path, source_hash)
+            index = search is not None and not search.is_fresh(from_path, source_hash)
+            if (
+                manifest is not None
+                and manifest.is_fresh(
+                    from_path, source_hash, dest_path, dest_dir_path, template.images
+                )
+                and not index
+                and not (check_links and manifest.links_of(from_path) is None)
+            ):
+                continue
+            cache_key = None
+            if cache is not None and os.path.getsize(from_path) <= MAX_SOURCE_BYTES:
+                cache_key = render_key(source_hash, template.render_context)
+            pending.append((from_path, dest_path, source_hash, index, cache_key))
+
+    job_args = [
+        PageJob(
+            from_path,
+            template_path,
+            dest_path,
+            basepath,
+            template,
+            profiling=profile is not None,
+            cache_path=None if cache_key is None else cache.path,
+            cache_key=cache_key,
+            index=index,
+            collect_links=check_links,
+        )
+        for from_path, dest_path, source_hash, index, cache_key in pending
+    ]
+    if jobs > 1 and len(job_args) > 1:
+        # Hand out pages in batches to keep inter-process traffic low
+        chunksize = max(1, len(job_args) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(
+                executor.map(generate_page_job, job_args, chunksize=chunksize)
+            )
+    else:
+        results = [generate_page_job(job) for job in job_args]
+
+    failures = []
+    cache_hits = []
+    cache_entries = []
+    block_hits = []
+    block_entries = {}
+    block_terms = {}
+    block_links = {}
+    block_images = {}
+    for (from_path, dest_path, source_hash, _, cache_key), result in zip(
+        pending, results
+    ):
+        if result.timings is not None:
+            profile.add_page(from_path, result.timings)
+        if result.error is not None:
+            failures.append((from_path, result.error))
+            continue
+        page_links = None
+        if result.linked is not None:
+            page_links, converted_links = result.linked
+            block_links.update(converted_links)
+        page_shown, converted_images = result.shown
+        block_images.update(converted_images)
+        if manifest is not None:
+            manifest.record(
+                from_path, source_hash, dest_path, dest_dir_path, page_links, page_shown
+            )
+        if result.indexed is not None:
+            title, terms, converted_terms = result.indexed
+            dest_rel_path = os.path.relpath(dest_path, dest_dir_path)
+            search.record(from_path, source_hash, dest_rel_path, title, terms)
+            block_terms.update(converted_terms)
+        if cache_key is not None:
+            if result.rendered is None:
+                cache_hits.append(cache_key)
+            else:
+                content, reused, converted = result.rendered
+                cache_entries.append((cache_key, *content, page_shown))
+                block_hits.extend(reused)
+                block_entries.update(converted)
+
+    if cache is not None:
+        with timed(profile, "cache"):
+            cache.update(
+                cache_hits,
+                cache_entries,
+                block_hits,
+                list(block_entries.items()),
+                list(block_terms.items()),
+                list(block_links.items()),
+                list(block_images.items()),
             )
+
+    if failures:
+        raise BuildError(failures)
+
+
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath="/",
+    manifest=None,
+    template=None,
+    jobs=1,
+    profile=None,
+    cache=None,
+    site_url=None,
+    search=None,
+    links=None,
+):
+    """
+    Recursively generate HTML pages from markdown files in a directory.
+
+    All pages are discovered first and then handed to generate_pages. With
+    a site_url, a sitemap of every page is written once they are all
+    generated, dated from the manifest (if any). With a SearchIndex, pages
+    that are gone are dropped from it and its changes are written out.
+    With a LinkChecker, the links of every page in the manifest, which is
+    then required, are checked once the pages and the files besides them
+    are all written.
+    """
+    with timed(profile, "discover"):
+        pages = find_pages(dir_path_content, dest_dir_path)
+    generate_pages(
+        pages,
+        template_path,
+        basepath,
+        manifest,
+        template,
+        jobs,
+        profile,
+        dest_dir_path,
+        cache,
+        search,
+        links is not None,
+    )
+    if search is not None:
+        with timed(profile, "search"):
+            search.prune()
+            search.write(dest_dir_path, normalize_basepath(basepath))
+    if site_url is not None:
+        with timed(profile, "sitemap"):
+            write_sitemap(
+                dest_dir_path,
+                [
+                    (
+                        os.path.relpath(dest_path, dest_dir_path),
+                        None if manifest is None else manifest.lastmod_of(from_path),
+                    )
+                    for from_path, dest_path in pages
+                ],
+                site_url,
+                normalize_basepath(basepath),
+            )
+    if links is not None:
+        with timed(profile, "links"):
+            # Pages that are gone would still count as link targets
+            manifest.prune(dest_dir_path)
+            links.check(manifest, dest_dir_path)
+
+
+def update_pages(
+    changed_paths,
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath,
+    manifest,
+    template=None,
+    jobs=1,
+    cache=None,
+    site_url=None,
+    search=None,
+    links=None,
+):
+    """
+    Regenerate or remove only the pages affected by changed content paths.
+
+    A changed path can be a markdown file or a whole directory that was
+    created, moved or deleted. With a site_url, the sitemap is rewritten
+    from every page in the manifest. With a SearchIndex, the shards of the
+    affected pages' terms are rewritten. With a LinkChecker, the links of
+    every page are checked again, as removed pages may have been linked to.
+    """
+    pages = []
+    for path in changed_paths:
+        if os.path.isdir(path):
+            dest_path = page_dest_path(path, dir_path_content, dest_dir_path)
+            pages.extend(find_pages(path, dest_path))
+        elif os.path.isfile(path):
+            if path.endswith(".md"):
+                dest_path = page_dest_path(path, dir_path_content, dest_dir_path)
+                pages.append((path, dest_path))
+        else:
+            # Gone, possibly along with the directory it was in
+            for source_path in list(manifest.pages):
+                if source_path == path or source_path.startswith(path + os.sep):
+                    manifest.remove_page(source_path, dest_dir_path)
+                    if search is not None:
+                        search.remove(source_path)
+
+    generate_pages(
+        pages,
+        template_path,
+        basepath,
+        manifest,
+        template,
+        jobs,
+        dest_dir_path=dest_dir_path,
+        cache=cache,
+        search=search,
+        check_links=links is not None,
+    )
+    if search is not None:
+        search.write(dest_dir_path, normalize_basepath(basepath))
+    if site_url is not None:
+        write_sitemap(
+            dest_dir_path,
+            [
+                (entry["dest"], manifest.lastmod_of(source_path))
+                for source_path, entry in manifest.pages.items()
+            ],
+            site_url,
+            normalize_basepath(basepath),
+        )
+    if links is not None:
+        links.check(manifest, dest_dir_path)
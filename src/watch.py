@@ -0,0 +1,220 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# Event flags from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+# struct inotify_event: int wd; uint32 mask, cookie, len; char name[len]
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """
+    Detects changes by comparing mtimes and sizes on a fixed interval.
+
+    Works everywhere, but every poll stats every watched file.
+    """
+
+    def __init__(self, dirs, files, interval=0.05):
+        self.dirs = dirs
+        self.files = files
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self):
+        state = {}
+        paths = list(self.files)
+        for root_dir in self.dirs:
+            for dir_path, _, file_names in os.walk(root_dir):
+                paths.extend(os.path.join(dir_path, name) for name in file_names)
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            state[path] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout=None):
+        """
+        Block until something changes or timeout seconds pass.
+
+        Returns the set of changed, created and deleted paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+            state = self.snapshot()
+            changes = {
+                path
+                for path in state.keys() | self.state.keys()
+                if state.get(path) != self.state.get(path)
+            }
+            self.state = state
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Detects changes with Linux inotify, so an edit is seen as soon as it lands.
+
+    Directories are watched recursively; single files are watched through
+    their parent directory so editors that save by renaming are caught.
+    """
+
+    def __init__(self, dirs, files):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch descriptor -> watched directory
+        self.dirs = {}
+        # Watched directory -> {name: path to report}, or None for every name
+        self.names = {}
+        try:
+            for root_dir in dirs:
+                self.add_tree(root_dir)
+            for path in files:
+                dir_path, name = os.path.split(path)
+                dir_path = dir_path or os.curdir
+                if dir_path not in self.names:
+                    self.add_watch(dir_path)
+                    self.names[dir_path] = {}
+                if self.names[dir_path] is not None:
+                    self.names[dir_path][name] = path
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, dir_path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dir_path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), dir_path)
+        self.dirs[wd] = dir_path
+
+    def add_tree(self, root_dir):
+        for dir_path, _, _ in os.walk(root_dir):
+            self.add_watch(dir_path)
+            self.names[dir_path] = None
+
+    def wait(self, timeout=None):
+        """
+        Block until something changes or timeout seconds pass.
+
+        Returns the set of changed, created and deleted paths. A directory
+        that was created, moved or deleted is reported as a single path.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+
+        changes = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changes
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            dir_path = self.dirs.get(wd)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if dir_path is None or not name:
+                continue
+
+            wanted = self.names.get(dir_path)
+            if wanted is None:
+                path = os.path.join(dir_path, name)
+            elif name in wanted:
+                path = wanted[name]
+            else:
+                continue
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # Start watching new directories before files land in them
+                if os.path.isdir(path):
+                    self.add_tree(path)
+            changes.add(path)
+        return changes
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(dirs, files, polling=False):
+    """
+    Watch with inotify where available, falling back to polling.
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(dirs, files)
+        except (OSError, AttributeError):
+            # AttributeError: a libc without the inotify functions
+            pass
+    return PollingWatcher(dirs, files)
+
+
+def iter_changes(watcher, debounce=0.03):
+    """
+    Yield sets of changed paths, merging bursts of events into one set.
+
+    A burst ends once no new event has arrived for debounce seconds, so a
+    save that touches several files triggers a single rebuild.
+    """
+    while True:
+        changes = watcher.wait()
+        if not changes:
+            continue
+        while True:
+            more = watcher.wait(debounce)
+            if not more:
+                break
+            changes |= more
+        yield changes